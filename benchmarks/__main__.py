@@ -0,0 +1,74 @@
+"""
+Run the benchmarks and print their results as one JSON document.
+
+    python -m benchmarks --output results.json
+    python -m benchmarks plugin metrics
+
+Results are keyed by benchmark, next to the versions and the machine they
+ran on, so runs of different commits can be compared.
+"""
+
+import argparse
+import importlib
+import platform
+import sys
+import time
+from importlib.metadata import version
+from typing import Any, Dict, List, Optional
+
+import orjson as json
+
+BENCHMARKS = [
+    "plugin",
+    "scheduler",
+    "metrics",
+    "serializers",
+    "compression",
+    "adaptive",
+]
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "time": time.time(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "taskiq": version("taskiq"),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "names", nargs="*", help=f"benchmarks to run, among {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument("--output", "-o", help="write the results to this file")
+    args = parser.parse_args(argv)
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Any] = {
+        "environment": environment(),
+        "seconds": {},
+        "results": {},
+    }
+    for name in args.names or BENCHMARKS:
+        print(f"running {name}", file=sys.stderr)
+        module = importlib.import_module(f"benchmarks.bench_{name}")
+        started_at = time.perf_counter()
+        results["results"][name] = module.run()
+        results["seconds"][name] = time.perf_counter() - started_at
+
+    output = json.dumps(results, option=json.OPT_INDENT_2)
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(output)
+    else:
+        print(output.decode())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare static and adaptive worker limits on an in-memory broker.
+
+Tasks call a simulated downstream service that slows down once more than
+`CAPACITY` calls overlap, and spend a little CPU time on the event loop.
+Static limits either leave the service idle or overload it, the adaptive
+receiver should settle near its capacity.
+
+Run with `python -m benchmarks.bench_adaptive`.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+from taskiq import InMemoryBroker
+from taskiq.message import BrokerMessage
+from taskiq.receiver import Receiver
+
+from unfazed_taskiq.receiver import AdaptiveReceiver
+
+MESSAGES = 3000
+CAPACITY = 20
+BASE_LATENCY = 0.005
+CPU_TIME = 0.0001
+
+
+class QueueBroker(InMemoryBroker):
+    """InMemoryBroker delivering messages through listen."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+
+    async def kick(self, message: BrokerMessage) -> None:
+        await self.queue.put(message.message)
+
+    async def listen(self) -> AsyncGenerator[bytes, None]:  # type: ignore[override]
+        while True:
+            yield await self.queue.get()
+
+
+class Service:
+    """Downstream whose latency grows quadratically past its capacity."""
+
+    def __init__(self) -> None:
+        self.concurrent = 0
+
+    async def call(self) -> None:
+        self.concurrent += 1
+        try:
+            load = max(1.0, self.concurrent / CAPACITY)
+            await asyncio.sleep(BASE_LATENCY * load * load)
+        finally:
+            self.concurrent -= 1
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+async def measure(receiver_cls: Any, messages: int, **options: Any) -> Dict[str, float]:
+    broker = QueueBroker()
+    service = Service()
+    latencies: List[float] = []
+    finished = asyncio.Event()
+
+    @broker.task(task_name="bench.call")
+    async def call() -> None:
+        started_at = time.perf_counter()
+        deadline = started_at + CPU_TIME
+        while time.perf_counter() < deadline:
+            pass
+        await service.call()
+        latencies.append(time.perf_counter() - started_at)
+        if len(latencies) == messages:
+            finished.set()
+
+    receiver: Receiver = receiver_cls(broker, **options)
+    for _ in range(messages):
+        await call.kiq()
+
+    stop = asyncio.Event()
+    started_at = time.perf_counter()
+    listening = asyncio.create_task(receiver.listen(stop))
+    await finished.wait()
+    elapsed = time.perf_counter() - started_at
+    stop.set()
+    await listening
+    return {
+        "throughput": messages / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+
+
+def run(messages: int = MESSAGES) -> Dict[str, Dict[str, float]]:
+    """:return: throughput in tasks per second and latencies per setup."""
+    setups: Dict[str, Any] = {
+        "static 4/0": (Receiver, {"max_async_tasks": 4, "max_prefetch": 0}),
+        "static 100/100": (Receiver, {"max_async_tasks": 100, "max_prefetch": 100}),
+        "static 500/500": (Receiver, {"max_async_tasks": 500, "max_prefetch": 500}),
+        "adaptive": (
+            AdaptiveReceiver,
+            {"max_in_flight": 500, "max_prefetch": 500, "interval": 0.05},
+        ),
+    }
+    return {
+        name: asyncio.run(measure(receiver_cls, messages, **options))
+        for name, (receiver_cls, options) in setups.items()
+    }
+
+
+if __name__ == "__main__":
+    for name, result in run().items():
+        print(
+            f"{name:>16}: {result['throughput']:8.0f} tasks/s"
+            f"  p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms"
+        )
@@ -0,0 +1,94 @@
+"""
+Measure the size and CPU trade-offs of CompressingFormatter.
+
+Run with `python -m benchmarks.bench_compression`.
+"""
+
+import random
+import time
+from functools import partial
+from typing import Any, Dict, List
+
+from taskiq import InMemoryBroker, TaskiqMessage
+
+from unfazed_taskiq.compression import CODECS, CompressingFormatter
+
+PAYLOAD_SIZES = (1024, 200 * 1024, 2 * 1024 * 1024)
+
+
+def make_payload(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """JSON-like records, about `size` bytes once serialized."""
+    rng = random.Random(seed)
+    records = []
+    total = 0
+    while total < size:
+        record = {
+            "id": rng.randrange(10**9),
+            "name": f"user-{rng.randrange(10**6)}",
+            "email": f"user{rng.randrange(10**6)}@example.com",
+            "score": round(rng.random() * 100, 3),
+            "tags": rng.sample(["a", "b", "c", "d", "e", "f"], 3),
+        }
+        records.append(record)
+        total += 110
+    return records
+
+
+def timed(func: Any, rounds: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started_at) / rounds * 1e6
+
+
+def run() -> List[Dict[str, Any]]:
+    broker = InMemoryBroker()
+    rows = []
+    for size in PAYLOAD_SIZES:
+        message = TaskiqMessage(
+            task_id="id",
+            task_name="bench",
+            labels={},
+            args=[make_payload(size)],
+            kwargs={},
+        )
+        plain = broker.formatter.dumps(message).message
+        rounds = max(3, 2_000_000 // max(len(plain), 1))
+        rows.append(
+            {
+                "payload": size,
+                "codec": "none",
+                "bytes": len(plain),
+                "ratio": 1.0,
+                "dumps_us": timed(partial(broker.formatter.dumps, message), rounds),
+                "loads_us": timed(partial(broker.formatter.loads, plain), rounds),
+            }
+        )
+        for codec in CODECS:
+            try:
+                formatter = CompressingFormatter(broker.formatter, 0, codec)
+            except ValueError:
+                continue
+            body = formatter.dumps(message).message
+            rows.append(
+                {
+                    "payload": size,
+                    "codec": codec,
+                    "bytes": len(body),
+                    "ratio": len(body) / len(plain),
+                    "dumps_us": timed(partial(formatter.dumps, message), rounds),
+                    "loads_us": timed(partial(formatter.loads, body), rounds),
+                }
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    print(
+        f"{'payload':>9} {'codec':>6} {'bytes':>9} {'ratio':>6} {'dumps us':>10} {'loads us':>10}"
+    )
+    for row in run():
+        print(
+            f"{row['payload']:>9} {row['codec']:>6} {row['bytes']:>9} "
+            f"{row['ratio']:>6.2f} {row['dumps_us']:>10.1f} {row['loads_us']:>10.1f}"
+        )
@@ -0,0 +1,209 @@
+"""
+Measure the overhead of the plugin layer over raw taskiq.
+
+- decoration: `decorators.task` against `broker.task`, per function.
+- kiq: throughput and latency of kiq to result through an in-memory broker,
+  raw, through an agent, and through an agent with the middleware chain of
+  `benchmarks.settings`.
+- get_agent: `AgentHandler.get_agent` per lookup.
+- middleware: hooks of the chain per message.
+- setup: `AgentHandler` setup, startup and shutdown for 1, 10 and 50 aliases.
+
+Run with `python -m benchmarks.bench_plugin`, results are printed as JSON.
+"""
+
+import os
+
+os.environ.setdefault("UNFAZED_SETTINGS_MODULE", "benchmarks.settings")
+
+import asyncio
+import sys
+import time
+import types
+from typing import Any, Callable, Dict, List
+
+import orjson as json
+from taskiq import AsyncBroker, InMemoryBroker, TaskiqMessage, TaskiqResult
+from taskiq.utils import maybe_awaitable
+
+from benchmarks.settings import alias
+from unfazed_taskiq.agent.handler import AgentHandler, agents
+from unfazed_taskiq.decorators import task
+from unfazed_taskiq.registry.task import rs
+
+DECORATIONS = 2000
+MESSAGES = 5000
+LATENCY_MESSAGES = 1000
+LOOKUPS = 200_000
+HOOK_ROUNDS = 50_000
+ALIASES = (1, 10, 50)
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+def make_function(name: str) -> Callable[..., Any]:
+    async def function(value: int) -> int:
+        return value
+
+    # the registry keys tasks by module and name
+    function.__name__ = function.__qualname__ = name
+    return function
+
+
+def bench_decoration(rounds: int = DECORATIONS) -> Dict[str, float]:
+    """:return: microseconds per decorated function."""
+    broker = InMemoryBroker()
+    functions = [make_function(f"raw_{i}") for i in range(rounds)]
+    started_at = time.perf_counter()
+    for function in functions:
+        broker.task(function)
+    raw = time.perf_counter() - started_at
+
+    functions = [make_function(f"plugin_{i}") for i in range(rounds)]
+    started_at = time.perf_counter()
+    for function in functions:
+        task(function)
+    plugin = time.perf_counter() - started_at
+    rs.clear()
+    return {
+        "raw_us": raw / rounds * 1e6,
+        "plugin_us": plugin / rounds * 1e6,
+    }
+
+
+async def measure_kiq(
+    broker: AsyncBroker, messages: int, latency_messages: int
+) -> Dict[str, float]:
+    name = f"bench.echo_{id(broker)}"
+    echo = broker.task(task_name=name)(make_function("echo"))
+    await broker.startup()
+    try:
+        latencies = []
+        for value in range(latency_messages):
+            started_at = time.perf_counter()
+            handle = await echo.kiq(value)
+            await handle.wait_result(check_interval=0)
+            latencies.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        for value in range(messages):
+            await echo.kiq(value)
+        await broker.wait_all()  # type: ignore[attr-defined]
+        elapsed = time.perf_counter() - started_at
+    finally:
+        await broker.shutdown()
+    return {
+        "throughput": messages / elapsed,
+        "p50_us": percentile(latencies, 0.5) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+    }
+
+
+def bench_kiq(
+    messages: int = MESSAGES, latency_messages: int = LATENCY_MESSAGES
+) -> Dict[str, Dict[str, float]]:
+    """:return: tasks per second and kiq to result latencies per setup."""
+    brokers: Dict[str, Callable[[], AsyncBroker]] = {
+        "raw": InMemoryBroker,
+        "agent": lambda: agents.storage["bench"].broker,
+        "agent_middlewares": lambda: agents.storage["bench_middlewares"].broker,
+    }
+    return {
+        name: asyncio.run(measure_kiq(broker(), messages, latency_messages))
+        for name, broker in brokers.items()
+    }
+
+
+def bench_get_agent(rounds: int = LOOKUPS) -> Dict[str, float]:
+    """:return: microseconds per lookup."""
+    results = {}
+    for name, alias_name in (("default_us", None), ("named_us", "bench")):
+        started_at = time.perf_counter()
+        for _ in range(rounds):
+            agents.get_agent(alias_name)
+        results[name] = (time.perf_counter() - started_at) / rounds * 1e6
+    return results
+
+
+async def measure_hooks(broker: AsyncBroker, rounds: int) -> float:
+    message = TaskiqMessage(
+        task_id="bench", task_name="bench.echo", labels={}, args=[1], kwargs={}
+    )
+    result: TaskiqResult[int] = TaskiqResult(
+        is_err=False, return_value=1, execution_time=0
+    )
+    middlewares = broker.middlewares
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        for middleware in middlewares:
+            message = await maybe_awaitable(middleware.pre_send(message))
+        for middleware in middlewares:
+            message = await maybe_awaitable(middleware.pre_execute(message))
+        for middleware in middlewares:
+            await maybe_awaitable(middleware.post_execute(message, result))
+        for middleware in middlewares:
+            await maybe_awaitable(middleware.post_save(message, result))
+    return (time.perf_counter() - started_at) / rounds * 1e6
+
+
+def bench_middleware(rounds: int = HOOK_ROUNDS) -> Dict[str, Any]:
+    """:return: microseconds per message through the chain hooks."""
+    broker = agents.storage["bench_middlewares"].broker
+    return {
+        "middlewares": [type(middleware).__name__ for middleware in broker.middlewares],
+        "chain_us": asyncio.run(measure_hooks(broker, rounds)),
+    }
+
+
+async def measure_setup(count: int) -> Dict[str, float]:
+    # AgentHandler reads its settings from the UNFAZED_SETTINGS_MODULE module
+    settings = types.ModuleType(f"benchmarks.settings_{count}")
+    settings.UNFAZED_TASKIQ_SETTINGS = {  # type: ignore[attr-defined]
+        "DEFAULT_TASKIQ_NAME": "alias_0",
+        "TASKIQ_CONFIG": {f"alias_{i}": alias() for i in range(count)},
+    }
+    sys.modules[settings.__name__] = settings
+    previous = os.environ["UNFAZED_SETTINGS_MODULE"]
+    os.environ["UNFAZED_SETTINGS_MODULE"] = settings.__name__
+    try:
+        started_at = time.perf_counter()
+        handler = AgentHandler()
+        setup = time.perf_counter() - started_at
+    finally:
+        os.environ["UNFAZED_SETTINGS_MODULE"] = previous
+        del sys.modules[settings.__name__]
+
+    started_at = time.perf_counter()
+    await handler.startup()
+    startup = time.perf_counter() - started_at
+    started_at = time.perf_counter()
+    await handler.shutdown()
+    shutdown = time.perf_counter() - started_at
+    handler.reset()
+    return {
+        "setup_ms": setup * 1e3,
+        "startup_ms": startup * 1e3,
+        "shutdown_ms": shutdown * 1e3,
+    }
+
+
+def bench_setup(counts: tuple = ALIASES) -> Dict[str, Dict[str, float]]:
+    """:return: milliseconds per phase for each number of aliases."""
+    return {str(count): asyncio.run(measure_setup(count)) for count in counts}
+
+
+def run() -> Dict[str, Any]:
+    return {
+        "decoration": bench_decoration(),
+        "kiq": bench_kiq(),
+        "get_agent": bench_get_agent(),
+        "middleware": bench_middleware(),
+        "setup": bench_setup(),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(), option=json.OPT_INDENT_2).decode())
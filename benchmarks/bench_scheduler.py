@@ -0,0 +1,91 @@
+"""
+Measure schedule loading of TortoiseScheduleSource on SQLite.
+
+The database is in memory by default, set SQLITE_FILE_PATH to measure a
+file. For each table size, half of the rows belong to another schedule
+alias and a tenth are disabled, like a table shared by several schedulers.
+
+Run with `python -m benchmarks.bench_scheduler`.
+"""
+
+import os
+
+os.environ.setdefault("UNFAZED_SETTINGS_MODULE", "benchmarks.settings")
+
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from taskiq import ScheduledTask
+from tortoise import Tortoise
+from unfazed.core import Unfazed
+
+from unfazed_taskiq.contrib.scheduler.models import PeriodicTask
+from unfazed_taskiq.contrib.scheduler.sources import TortoiseScheduleSource
+
+SIZES = (100, 1000, 10000)
+LOADS = 10
+SENDS = 200
+
+
+def rows(size: int) -> List[PeriodicTask]:
+    return [
+        PeriodicTask(
+            schedule_alias="bench" if i % 2 == 0 else "other",
+            task_name=f"bench.task_{i % 50}",
+            task_args="[1, 2]",
+            task_kwargs='{"key": "value"}',
+            labels="{}",
+            cron="*/5 * * * *",
+            enabled=0 if i % 10 == 0 else 1,
+        )
+        for i in range(size)
+    ]
+
+
+async def measure(size: int, loads: int, sends: int) -> Dict[str, float]:
+    unfazed = Unfazed(silent=True)
+    await unfazed.setup()
+    await Tortoise.generate_schemas()
+    try:
+        await PeriodicTask.bulk_create(rows(size), batch_size=1000)
+        source = TortoiseScheduleSource(schedule_alias="bench")
+        await source.startup()
+
+        durations = []
+        for _ in range(loads):
+            started_at = time.perf_counter()
+            schedules = await source.get_schedules()
+            durations.append(time.perf_counter() - started_at)
+        load = sorted(durations)[len(durations) // 2]
+
+        sent: List[ScheduledTask] = schedules[:sends]
+        started_at = time.perf_counter()
+        for schedule in sent:
+            await source.pre_send(schedule)
+            await source.post_send(schedule)
+        send = time.perf_counter() - started_at
+        await source.shutdown()
+    finally:
+        await Tortoise._drop_databases()
+    return {
+        "schedules": len(schedules),
+        "load_ms": load * 1e3,
+        "load_per_schedule_us": load / max(len(schedules), 1) * 1e6,
+        "send_us": send / max(len(sent), 1) * 1e6,
+    }
+
+
+def run(sizes: tuple = SIZES, loads: int = LOADS, sends: int = SENDS) -> Dict[str, Any]:
+    """:return: load and send times for each table size."""
+    return {str(size): asyncio.run(measure(size, loads, sends)) for size in sizes}
+
+
+if __name__ == "__main__":
+    for size, result in run().items():
+        print(
+            f"{size:>6} rows: {result['schedules']:6.0f} schedules"
+            f"  load {result['load_ms']:8.2f} ms"
+            f"  {result['load_per_schedule_us']:6.1f} us/schedule"
+            f"  send {result['send_us']:7.1f} us"
+        )
@@ -0,0 +1,72 @@
+"""
+Compare the built-in serializers with taskiq's default JSON serializer.
+
+Run with `python -m benchmarks.bench_serializers`.
+"""
+
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Tuple
+
+from taskiq import InMemoryBroker, TaskiqMessage
+from taskiq.abc.serializer import TaskiqSerializer
+from taskiq.serializers import JSONSerializer
+
+from benchmarks.bench_compression import make_payload
+from unfazed_taskiq.serializers import MSGPackSerializer, ORJSONSerializer
+
+PAYLOAD_SIZES = (100, 10 * 1024, 1024 * 1024)
+
+SERIALIZERS: Tuple[Tuple[str, Callable[[], TaskiqSerializer]], ...] = (
+    ("json", JSONSerializer),
+    ("orjson", ORJSONSerializer),
+    ("msgpack", MSGPackSerializer),
+)
+
+
+def timed(func: Any, rounds: int) -> float:
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started_at) / rounds * 1e6
+
+
+def run() -> List[Dict[str, Any]]:
+    rows = []
+    for size in PAYLOAD_SIZES:
+        message = TaskiqMessage(
+            task_id="id",
+            task_name="bench",
+            labels={"priority": 1},
+            args=[make_payload(size)],
+            kwargs={},
+        )
+        rounds = max(5, 5_000_000 // size)
+        for name, factory in SERIALIZERS:
+            try:
+                serializer = factory()
+            except ImportError:
+                continue
+            formatter = InMemoryBroker().with_serializer(serializer).formatter
+            body = formatter.dumps(message).message
+            rows.append(
+                {
+                    "payload": size,
+                    "serializer": name,
+                    "bytes": len(body),
+                    "dumps_us": timed(partial(formatter.dumps, message), rounds),
+                    "loads_us": timed(partial(formatter.loads, body), rounds),
+                }
+            )
+    return rows
+
+
+if __name__ == "__main__":
+    print(
+        f"{'payload':>9} {'serializer':>10} {'bytes':>9} {'dumps us':>10} {'loads us':>10}"
+    )
+    for row in run():
+        print(
+            f"{row['payload']:>9} {row['serializer']:>10} {row['bytes']:>9} "
+            f"{row['dumps_us']:>10.1f} {row['loads_us']:>10.1f}"
+        )
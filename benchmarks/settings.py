@@ -0,0 +1,49 @@
+"""
+Settings of the benchmarks, every alias uses an in-memory broker.
+
+The scheduler tables live in an in-memory SQLite database, or in the file
+named by SQLITE_FILE_PATH.
+"""
+
+import os
+
+UNFAZED_SETTINGS = {
+    "LIFESPAN": [],
+    "INSTALLED_APPS": ["unfazed_taskiq.contrib.scheduler"],
+    "DATABASE": {
+        "CONNECTIONS": {
+            "default": {
+                "ENGINE": "tortoise.backends.sqlite",
+                "CREDENTIALS": {
+                    "FILE_PATH": os.getenv("SQLITE_FILE_PATH", ":memory:"),
+                },
+            },
+        },
+    },
+}
+
+MIDDLEWARES = [
+    "unfazed_taskiq.middleware.UnfazedTaskiqExceptionMiddleware",
+    "unfazed_taskiq.middleware.UnfazedTaskiqMetricsMiddleware",
+    "unfazed_taskiq.middleware.UnfazedTaskiqRateLimitMiddleware",
+    "unfazed_taskiq.middleware.UnfazedTaskiqConcurrencyMiddleware",
+    "unfazed_taskiq.middleware.UnfazedTaskiqWorkflowMiddleware",
+]
+
+
+def alias(middlewares: bool = False) -> dict:
+    return {
+        "BROKER": {
+            "BACKEND": "taskiq.InMemoryBroker",
+            "MIDDLEWARES": MIDDLEWARES if middlewares else [],
+        },
+    }
+
+
+UNFAZED_TASKIQ_SETTINGS = {
+    "DEFAULT_TASKIQ_NAME": "bench",
+    "TASKIQ_CONFIG": {
+        "bench": alias(),
+        "bench_middlewares": alias(middlewares=True),
+    },
+}
@@ -4,22 +4,34 @@ from unfazed_taskiq.contrib.scheduler.sources import TortoiseScheduleSource
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 
+# TEST_DATABASE=sqlite runs without a MySQL service, on an in-memory
+# database unless SQLITE_FILE_PATH names a file
+if os.getenv("TEST_DATABASE", "mysql") == "sqlite":
+    DEFAULT_CONNECTION = {
+        "ENGINE": "tortoise.backends.sqlite",
+        "CREDENTIALS": {
+            "FILE_PATH": os.getenv("SQLITE_FILE_PATH", ":memory:"),
+        },
+    }
+else:
+    DEFAULT_CONNECTION = {
+        "ENGINE": "tortoise.backends.mysql",
+        "CREDENTIALS": {
+            "HOST": os.getenv("MYSQL_HOST", "mysql"),
+            "PORT": os.getenv("MYSQL_PORT", 3306),
+            "USER": os.getenv("MYSQL_USER", "root"),
+            "PASSWORD": os.getenv("MYSQL_PASSWORD", "app"),
+            "DATABASE": "test_app",
+        },
+    }
+
 UNFAZED_SETTINGS = {
     "LIFESPAN": [],
     "ROOT_URLCONF": "tests.proj.entry.routes",
     "INSTALLED_APPS": ["tests.proj.app1", "unfazed_taskiq.contrib.scheduler"],
     "DATABASE": {
         "CONNECTIONS": {
-            "default": {
-                "ENGINE": "tortoise.backends.mysql",
-                "CREDENTIALS": {
-                    "HOST": os.getenv("MYSQL_HOST", "mysql"),
-                    "PORT": os.getenv("MYSQL_PORT", 3306),
-                    "USER": os.getenv("MYSQL_USER", "root"),
-                    "PASSWORD": os.getenv("MYSQL_PASSWORD", "app"),
-                    "DATABASE": "test_app",
-                },
-            },
+            "default": DEFAULT_CONNECTION,
         },
     },
     # "LOGGING": {
@@ -173,6 +173,77 @@ class TestAgentHandler:
         assert handler.storage["alpha"] is fake_agent
         assert handler._ready is True
 
+    def test_setup_routes(
+        self, handler_module: Any, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        handler = self._make_handler(handler_module, monkeypatch)
+        monkeypatch.setenv("UNFAZED_SETTINGS_MODULE", "module.path")
+        broker = {"BROKER": {"BACKEND": "taskiq.InMemoryBroker", "OPTIONS": {}}}
+        config: Dict[str, Any] = {
+            "DEFAULT_TASKIQ_NAME": "alpha",
+            "TASKIQ_CONFIG": {"alpha": broker, "beta": broker},
+            "ROUTES": {
+                "tenants": {
+                    "ALIASES": ["alpha", "beta"],
+                    "KEY": "tenant_id",
+                    "RULES": [{"LABELS": {"priority": "high"}, "ALIAS": "alpha"}],
+                }
+            },
+        }
+        monkeypatch.setattr(
+            handler_module,
+            "import_setting",
+            lambda _: {"UNFAZED_TASKIQ_SETTINGS": config},
+        )
+        monkeypatch.setattr(
+            handler_module.TaskiqAgent,
+            "setup",
+            lambda alias, _: SimpleNamespace(alias_name=alias, broker=f"b-{alias}"),
+        )
+
+        handler.setup()
+
+        router = handler.get_router("tenants")
+        assert router.brokers == {"alpha": "b-alpha", "beta": "b-beta"}
+        assert router.select({"priority": "high"}) == "alpha"
+        assert handler.get_router("missing") is None
+
+        handler.reset()
+        config["ROUTES"]["tenants"]["ALIASES"] = ["alpha", "gamma"]
+        with pytest.raises(ValueError, match="unknown alias gamma"):
+            handler.setup()
+
+    def test_setup_thread_pools(
+        self, handler_module: Any, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        handler = self._make_handler(handler_module, monkeypatch)
+        monkeypatch.setenv("UNFAZED_SETTINGS_MODULE", "module.path")
+        config = {
+            "DEFAULT_TASKIQ_NAME": "alpha",
+            "TASKIQ_CONFIG": {
+                "alpha": {"BROKER": {"BACKEND": "taskiq.InMemoryBroker"}},
+            },
+            "THREAD_POOLS": {"payments": {"MAX_WORKERS": 3}},
+        }
+        monkeypatch.setattr(
+            handler_module,
+            "import_setting",
+            lambda _: {"UNFAZED_TASKIQ_SETTINGS": config},
+        )
+        monkeypatch.setattr(
+            handler_module.TaskiqAgent,
+            "setup",
+            lambda alias, _: SimpleNamespace(alias_name=alias, broker=f"b-{alias}"),
+        )
+
+        handler.setup()
+
+        pool = handler.get_thread_pool("payments")
+        assert pool.max_workers == 3
+        assert handler.get_thread_pool("missing") is None
+        handler.reset()
+        assert handler.thread_pools == {}
+
     def test_setup_when_already_ready(
         self, handler_module: Any, monkeypatch: pytest.MonkeyPatch
     ) -> None:
@@ -291,3 +362,18 @@ class TestAgentHandler:
 
         first.shutdown.assert_awaited_once()
         second.shutdown.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_drain_uses_drain_timeout(
+        self, handler_module: ModuleType, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        handler = self._make_handler(handler_module, monkeypatch)
+        handler.drain_timeout = 12
+        drain = AsyncMock(return_value="report")
+        monkeypatch.setattr(handler_module, "drain", drain)
+
+        assert await handler.drain() == "report"
+        assert await handler.drain(timeout=1) == "report"
+
+        assert [call.args[1] for call in drain.await_args_list] == [12, 1]
+        assert drain.await_args_list[0].args[0] is handler_module.in_flight
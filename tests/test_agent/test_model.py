@@ -6,18 +6,46 @@ import pytest
 from taskiq import (
     AckableMessage,
     AsyncBroker,
+    InMemoryBroker,
     ScheduleSource,
     TaskiqEvents,
     TaskiqScheduler,
 )
 from taskiq.abc.middleware import TaskiqMiddleware
 from taskiq.abc.result_backend import AsyncResultBackend
+from taskiq.formatters.json_formatter import JSONFormatter
+from taskiq.formatters.proxy_formatter import ProxyFormatter
 from taskiq.message import BrokerMessage
 from taskiq.result import TaskiqResult
 from taskiq.state import TaskiqState
 
 from unfazed_taskiq.agent.model import TaskiqAgent
-from unfazed_taskiq.settings import Broker, Result, Scheduler, TaskiqConfig
+from unfazed_taskiq.compression import CompressingFormatter
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.mapping import MAP_TASK_NAME
+from unfazed_taskiq.middleware import UnfazedTaskiqMiddleware
+from unfazed_taskiq.receiver import UnfazedReceiver
+from unfazed_taskiq.results import (
+    CachedResultBackend,
+    InMemoryResultNotifier,
+    NotifyingResultBackend,
+)
+from unfazed_taskiq.serializers import ORJSONSerializer
+from unfazed_taskiq.settings import (
+    Broker,
+    Compression,
+    Formatter,
+    Middleware,
+    Notifier,
+    ProcessPool,
+    Result,
+    ResultCache,
+    Scheduler,
+    Serializer,
+    Store,
+    TaskiqConfig,
+)
+from unfazed_taskiq.store import InMemorySharedStore
 
 
 class SchedulerResult:
@@ -111,6 +139,11 @@ class TestTaskiqAgent:
             async def pre_execute(self, message: BrokerMessage) -> BrokerMessage:  # type: ignore
                 return message
 
+        class StoreMiddleware(UnfazedTaskiqMiddleware):
+            def __init__(self, **kwargs: Any) -> None:
+                super().__init__()
+                self.kwargs = kwargs
+
         class EventHandler:
             def __call__(self, state: TaskiqState) -> None:
                 state.custom["called"] = True  # type: ignore[attr-defined]
@@ -152,15 +185,36 @@ class TestTaskiqAgent:
             async def get_schedules(self) -> List[SchedulerResult]:  # type: ignore
                 return []
 
+        class SharedStore(InMemorySharedStore):
+            def __init__(self, **kwargs: Any) -> None:
+                super().__init__()
+                self.kwargs = kwargs
+                self.startup_mock: AsyncMock = AsyncMock()
+                self.shutdown_mock: AsyncMock = AsyncMock()
+
+            async def startup(self) -> None:
+                await self.startup_mock()
+
+            async def shutdown(self) -> None:
+                await self.shutdown_mock()
+
         doubles_module = {
             "tests.doubles.FakeBroker": FakeBroker,
             "tests.doubles.MiddlewareA": MiddlewareA,
             "tests.doubles.MiddlewareB": MiddlewareB,
+            "tests.doubles.StoreMiddleware": StoreMiddleware,
             "tests.doubles.EventHandler": EventHandler,
             "tests.doubles.ResultBackend": FakeResultBackend,
             "tests.doubles.SchedulerBackend": SchedulerBackend,
             "tests.doubles.SourceFactory": SourceFactory,
             "tests.doubles.BoundSource": BoundSource,
+            "tests.doubles.SharedStore": SharedStore,
+            "unfazed_taskiq.store.InMemorySharedStore": InMemorySharedStore,
+            "unfazed_taskiq.serializers.ORJSONSerializer": ORJSONSerializer,
+            "unfazed_taskiq.results.InMemoryResultNotifier": InMemoryResultNotifier,
+            "taskiq.formatters.proxy_formatter.ProxyFormatter": ProxyFormatter,
+            "taskiq.formatters.json_formatter.JSONFormatter": JSONFormatter,
+            "taskiq.InMemoryBroker": InMemoryBroker,
         }
 
         module = type(sys)("tests.doubles")
@@ -203,6 +257,159 @@ class TestTaskiqAgent:
         assert len(scheduler.sources) == 2
         assert scheduler.sources[0].source.startswith("source-")  # type: ignore
         assert isinstance(scheduler.sources[1], ScheduleSource)
+        assert broker.decorator_class is UnfazedTaskiqDecoratedTask
+        assert broker.find_task(MAP_TASK_NAME) is not None
+        assert isinstance(agent.store, InMemorySharedStore)
+
+    async def test_setup_custom_store(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(BACKEND="tests.doubles.FakeBroker"),
+            STORE=Store(BACKEND="tests.doubles.SharedStore", OPTIONS={"url": "x"}),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        assert agent.store.kwargs == {"url": "x"}  # type: ignore
+
+        await agent.startup()
+        agent.store.startup_mock.assert_awaited_once()  # type: ignore
+        await agent.shutdown()
+        agent.store.shutdown_mock.assert_awaited_once()  # type: ignore
+
+    def test_setup_middleware_options(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(
+                BACKEND="tests.doubles.FakeBroker",
+                MIDDLEWARES=[
+                    "tests.doubles.MiddlewareA",
+                    Middleware(
+                        BACKEND="tests.doubles.StoreMiddleware",
+                        OPTIONS={"limits": {"job": "1/s"}},
+                    ),
+                ],
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        middleware = agent.broker.middlewares[1]
+        assert middleware.kwargs == {"limits": {"job": "1/s"}}  # type: ignore
+        assert middleware.store is agent.store  # type: ignore
+        assert middleware.alias_name == "alias"  # type: ignore
+
+    def test_setup_compression(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(
+                BACKEND="tests.doubles.FakeBroker",
+                COMPRESSION=Compression(THRESHOLD=1024, LEVEL=6),
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        formatter = agent.broker.formatter
+        assert isinstance(formatter, CompressingFormatter)
+        assert formatter.threshold == 1024
+        assert formatter.level == 6
+        assert formatter.codec.name == "zlib"
+
+    def test_setup_result_cache(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(BACKEND="tests.doubles.FakeBroker"),
+            RESULT=Result(
+                BACKEND="tests.doubles.ResultBackend",
+                OPTIONS={"ttl": 5},
+                CACHE=ResultCache(MAXSIZE=10, TTL=60),
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        result_backend = agent.broker.result_backend
+        assert isinstance(result_backend, CachedResultBackend)
+        assert isinstance(result_backend.backend, self.fake_classes["result_backend"])
+        assert result_backend.results.maxsize == 10
+        assert result_backend.ttl == 60
+
+    def test_setup_result_notifier(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(BACKEND="tests.doubles.FakeBroker"),
+            RESULT=Result(
+                BACKEND="tests.doubles.ResultBackend",
+                CACHE=ResultCache(),
+                NOTIFIER=Notifier(
+                    BACKEND="unfazed_taskiq.results.InMemoryResultNotifier",
+                    POLL_INTERVAL=2,
+                ),
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        result_backend = agent.broker.result_backend
+        assert isinstance(result_backend, NotifyingResultBackend)
+        assert isinstance(result_backend.notifier, InMemoryResultNotifier)
+        assert result_backend.poll_interval == 2
+        assert isinstance(result_backend.backend, CachedResultBackend)
+
+    async def test_setup_process_pool(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(BACKEND="tests.doubles.FakeBroker"),
+            PROCESS_POOL=ProcessPool(
+                MAX_WORKERS=3, SHARED_MEMORY_THRESHOLD=None, INITIALIZER=None
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        process_pool = agent.process_pool
+        assert process_pool.max_workers == 3
+        assert process_pool.shared_memory_threshold is None
+        assert process_pool.prewarm is True
+        handlers = agent.broker.event_handlers
+        assert process_pool.worker_startup in handlers[TaskiqEvents.WORKER_STARTUP]
+        assert process_pool.worker_shutdown in handlers[TaskiqEvents.WORKER_SHUTDOWN]
+
+        default = TaskiqAgent.setup(
+            "alias", TaskiqConfig(BROKER=Broker(BACKEND="tests.doubles.FakeBroker"))
+        )
+        # without process tasks the alias has no pool nor pool handlers
+        assert default.process_pool is None
+        process_pool = default.get_process_pool()
+        assert default.get_process_pool() is process_pool
+        assert process_pool.prewarm is False
+        assert process_pool.executor is None
+        handlers = default.broker.event_handlers
+        assert process_pool.worker_startup in handlers[TaskiqEvents.WORKER_STARTUP]
+        assert process_pool.worker_shutdown in handlers[TaskiqEvents.WORKER_SHUTDOWN]
+
+    def test_setup_in_memory_receiver(self) -> None:
+        config = TaskiqConfig(BROKER=Broker(BACKEND="taskiq.InMemoryBroker"))
+        agent = TaskiqAgent.setup("alias", config)
+        receiver = agent.broker.receiver  # type: ignore[attr-defined]
+        assert isinstance(receiver, UnfazedReceiver)
+        assert receiver.broker is agent.broker
+        assert receiver.requeue is False
+
+    def test_setup_serializer_and_formatter(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(
+                BACKEND="tests.doubles.FakeBroker",
+                SERIALIZER=Serializer(
+                    BACKEND="unfazed_taskiq.serializers.ORJSONSerializer"
+                ),
+                FORMATTER=Formatter(
+                    BACKEND="taskiq.formatters.proxy_formatter.ProxyFormatter"
+                ),
+                COMPRESSION=Compression(),
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        assert isinstance(agent.broker.serializer, ORJSONSerializer)
+        formatter = agent.broker.formatter
+        assert isinstance(formatter, CompressingFormatter)
+        assert isinstance(formatter.formatter, ProxyFormatter)
+        assert formatter.formatter.broker is agent.broker
+
+    def test_setup_formatter_without_broker(self) -> None:
+        config = TaskiqConfig(
+            BROKER=Broker(
+                BACKEND="tests.doubles.FakeBroker",
+                FORMATTER=Formatter(
+                    BACKEND="taskiq.formatters.json_formatter.JSONFormatter"
+                ),
+            ),
+        )
+        agent = TaskiqAgent.setup("alias", config)
+        assert isinstance(agent.broker.formatter, JSONFormatter)
 
     def test_setup_without_optional_sections(
         self, monkeypatch: pytest.MonkeyPatch
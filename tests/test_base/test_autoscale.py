@@ -0,0 +1,141 @@
+import signal
+import time
+from typing import Any, Iterator
+
+import pytest
+from taskiq.cli.worker.args import WorkerArgs
+
+from unfazed_taskiq.autoscale import (
+    Autoscaler,
+    AutoscalingProcessManager,
+    InMemoryDepthSampler,
+    QueueDepth,
+)
+
+
+def idle_worker(args: WorkerArgs) -> None:
+    time.sleep(30)
+
+
+def stubborn_worker(args: WorkerArgs) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    time.sleep(30)
+
+
+def wait_for(predicate: Any, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class TestAutoscaler:
+    def test_grows_to_the_backlog(self) -> None:
+        scaler = Autoscaler(min_workers=1, max_workers=8, target_depth=10)
+        assert scaler.decide(1, QueueDepth(5), now=0) == 1
+        assert scaler.decide(1, QueueDepth(45), now=1) == 5
+        # the cooldown holds the pool
+        assert scaler.decide(5, QueueDepth(500), now=2) == 5
+        assert scaler.decide(5, QueueDepth(500), now=40) == 8
+
+    def test_grows_on_lag(self) -> None:
+        scaler = Autoscaler(min_workers=1, max_workers=4, max_lag=10)
+        assert scaler.decide(2, QueueDepth(0, lag=5), now=0) == 2
+        assert scaler.decide(2, QueueDepth(0, lag=30), now=1) == 3
+
+    def test_shrinks_with_hysteresis(self) -> None:
+        scaler = Autoscaler(
+            min_workers=1, max_workers=4, target_depth=10, down_samples=3, cooldown=0
+        )
+        # 3 processes, 12 messages: between both thresholds, nothing happens
+        assert [scaler.decide(3, QueueDepth(12), now=n) for n in range(5)] == [3] * 5
+        # 10 messages or less fit in half of two processes
+        assert [scaler.decide(3, QueueDepth(8), now=n) for n in range(3)] == [3, 3, 2]
+        # a busy sample resets the count
+        scaler.decide(2, QueueDepth(1), now=10)
+        scaler.decide(2, QueueDepth(15), now=11)
+        assert scaler.decide(2, QueueDepth(1), now=12) == 2
+        assert [scaler.decide(1, QueueDepth(0), now=n) for n in range(3)] == [1] * 3
+
+    def test_clamps_and_validates(self) -> None:
+        scaler = Autoscaler(min_workers=2, max_workers=3)
+        assert scaler.clamp(10) == 3
+        assert scaler.decide(1, QueueDepth(0), now=0) == 2
+        with pytest.raises(ValueError):
+            Autoscaler(min_workers=3, max_workers=2)
+        with pytest.raises(ValueError):
+            Autoscaler(target_depth=0)
+
+
+class TestAutoscalingProcessManager:
+    @pytest.fixture(autouse=True)
+    def restore_signals(self) -> Iterator[None]:
+        signals = [signal.SIGINT, signal.SIGTERM, signal.SIGHUP]
+        handlers = [signal.getsignal(signum) for signum in signals]
+        yield
+        for signum, handler in zip(signals, handlers):
+            signal.signal(signum, handler)
+
+    def _manager(self, worker: Any, drain_timeout: float = 5) -> Any:
+        self.sampler = InMemoryDepthSampler()
+        return AutoscalingProcessManager(
+            WorkerArgs(broker="broker", modules=[], workers=1),
+            worker,
+            self.sampler,
+            Autoscaler(min_workers=1, max_workers=3, target_depth=10, cooldown=0),
+            interval=0,
+            drain_timeout=drain_timeout,
+        )
+
+    def test_scales_and_drains(self) -> None:
+        manager = self._manager(idle_worker)
+        try:
+            manager.prepare_workers()
+            assert len(manager.workers) == 1
+
+            self.sampler.set(25)
+            manager.autoscale()
+            assert [worker.name for worker in manager.workers] == [
+                "worker-0",
+                "worker-1",
+                "worker-2",
+            ]
+            assert all(worker.is_alive() for worker in manager.workers)
+
+            # let the processes boot before signalling one
+            time.sleep(0.2)
+            retired = manager.workers[-1]
+            manager.scale(2)
+            assert len(manager.retiring) == 1
+            wait_for(lambda: not retired.is_alive())
+            manager.reap()
+            assert manager.retiring == []
+            assert retired.exitcode is not None
+        finally:
+            time.sleep(0.2)
+            manager.scale(0)
+            wait_for(lambda: all(not p.is_alive() for p, _ in manager.retiring))
+            manager.reap()
+
+    def test_kills_after_drain_timeout(self) -> None:
+        manager = self._manager(stubborn_worker, drain_timeout=0.2)
+        manager.prepare_workers()
+        worker = manager.workers[0]
+        time.sleep(0.2)
+        manager.scale(0)
+        manager.reap()
+        assert manager.retiring
+        time.sleep(0.3)
+        manager.reap()
+        assert manager.retiring == []
+        assert worker.exitcode == -signal.SIGKILL
+
+    def test_sampling_errors_keep_the_pool(self) -> None:
+        manager = self._manager(idle_worker)
+
+        async def broken() -> QueueDepth:
+            raise ConnectionError
+
+        manager.sampler.sample = broken  # type: ignore[method-assign]
+        manager.autoscale()
+        assert manager.workers == []
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+from taskiq import Context, TaskiqDepends
+from taskiq.brokers.inmemory_broker import InmemoryResultBackend
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.cache import LRUCache, TaskMemo, make_args_key, memoize
+from unfazed_taskiq.executors import task_executor
+
+
+class TestLRUCache:
+    def test_eviction_order(self) -> None:
+        cache: LRUCache[int] = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+
+    def test_ttl(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [100.0]
+        monkeypatch.setattr("unfazed_taskiq.cache.time.monotonic", lambda: now[0])
+        cache: LRUCache[str] = LRUCache()
+        cache.set("k", "v", ttl=10)
+        assert "k" in cache
+        now[0] = 111.0
+        assert cache.get("k") is None
+
+    def test_invalidate_prefix(self) -> None:
+        cache: LRUCache[int] = LRUCache()
+        cache.set("report:1", 1)
+        cache.set("report:2", 2)
+        cache.set("user:1", 3)
+        assert cache.invalidate_prefix("report:") == 2
+        assert len(cache) == 1
+
+    def test_invalid_maxsize(self) -> None:
+        with pytest.raises(ValueError):
+            LRUCache(maxsize=0)
+
+
+def render(a: int, b: int = 2) -> int:
+    return a + b
+
+
+class TestTaskMemo:
+    def test_normalized_key(self) -> None:
+        memo = TaskMemo(render)
+        assert memo.make_key(1) == memo.make_key(a=1, b=2) == memo.make_key(1, 2)
+        assert memo.make_key(1) != memo.make_key(2)
+        assert make_args_key([1], {"x": 1, "y": 2}) == make_args_key(
+            [1], {"y": 2, "x": 1}
+        )
+
+    def test_custom_key(self) -> None:
+        memo = TaskMemo(render, key=lambda a, b=2: f"sum:{a}")
+        assert memo.make_key(1, b=5) == "sum:1"
+
+    def test_key_ignores_dependencies(self) -> None:
+        def report(
+            report_id: int,
+            context: Context = TaskiqDepends(),  # noqa: B008
+        ) -> None:
+            pass
+
+        memo = TaskMemo(report)
+        assert memo.make_key(1, context=object()) == memo.make_key(report_id=1)
+        custom = TaskMemo(report, key=lambda report_id: f"report:{report_id}")
+        assert custom.make_key(1, context=object()) == "report:1"
+
+    async def test_local_and_backend_tiers(self) -> None:
+        backend: InmemoryResultBackend[Any] = InmemoryResultBackend()
+        calls: list[int] = []
+
+        async def add(a: int) -> int:
+            calls.append(a)
+            return a + 1
+
+        memo = TaskMemo(add, ttl=60, result_backend=lambda: backend)
+        wrapped = memoize(add, memo)
+
+        assert await wrapped(1) == 2
+        assert await wrapped(1) == 2
+        assert calls == [1]
+        assert memo.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+        # a fresh process only shares the result backend
+        other = TaskMemo(add, ttl=60, result_backend=lambda: backend)
+        assert await memoize(add, other)(1) == 2
+        assert calls == [1]
+        assert other.hits == 1
+
+    async def test_expired_backend_entry(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        backend: InmemoryResultBackend[Any] = InmemoryResultBackend()
+        memo = TaskMemo(render, ttl=1, result_backend=lambda: backend)
+        await memo.store("k", 1)
+        memo.local.clear()
+
+        real_time = __import__("time").time
+        monkeypatch.setattr("unfazed_taskiq.cache.time.time", lambda: real_time() + 5)
+        assert await memo.lookup("k") == (False, None)
+
+    async def test_invalidate_prefix(self) -> None:
+        backend: InmemoryResultBackend[Any] = InmemoryResultBackend()
+        memo = TaskMemo(render, result_backend=lambda: backend)
+        await memo.store("report:1", 1)
+        await memo.store("user:1", 2)
+
+        assert await memo.invalidate("report:") == 1
+        assert await memo.lookup("report:1") == (False, None)
+        assert await memo.lookup("user:1") == (True, 2)
+
+        await memo.store("report:1", 3)
+        memo.local.clear()
+        assert await memo.lookup("report:1") == (True, 3)
+
+    async def test_invalidate_reaches_other_processes(self) -> None:
+        backend: InmemoryResultBackend[Any] = InmemoryResultBackend()
+        worker = TaskMemo(render, result_backend=lambda: backend, refresh_interval=0)
+        web = TaskMemo(render, result_backend=lambda: backend)
+        await worker.store("report:1", 1)
+        await worker.store("user:1", 2)
+        assert await worker.lookup("report:1") == (True, 1)
+
+        assert await web.invalidate("report:") == 0
+        await web.invalidate("user:")
+        # the worker drops the entry of its LRU as well
+        assert await worker.lookup("report:1") == (False, None)
+        assert await worker.lookup("user:1") == (False, None)
+        await worker.store("report:1", 3)
+        assert await worker.lookup("report:1") == (True, 3)
+
+    def test_prune_invalidations(self) -> None:
+        memo = TaskMemo(render)
+        assert memo._prune({"report:1": 1.0, "report:": 2.0, "user:": 1.0}) == {
+            "report:": 2.0,
+            "user:": 1.0,
+        }
+        assert memo._prune({"report:1": 3.0, "report:": 2.0}) == {
+            "report:1": 3.0,
+            "report:": 2.0,
+        }
+
+    async def test_dummy_backend_is_skipped(self) -> None:
+        memo = TaskMemo(render, result_backend=lambda: DummyResultBackend())
+        assert await memo.lookup("missing") == (False, None)
+
+    async def test_sync_function_and_none_result(self) -> None:
+        calls: list[int] = []
+
+        def noop(a: int) -> None:
+            calls.append(a)
+
+        wrapped = memoize(noop, TaskMemo(noop))
+        assert asyncio.iscoroutinefunction(wrapped)
+        assert await wrapped(1) is None
+        assert await wrapped(1) is None
+        assert calls == [1]
+
+    async def test_sync_function_runs_in_task_executor(self) -> None:
+        threads: list[str] = []
+
+        def name(a: int) -> int:
+            threads.append(threading.current_thread().name)
+            return a
+
+        executor = ThreadPoolExecutor(1, thread_name_prefix="receiver")
+        task_executor.set(executor)
+        try:
+            assert await memoize(name, TaskMemo(name))(1) == 1
+        finally:
+            executor.shutdown()
+        assert threads[0].startswith("receiver")
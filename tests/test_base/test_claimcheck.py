@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from taskiq import InMemoryBroker, SimpleRetryMiddleware, TaskiqMessage, TaskiqResult
+
+from unfazed_taskiq.blobstore import FileSystemBlobStore, InMemoryBlobStore
+from unfazed_taskiq.middleware import UnfazedTaskiqClaimCheckMiddleware
+
+
+class TestFileSystemBlobStore:
+    async def test_put_get_delete(self, tmp_path: Path) -> None:
+        store = FileSystemBlobStore(str(tmp_path))
+        await store.put("a/b/c", b"data")
+        assert await store.get("a/b/c") == b"data"
+        assert (tmp_path / "a" / "b" / "c").read_bytes() == b"data"
+        await store.delete("a/b/c")
+        await store.delete("a/b/c")
+        with pytest.raises(KeyError):
+            await store.get("a/b/c")
+
+    async def test_mmap(self, tmp_path: Path) -> None:
+        store = FileSystemBlobStore(str(tmp_path), use_mmap=True)
+        await store.put("blob", b"x" * 10000)
+        blob = await store.get("blob")
+        assert isinstance(blob, memoryview)
+        assert bytes(blob[:3]) == b"xxx"
+        assert len(blob) == 10000
+        await store.put("empty", b"")
+        assert await store.get("empty") == b""
+
+    async def test_cleanup(self, tmp_path: Path) -> None:
+        store = FileSystemBlobStore(str(tmp_path))
+        await store.put("task/old", b"data")
+        await store.put("fresh", b"data")
+        past = time.time() - 120
+        os.utime(tmp_path / "task" / "old", (past, past))
+        os.utime(tmp_path / "task", (past, past))
+
+        assert await store.cleanup(60) == 1
+        assert sorted(os.listdir(tmp_path)) == ["fresh"]
+        assert await store.cleanup(60) == 0
+
+    async def test_keys_stay_inside_directory(self, tmp_path: Path) -> None:
+        store = FileSystemBlobStore(str(tmp_path / "blobs"))
+        await store.put("../../escape", b"data")
+        assert (tmp_path / "blobs" / "escape").exists()
+
+
+class TestUnfazedTaskiqClaimCheckMiddleware:
+    def _broker(self, **kwargs: Any) -> Any:
+        store = InMemoryBlobStore()
+        middleware = UnfazedTaskiqClaimCheckMiddleware(
+            blob_store=store, threshold=1024, **kwargs
+        )
+        middleware.with_store(None, "alias")  # type: ignore[arg-type]
+        broker = InMemoryBroker(await_inplace=True)
+        broker.add_middlewares(middleware)
+
+        bodies: List[bytes] = []
+        dumps = broker.formatter.dumps
+
+        def capture(message: TaskiqMessage) -> Any:
+            broker_message = dumps(message)
+            bodies.append(broker_message.message)
+            return broker_message
+
+        broker.formatter.dumps = capture  # type: ignore[method-assign]
+        return broker, middleware, store, bodies
+
+    async def test_large_arguments_are_offloaded(self) -> None:
+        broker, middleware, store, bodies = self._broker()
+        received: Dict[str, Any] = {}
+
+        @broker.task(task_name="big")
+        async def big(text: str, items: List[int], small: int, data: Any) -> None:
+            received.update(text=text, items=items, small=small, data=data)
+            assert len(store.blobs) == 3
+
+        await big.kiq("x" * 2000, list(range(1000)), 1, data=b"\x00" * 2000)
+
+        assert received == {
+            "text": "x" * 2000,
+            "items": list(range(1000)),
+            "small": 1,
+            "data": b"\x00" * 2000,
+        }
+        assert len(bodies[0]) < 1024
+        assert middleware.offloaded == 3
+        # deleted after success
+        assert store.blobs == {}
+
+    async def test_small_arguments_stay_inline(self) -> None:
+        broker, middleware, store, bodies = self._broker()
+
+        @broker.task(task_name="small")
+        async def small(text: str) -> str:
+            return text
+
+        task = await small.kiq("x" * 200)
+        result = await task.wait_result()
+        assert result.return_value == "x" * 200
+        assert b"x" * 200 in bodies[0]
+        assert b"claim_check" not in bodies[0]
+        assert middleware.offloaded == 0
+
+    async def test_blobs_are_deleted_on_error(self) -> None:
+        broker, middleware, store, bodies = self._broker()
+        keys: List[str] = []
+
+        @broker.task(task_name="failing")
+        async def failing(text: str) -> None:
+            keys.extend(store.blobs)
+            raise ValueError("boom")
+
+        task = await failing.kiq("x" * 2000)
+        result = await task.wait_result()
+        assert result.is_err
+        claim_check_id = result.labels["claim_check_id"]
+        assert keys == [
+            f"unfazed_taskiq/claimcheck/alias/{task.task_id}/{claim_check_id}/a0"
+        ]
+        assert store.blobs == {}
+
+    async def test_retries_keep_their_blobs(self) -> None:
+        broker, middleware, store, bodies = self._broker()
+        broker.add_middlewares(SimpleRetryMiddleware(default_retry_count=2))
+        received: List[str] = []
+
+        @broker.task(task_name="flaky", retry_on_error=True)
+        async def flaky(text: str) -> None:
+            received.append(text)
+            if len(received) == 1:
+                raise ValueError("boom")
+
+        # the retry runs after the failed attempt finished, like on a worker
+        broker.await_inplace = False
+        await flaky.kiq("x" * 2000)
+        await broker.wait_all()
+        assert received == ["x" * 2000] * 2
+        assert middleware.offloaded == 2
+        assert store.blobs == {}
+
+    async def test_bytes_views_are_opt_in(self, tmp_path: Path) -> None:
+        store = FileSystemBlobStore(str(tmp_path), use_mmap=True)
+        middleware = UnfazedTaskiqClaimCheckMiddleware(blob_store=store, threshold=1024)
+        broker = InMemoryBroker(await_inplace=True)
+        broker.add_middlewares(middleware)
+        received: List[Any] = []
+
+        @broker.task(task_name="raw")
+        async def raw(data: Any) -> None:
+            received.append(data)
+
+        await raw.kiq(b"\x00" * 2000)
+        await raw.kicker().with_labels(claim_check_view=True).kiq(b"\x00" * 2000)
+        assert type(received[0]) is bytes
+        assert isinstance(received[1], memoryview)
+        assert received[0] == bytes(received[1])
+
+    async def test_old_blobs_are_swept(self) -> None:
+        broker, middleware, store, _ = self._broker(blob_ttl=0.1)
+        broker.is_worker_process = True
+        await store.put("leftover", b"data")
+        await middleware.startup()
+        await asyncio.sleep(0.2)
+        assert store.blobs == {}
+        await middleware.shutdown()
+        assert middleware.sweeper is None
+
+    async def test_missing_blob(self) -> None:
+        _, middleware, store, _ = self._broker()
+        message = TaskiqMessage(
+            task_id="id",
+            task_name="job",
+            labels={},
+            args=["x" * 2000],
+            kwargs={},
+        )
+        middleware.broker = InMemoryBroker()
+        await middleware.pre_send(message)
+        assert message.args == [None]
+        store.blobs.clear()
+
+        with pytest.raises(ValueError, match="missing from the blob store"):
+            await middleware.pre_execute(message)
+
+    async def test_resend_drops_stale_label(self) -> None:
+        _, middleware, _, _ = self._broker()
+        middleware.broker = InMemoryBroker()
+        message = TaskiqMessage(
+            task_id="id",
+            task_name="job",
+            labels={"claim_check": '{"a0":"s"}'},
+            args=["small"],
+            kwargs={},
+        )
+        await middleware.pre_send(message)
+        assert "claim_check" not in message.labels
+        await middleware.post_execute(
+            message,
+            TaskiqResult(is_err=False, return_value=None, execution_time=0),
+        )
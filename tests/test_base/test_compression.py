@@ -0,0 +1,70 @@
+import pytest
+from taskiq import InMemoryBroker, TaskiqMessage
+
+from unfazed_taskiq.compression import COMPRESSED_MAGIC, CompressingFormatter
+
+
+def _message(payload: str) -> TaskiqMessage:
+    return TaskiqMessage(
+        task_id="id", task_name="job", labels={"a": 1}, args=[payload], kwargs={}
+    )
+
+
+class TestCompressingFormatter:
+    def _formatter(self, **kwargs: object) -> CompressingFormatter:
+        broker = InMemoryBroker()
+        return CompressingFormatter(broker.formatter, **kwargs)  # type: ignore[arg-type]
+
+    def test_small_messages_are_untouched(self) -> None:
+        formatter = self._formatter(threshold=1024)
+        message = _message("x" * 10)
+        broker_message = formatter.dumps(message)
+        assert not broker_message.message.startswith(COMPRESSED_MAGIC)
+        assert "compression" not in broker_message.labels
+        assert formatter.loads(broker_message.message) == message
+
+    def test_large_messages_are_compressed(self) -> None:
+        formatter = self._formatter(threshold=1024)
+        message = _message('{"key": "value"}' * 1000)
+        broker_message = formatter.dumps(message)
+
+        assert broker_message.message.startswith(COMPRESSED_MAGIC + b"\x01")
+        assert len(broker_message.message) < 2000
+        assert broker_message.labels == {"a": 1, "compression": "zlib"}
+        # the message itself is not marked, only the broker message
+        assert "compression" not in message.labels
+        loaded = formatter.loads(broker_message.message)
+        assert loaded.args == message.args
+        assert loaded.labels == {"a": 1, "compression": "zlib"}
+
+    def test_incompressible_messages_are_untouched(self) -> None:
+        formatter = self._formatter(threshold=1024)
+        formatter.codec._compress = lambda data, level: data
+        broker_message = formatter.dumps(_message("x" * 4096))
+        assert not broker_message.message.startswith(COMPRESSED_MAGIC)
+        assert "compression" not in broker_message.labels
+
+    def test_loads_from_uncompressed_sender(self) -> None:
+        broker = InMemoryBroker()
+        message = _message("x" * 4096)
+        body = broker.formatter.dumps(message).message
+        assert self._formatter(threshold=1).loads(body) == message
+
+    def test_unknown_codec(self) -> None:
+        with pytest.raises(ValueError, match="Unknown compression codec"):
+            self._formatter(codec="brotli")
+        with pytest.raises(ValueError, match="Unknown compression codec id"):
+            self._formatter().loads(COMPRESSED_MAGIC + b"\x09data")
+
+    async def test_roundtrip_through_broker(self) -> None:
+        broker = InMemoryBroker(await_inplace=True)
+        broker.formatter = CompressingFormatter(broker.formatter, threshold=1024)
+
+        @broker.task
+        async def echo(payload: str) -> int:
+            return len(payload)
+
+        task = await echo.kiq("a" * 100_000)
+        result = await task.wait_result()
+        assert result.return_value == 100_000
+        assert result.labels["compression"] == "zlib"
@@ -1,9 +1,13 @@
+import threading
 from types import SimpleNamespace
 from typing import Any, Callable
 
 import pytest
 
 from unfazed_taskiq import decorators
+from unfazed_taskiq.executors import ThreadPool
+from unfazed_taskiq.metrics import MetricsRegistry
+from unfazed_taskiq.store import InMemorySharedStore
 
 
 class DummyBroker:
@@ -71,6 +75,35 @@ def test_task_decorator_without_parameters(monkeypatch: pytest.MonkeyPatch) -> N
     assert broker.calls == [{}]
 
 
+async def test_task_decorator_with_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    broker = DummyBroker()
+    broker.result_backend = None  # type: ignore[attr-defined]
+    agent = SimpleNamespace(broker=broker)
+    register_calls: list = []
+    calls: list = []
+
+    monkeypatch.setattr(decorators.agents, "get_agent", lambda alias_name: agent)
+    monkeypatch.setattr(
+        decorators.rs,
+        "register_broker",
+        lambda func, alias_name, **kwargs: register_calls.append((func, kwargs)),
+    )
+
+    @decorators.task(cache_ttl=30, cache_key=lambda value: f"v:{value}")
+    async def cached_task(value: int) -> int:
+        calls.append(value)
+        return value * 2
+
+    assert await cached_task(2) == 4
+    assert await cached_task(2) == 4
+    assert calls == [2]
+    assert broker.calls == [{}]
+    assert register_calls[0][0].__name__ == "cached_task"
+    assert register_calls[0][1] == {}
+    assert cached_task.memo.stats()["hits"] == 1  # type: ignore[attr-defined]
+    assert await cached_task.memo.invalidate("v:") == 1  # type: ignore[attr-defined]
+
+
 def test_task_decorator_missing_agent(monkeypatch: pytest.MonkeyPatch) -> None:
     register_calls = []
 
@@ -87,3 +120,88 @@ def test_task_decorator_missing_agent(monkeypatch: pytest.MonkeyPatch) -> None:
         decorators.task(alias_name="ghost")(ghost_task)
 
     assert register_calls == [("ghost", {})]
+
+
+def test_task_decorator_with_idempotency(monkeypatch: pytest.MonkeyPatch) -> None:
+    broker = DummyBroker()
+    store = InMemorySharedStore()
+    agent = SimpleNamespace(broker=broker, store=store)
+
+    monkeypatch.setattr(decorators.agents, "get_agent", lambda alias_name: agent)
+    monkeypatch.setattr(
+        decorators.rs, "register_broker", lambda func, alias_name, **kwargs: None
+    )
+
+    @decorators.task(idempotency_ttl=10, idempotency_key=lambda order_id: order_id)
+    def charge(order_id: str) -> str:
+        return order_id
+
+    deduplicator = charge.deduplicator  # type: ignore[attr-defined]
+    assert deduplicator.ttl == 10
+    assert deduplicator.store is store
+    assert deduplicator.make_key("o-1") == "o-1"
+    assert broker.calls == [{}]
+
+
+async def test_task_decorator_with_process_executor(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    broker = DummyBroker()
+    runs: list = []
+
+    class FakeProcessPool:
+        async def run(self, path: str, args: Any, kwargs: Any) -> str:
+            runs.append((path, args, kwargs))
+            return "remote"
+
+    process_pool = FakeProcessPool()
+    agent = SimpleNamespace(broker=broker, get_process_pool=lambda: process_pool)
+    monkeypatch.setattr(decorators.agents, "get_agent", lambda alias_name: agent)
+    monkeypatch.setattr(
+        decorators.rs, "register_broker", lambda func, alias_name, **kwargs: None
+    )
+
+    @decorators.task(executor="process")
+    def crunch(data: bytes, level: int = 1) -> str:
+        return "local"
+
+    assert await crunch(b"rows", level=9) == "remote"
+    path, args, kwargs = runs[0]
+    assert path.endswith("test_task_decorator_with_process_executor.<locals>.crunch")
+    assert (args, kwargs) == ((b"rows",), {"level": 9})
+
+    with pytest.raises(ValueError, match="Unknown executor gpu"):
+        decorators.task(executor="gpu")(lambda: None)
+
+
+async def test_task_decorator_with_thread_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    broker = DummyBroker()
+    pool = ThreadPool("payments", 1, registry=MetricsRegistry())
+    agent = SimpleNamespace(broker=broker)
+    registered: list = []
+    monkeypatch.setattr(decorators.agents, "get_agent", lambda alias_name: agent)
+    monkeypatch.setattr(
+        decorators.agents,
+        "get_thread_pool",
+        lambda name: pool if name == "payments" else None,
+    )
+    monkeypatch.setattr(
+        decorators.rs,
+        "register_broker",
+        lambda func, alias_name, **kwargs: registered.append(func),
+    )
+
+    @decorators.task(thread_pool="payments")
+    def pay(order_id: int) -> str:
+        return threading.current_thread().name
+
+    assert (await pay(1)).startswith("unfazed-taskiq-payments")
+    assert pool.stats()["completed"] == 1
+
+    with pytest.raises(ValueError, match="Thread pool missing not found"):
+        decorators.task(thread_pool="missing")(lambda: None)
+    with pytest.raises(ValueError, match="cannot be used together"):
+        decorators.task(thread_pool="payments", executor="process")(lambda: None)
+    # invalid options leave no half registered task
+    assert len(registered) == 1
+    pool.shutdown()
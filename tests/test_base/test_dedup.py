@@ -0,0 +1,152 @@
+from typing import Any
+
+import pytest
+from taskiq import InMemoryBroker
+from taskiq.exceptions import SendTaskError
+
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.dedup import Deduplicator
+from unfazed_taskiq.store import InMemorySharedStore
+
+
+class CountingStore(InMemorySharedStore):
+    def __init__(self) -> None:
+        super().__init__()
+        self.round_trips = 0
+
+    async def get_or_set(self, key: str, value: str, ttl: Any = None) -> Any:
+        self.round_trips += 1
+        return await super().get_or_set(key, value, ttl)
+
+
+class TestInMemorySharedStore:
+    async def test_get_or_set(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [0.0]
+        monkeypatch.setattr(
+            "unfazed_taskiq.store.memory.time.monotonic", lambda: now[0]
+        )
+        store = InMemorySharedStore()
+        assert await store.get_or_set("k", "a", ttl=5) is None
+        assert await store.get_or_set("k", "b", ttl=5) == "a"
+        now[0] = 6
+        assert await store.get_or_set("k", "c") is None
+        await store.delete("k")
+        assert await store.get_or_set("k", "d") is None
+
+    async def test_incr(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        now = [0.0]
+        monkeypatch.setattr(
+            "unfazed_taskiq.store.memory.time.monotonic", lambda: now[0]
+        )
+        store = InMemorySharedStore()
+        assert await store.incr("n", ttl=5) == 1
+        assert await store.incr("n", 2, ttl=5) == 3
+        assert await store.incr("n", -1) == 2
+        now[0] = 100
+        assert await store.incr("n", ttl=5) == 3
+        now[0] = 106
+        assert await store.incr("n") == 1
+
+
+class TestDeduplicator:
+    async def test_local_cache_answers_without_round_trip(self) -> None:
+        store = CountingStore()
+        dedup = Deduplicator("job", ttl=60, store=store)
+        assert await dedup.claim("k", "t1") is None
+        assert await dedup.claim("k", "t2") == "t1"
+        assert store.round_trips == 1
+        assert dedup.dropped == 1
+
+    async def test_shared_store_across_processes(self) -> None:
+        store = InMemorySharedStore()
+        first = Deduplicator("job", ttl=60, store=store)
+        second = Deduplicator("job", ttl=60, store=store)
+        assert await first.claim("k", "t1") is None
+        assert await second.claim("k", "t2") == "t1"
+
+        await first.release("k")
+        assert await first.claim("k", "t3") is None
+
+    def test_default_key(self) -> None:
+        dedup = Deduplicator("job", ttl=60)
+        assert dedup.make_key(1, a=2) == dedup.make_key(1, a=2)
+        assert dedup.make_key(1, a=2) != dedup.make_key(1, a=3)
+
+
+class TestUnfazedKicker:
+    def _make_task(self, broker: InMemoryBroker, calls: list) -> Any:
+        broker.decorator_class = UnfazedTaskiqDecoratedTask
+
+        async def charge(order_id: str) -> str:
+            calls.append(order_id)
+            return order_id
+
+        decorated: Any = broker.task(charge)
+        decorated.deduplicator = Deduplicator(
+            decorated.task_name, ttl=60, store=InMemorySharedStore()
+        )
+        return decorated
+
+    async def test_duplicates_are_dropped(self) -> None:
+        broker = InMemoryBroker(await_inplace=True)
+        calls: list = []
+        charge = self._make_task(broker, calls)
+
+        first = await charge.kiq("o-1")
+        second = await charge.kiq("o-1")
+        third = await charge.kiq("o-2")
+
+        assert calls == ["o-1", "o-2"]
+        assert first.task_id == second.task_id != third.task_id
+        assert (await second.wait_result()).return_value == "o-1"
+
+    async def test_explicit_key(self) -> None:
+        broker = InMemoryBroker(await_inplace=True)
+        calls: list = []
+        charge = self._make_task(broker, calls)
+
+        await charge.kicker().with_idempotency_key("req-1").kiq("o-1")
+        await charge.kicker().with_idempotency_key("req-1").kiq("o-2")
+        assert calls == ["o-1"]
+
+    async def test_kicker_can_be_reused(self) -> None:
+        broker = InMemoryBroker(await_inplace=True)
+        calls: list = []
+        charge = self._make_task(broker, calls)
+
+        kicker = charge.kicker().with_labels(source="api")
+        first = await kicker.kiq("o-1")
+        second = await kicker.kiq("o-2")
+        assert calls == ["o-1", "o-2"]
+        assert first.task_id != second.task_id
+        assert kicker.custom_task_id is None
+        assert (await first.wait_result()).return_value == "o-1"
+        assert (await second.wait_result()).return_value == "o-2"
+
+    async def test_failed_send_releases_key(self) -> None:
+        broker = InMemoryBroker(await_inplace=True)
+        calls: list = []
+        charge = self._make_task(broker, calls)
+        kick = broker.kick
+
+        async def broken_kick(message: Any) -> None:
+            raise ConnectionError("down")
+
+        broker.kick = broken_kick  # type: ignore[method-assign]
+        with pytest.raises(SendTaskError):
+            await charge.kiq("o-1")
+
+        broker.kick = kick  # type: ignore[method-assign]
+        await charge.kiq("o-1")
+        assert calls == ["o-1"]
+
+    def test_key_requires_idempotent_task(self) -> None:
+        broker = InMemoryBroker()
+        broker.decorator_class = UnfazedTaskiqDecoratedTask
+
+        async def plain() -> None:
+            pass
+
+        decorated: Any = broker.task(plain)
+        with pytest.raises(ValueError, match="is not idempotent"):
+            decorated.kicker().with_idempotency_key("k")
@@ -0,0 +1,122 @@
+import asyncio
+from typing import Any, List
+
+from taskiq import AckableMessage, InMemoryBroker
+from taskiq.message import BrokerMessage, TaskiqMessage
+
+from unfazed_taskiq.drain import InFlight, InFlightTracker, drain
+
+
+class RecordingBroker(InMemoryBroker):
+    def __init__(self, fail: bool = False) -> None:
+        super().__init__()
+        self.kicked: List[BrokerMessage] = []
+        self.fail = fail
+
+    async def kick(self, message: BrokerMessage) -> None:
+        if self.fail:
+            raise ConnectionError("broker is gone")
+        self.kicked.append(message)
+
+
+def encode(broker: InMemoryBroker, task_id: str) -> bytes:
+    return broker.formatter.dumps(
+        TaskiqMessage(
+            task_id=task_id,
+            task_name="tests.sleep",
+            labels={"priority": 1},
+            args=[],
+            kwargs={},
+        )
+    ).message
+
+
+def start(
+    tracker: InFlightTracker, entry: InFlight, duration: float
+) -> "asyncio.Task[Any]":
+    async def run() -> None:
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            # like the receiver, before the drain sees the task done
+            tracker.discard(task)
+
+    task = asyncio.ensure_future(run())
+    # tasks cancelled before they start don't run their finally
+    task.add_done_callback(tracker.discard)
+    tracker.track(task, entry)
+    return task
+
+
+async def test_waits_for_tasks() -> None:
+    broker = RecordingBroker()
+    tracker = InFlightTracker()
+    start(tracker, InFlight(encode(broker, "1"), broker, task_name="a"), 0.05)
+    start(tracker, InFlight(encode(broker, "2"), broker, task_name="b"), 0.1)
+    assert {item["task_name"] for item in tracker.snapshot()} == {"a", "b"}
+
+    report = await drain(tracker, timeout=5, interval=0.01)
+    assert (report.finished, report.requeued, report.cancelled) == (2, 0, 0)
+    assert len(tracker) == 0
+    assert broker.kicked == []
+
+
+async def test_requeues_at_the_deadline() -> None:
+    broker = RecordingBroker()
+    tracker = InFlightTracker()
+    acks: List[str] = []
+
+    async def ack() -> None:
+        acks.append("ack")
+
+    start(tracker, InFlight(encode(broker, "fast"), broker), 0.01)
+    message = AckableMessage(data=encode(broker, "slow"), ack=ack)
+    slow = start(tracker, InFlight(message, broker), 10)
+    acked = start(tracker, InFlight(encode(broker, "acked"), broker, acked=True), 10)
+
+    report = await drain(tracker, timeout=0.1)
+    assert (report.finished, report.requeued, report.cancelled) == (1, 2, 0)
+    assert slow.cancelled() and acked.cancelled()
+    assert sorted(message.task_id for message in broker.kicked) == ["acked", "slow"]
+    requeued = next(m for m in broker.kicked if m.task_id == "slow")
+    assert requeued.message == encode(broker, "slow")
+    assert requeued.labels == {"priority": 1}
+    # only the unacked original is acked, once its copy is queued
+    assert acks == ["ack"]
+
+
+async def test_cancels_without_requeue() -> None:
+    broker = RecordingBroker(fail=True)
+    tracker = InFlightTracker()
+    start(tracker, InFlight(encode(broker, "failing"), broker), 10)
+    start(tracker, InFlight(encode(broker, "local"), broker, requeue=False), 10)
+    start(tracker, InFlight(encode(broker, "done"), broker, executed=True), 10)
+
+    report = await drain(tracker, timeout=0)
+    assert (report.finished, report.requeued, report.cancelled) == (0, 0, 3)
+    assert len(tracker) == 0
+
+
+async def test_requeues_deferred_messages() -> None:
+    broker = RecordingBroker()
+    tracker = InFlightTracker()
+    await tracker.defer(InFlight(encode(broker, "due"), broker, labels={"retry": 1}), 0)
+    await tracker.defer(InFlight(encode(broker, "later"), broker), 10)
+    await tracker.defer(InFlight(encode(broker, "local"), broker, requeue=False), 10)
+    await asyncio.sleep(0.01)
+    assert [message.task_id for message in broker.kicked] == ["due"]
+    assert broker.formatter.loads(broker.kicked[0].message).labels == {
+        "priority": 1,
+        "retry": 1,
+    }
+
+    # a drain requeues the waiting ones right away
+    report = await drain(tracker, timeout=0)
+    assert (report.finished, report.requeued, report.cancelled) == (0, 1, 1)
+    assert [message.task_id for message in broker.kicked] == ["due", "later"]
+    assert tracker.deferred == {}
+
+
+async def test_nothing_in_flight() -> None:
+    report = await drain(InFlightTracker(), timeout=None)
+    assert report.finished == report.requeued == report.cancelled == 0
@@ -0,0 +1,164 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import AsyncIterator, Tuple
+
+import pytest
+from taskiq import Context, InMemoryBroker, TaskiqDepends
+
+from unfazed_taskiq.executors import (
+    ProcessPool,
+    SharedBuffer,
+    ThreadPool,
+    load,
+    run_in_process,
+    run_in_thread,
+    share,
+)
+from unfazed_taskiq.metrics import MetricsRegistry
+
+pool = ProcessPool(max_workers=2, shared_memory_threshold=1024, initializer=None)
+
+
+def digest(data: bytes, salt: bytes = b"") -> Tuple[int, str]:
+    return os.getpid(), hashlib.sha256(salt + data).hexdigest()
+
+
+def invert(data: bytearray) -> bytearray:
+    return bytearray(255 - byte for byte in data)
+
+
+async def slow_double(value: int) -> int:
+    await asyncio.sleep(0)
+    return value * 2
+
+
+def explode() -> None:
+    raise ValueError("boom")
+
+
+def shout(value: str, context: Context = TaskiqDepends()) -> str:  # noqa: B008
+    return value.upper()
+
+
+remote_digest = run_in_process(digest, pool)
+remote_invert = run_in_process(invert, pool)
+remote_double = run_in_process(slow_double, pool)
+remote_explode = run_in_process(explode, pool)
+remote_shout = run_in_process(shout, pool)
+
+
+@pytest.fixture(autouse=True)
+async def shutdown_pool() -> AsyncIterator[None]:
+    yield
+    await pool.shutdown()
+
+
+def test_share_small_and_large_buffers() -> None:
+    assert share(b"small", 1024) == b"small"
+    assert share(b"x" * 2048, None) == b"x" * 2048
+    handle = share(bytearray(b"x" * 2048), 1024)
+    assert isinstance(handle, SharedBuffer)
+    assert load(handle, unlink=True) == bytearray(b"x" * 2048)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=handle.name)
+
+
+async def test_runs_in_another_process() -> None:
+    pid, value = await remote_digest(b"data", salt=b"1")
+    assert pid != os.getpid()
+    assert value == hashlib.sha256(b"1data").hexdigest()
+    assert await remote_double(21) == 42
+
+
+async def test_large_buffers_go_through_shared_memory() -> None:
+    data = os.urandom(64 * 1024)
+    _, value = await remote_digest(data)
+    assert value == hashlib.sha256(data).hexdigest()
+    assert await remote_invert(bytearray(data)) == bytearray(255 - b for b in data)
+
+
+async def test_errors_are_raised() -> None:
+    with pytest.raises(ValueError, match="boom"):
+        await remote_explode()
+
+
+async def test_prewarm() -> None:
+    await pool.startup()
+    assert pool.executor is not None
+    assert len(pool.executor._processes) == 2
+    pids = {(await remote_digest(b""))[0] for _ in range(4)}
+    assert pids <= set(pool.executor._processes)
+
+
+async def test_as_a_task() -> None:
+    broker = InMemoryBroker()
+    task = broker.task(task_name="digest")(remote_digest)
+    result = await (await task.kiq(b"data")).wait_result(timeout=10)
+    assert result.return_value[1] == hashlib.sha256(b"data").hexdigest()
+
+
+async def test_dependencies_stay_in_the_worker() -> None:
+    broker = InMemoryBroker()
+    task = broker.task(task_name="shout")(remote_shout)
+    result = await (await task.kiq("hey")).wait_result(timeout=10)
+    assert not result.is_err
+    assert result.return_value == "HEY"
+
+
+class TestThreadPool:
+    async def test_pools_are_isolated(self) -> None:
+        registry = MetricsRegistry()
+        slow = ThreadPool("slow", 1, registry=registry)
+        fast = ThreadPool("fast", 1, registry=registry)
+        release = threading.Event()
+        blocked = run_in_thread(release.wait, slow)
+        ping = run_in_thread(lambda: "pong", fast)
+
+        waiting = [asyncio.ensure_future(blocked()) for _ in range(3)]
+        assert await asyncio.wait_for(ping(), 1) == "pong"
+        await asyncio.sleep(0.05)
+        assert slow.stats()["active"] == 1
+        assert slow.stats()["queued"] == 2
+        assert slow.stats()["utilization"] == 1.0
+
+        release.set()
+        await asyncio.gather(*waiting)
+        stats = slow.stats()
+        assert (stats["active"], stats["queued"], stats["completed"]) == (0, 0, 3)
+        assert stats["queue_wait_avg"] > 0.01
+        assert registry.pools["slow"].queue_wait.count == 3
+        assert registry.pools["fast"].completed == 1
+        slow.shutdown()
+        fast.shutdown()
+
+    async def test_errors_and_context(self) -> None:
+        pool = ThreadPool("context", 2, registry=MetricsRegistry())
+        request_id = contextvars.ContextVar("request_id", default="")
+
+        def read(delay: float) -> str:
+            time.sleep(delay)
+            return request_id.get()
+
+        def fail() -> None:
+            raise KeyError("missing")
+
+        request_id.set("r-1")
+        assert await run_in_thread(read, pool)(0) == "r-1"
+        with pytest.raises(KeyError):
+            await run_in_thread(fail, pool)()
+        assert pool.stats()["completed"] == 2
+        assert pool.metrics.busy_seconds >= 0
+        pool.shutdown()
+
+    def test_validation(self) -> None:
+        with pytest.raises(ValueError):
+            ThreadPool("empty", 0)
+        with pytest.raises(ValueError, match="only runs sync functions"):
+            run_in_thread(
+                slow_double, ThreadPool("sync", 1, registry=MetricsRegistry())
+            )
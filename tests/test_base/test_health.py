@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+import orjson as json
+import pytest
+from taskiq import InMemoryBroker, ScheduledTask, ScheduleSource, TaskiqScheduler
+
+from unfazed_taskiq.health import (
+    Health,
+    LoopMonitor,
+    broker_connected,
+    process_index,
+    track_ticks,
+)
+from unfazed_taskiq.metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry
+
+
+class StaticSource(ScheduleSource):
+    async def get_schedules(self) -> List[ScheduledTask]:
+        return []
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def request(port: int, path: str) -> Any:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+async def test_loop_monitor_logs_blocking_stack(
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    monitor = LoopMonitor(interval=0.01, threshold=0.1)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        with caplog.at_level(logging.WARNING, logger="unfazed.taskiq"):
+            block_the_loop(0.3)
+            await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+
+    warnings = [r.message for r in caplog.records if "blocked" in r.message]
+    assert len(warnings) == 1
+    assert "block_the_loop" in warnings[0]
+    stats = monitor.stats()
+    assert stats["blocked"] == 1
+    assert stats["max"] >= 0.2
+    assert stats["p50"] < stats["max"]
+
+
+def test_loop_monitor_empty_stats() -> None:
+    assert LoopMonitor().stats()["p99"] == 0.0
+
+
+async def test_http_endpoint() -> None:
+    healthy: Optional[bool] = True
+
+    async def dependency() -> Optional[bool]:
+        return healthy
+
+    async def broken() -> Optional[bool]:
+        raise ConnectionError
+
+    health = Health(LoopMonitor(), checks={"dependency": dependency}, port=0)
+    await health.start()
+    assert health.server is not None
+    port = health.server.sockets[0].getsockname()[1]
+    try:
+        code, status = await request(port, "/ready")
+        assert code == 200
+        assert status["ready"] is True
+        assert status["checks"] == {"dependency": True}
+        assert set(status["loop_lag"]) >= {"p50", "p90", "p99", "max"}
+
+        healthy = None
+        assert (await request(port, "/ready"))[0] == 200
+        health.checks["broken"] = broken
+        code, status = await request(port, "/ready")
+        assert code == 503
+        assert status["checks"]["broken"] is False
+        assert (await request(port, "/live"))[0] == 200
+    finally:
+        await health.stop()
+
+
+async def test_metrics_endpoint() -> None:
+    registry = MetricsRegistry()
+    registry.get("default", "tests.job").succeeded += 1
+    health = Health(LoopMonitor(), port=0, metrics=registry.render)
+    await health.start()
+    assert health.server is not None
+    port = health.server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+    finally:
+        await health.stop()
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.split()[1] == b"200"
+    assert PROMETHEUS_CONTENT_TYPE.encode() in head
+    assert body.decode() == registry.render()
+
+
+async def test_status_file(tmp_path: Path) -> None:
+    path = tmp_path / "health.json"
+    health = Health(LoopMonitor(), path=str(path), interval=0.01)
+    health.info["role"] = "worker"
+    await health.start()
+    await asyncio.sleep(0.05)
+    status = json.loads(path.read_bytes())
+    assert status["live"] is True
+    assert status["role"] == "worker"
+
+    await health.stop()
+    status = json.loads(path.read_bytes())
+    assert status["live"] is False
+    assert status["ready"] is False
+
+
+async def test_broker_connected() -> None:
+    assert await broker_connected(InMemoryBroker()) is None
+    broker: Any = SimpleNamespace(write_conn=SimpleNamespace(is_closed=False))
+    assert await broker_connected(broker) is True
+    broker.write_conn.is_closed = True
+    assert await broker_connected(broker) is False
+
+
+async def test_track_ticks() -> None:
+    broker = InMemoryBroker()
+    scheduler = TaskiqScheduler(broker, sources=[StaticSource()])
+    health = Health(LoopMonitor())
+    track_ticks(scheduler, health, "alpha")
+
+    assert await health.checks["scheduler:alpha"]() is None
+    assert await scheduler.sources[0].get_schedules() == []
+    assert await health.checks["scheduler:alpha"]() is True
+    assert health.info["last_tick"]["alpha"] <= time.time()
+
+    health.info["last_tick"]["alpha"] -= 1000
+    assert (await health.status())["ready"] is False
+
+
+def test_process_index() -> None:
+    assert process_index() == 0
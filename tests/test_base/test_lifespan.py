@@ -7,6 +7,7 @@ covering initialization, startup, and shutdown operations.
 
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from unfazed_taskiq.drain import DrainReport
 from unfazed_taskiq.lifespan import TaskiqLifeSpan
 
 
@@ -47,10 +48,14 @@ class TestTaskiqLifeSpan:
 
         with patch("unfazed_taskiq.lifespan.agents") as agent_mock:
             agent_mock.setup.return_value = None
+            report = DrainReport(finished=1)
+            agent_mock.drain = AsyncMock(return_value=report)
             agent_mock.shutdown = AsyncMock()
 
             lifespan = TaskiqLifeSpan(mock_unfazed)
 
             await lifespan.on_shutdown()
 
+            agent_mock.drain.assert_awaited_once_with()
             agent_mock.shutdown.assert_awaited_once_with()
+            assert lifespan.drain_report is report
@@ -0,0 +1,189 @@
+import asyncio
+from typing import Any, AsyncIterator, List
+
+import pytest
+from taskiq import (
+    Context,
+    InMemoryBroker,
+    TaskiqDepends,
+    TaskiqMessage,
+    TaskiqResult,
+)
+from taskiq.abc.middleware import TaskiqMiddleware
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.mapping import (
+    MAP_FAILED_ITEM_LABEL,
+    MAP_TASK_LABEL,
+    MAP_TASK_NAME,
+    TaskMap,
+)
+from unfazed_taskiq.middleware import UnfazedTaskiqExceptionMiddleware
+
+
+class ChunkTracker(TaskiqMiddleware):
+    def __init__(self, test: "TestTaskMap") -> None:
+        super().__init__()
+        self.test = test
+
+    def pre_execute(self, message: TaskiqMessage) -> TaskiqMessage:
+        self.test.started.append((message.task_name, dict(message.labels)))
+        if message.task_name == MAP_TASK_NAME:
+            assert message.labels[MAP_TASK_LABEL]
+            self.test.chunks.append(message.args[1])
+            self.test.running += 1
+            self.test.max_running = max(self.test.max_running, self.test.running)
+        return message
+
+    async def post_execute(
+        self, message: TaskiqMessage, result: TaskiqResult[Any]
+    ) -> None:
+        self.test.finished.append((message.task_name, result.is_err))
+        if message.task_name == MAP_TASK_NAME:
+            await asyncio.sleep(0.01)
+            self.test.running -= 1
+
+    def on_error(
+        self,
+        message: TaskiqMessage,
+        result: TaskiqResult[Any],
+        exception: BaseException,
+    ) -> None:
+        self.test.errors.append((message.task_name, dict(message.labels)))
+
+
+class TestTaskMap:
+    def _broker(self) -> Any:
+        broker = InMemoryBroker()
+        broker.decorator_class = UnfazedTaskiqDecoratedTask
+        self.chunks: List[List[int]] = []
+        self.started: List[Any] = []
+        self.finished: List[Any] = []
+        self.errors: List[Any] = []
+        self.running = 0
+        self.max_running = 0
+        self.consumed = 0
+
+        @broker.task(task_name="square", priority=1, rate_limit="100/s")
+        async def square(value: int, offset: int = 0) -> int:
+            return value * value + offset
+
+        @broker.task(task_name="double")
+        def double(value: int) -> int:
+            return value * 2
+
+        @broker.task(task_name="fail")
+        async def fail(value: int) -> int:
+            raise ValueError(value)
+
+        broker.add_middlewares(ChunkTracker(self))
+        return broker, square, double, fail
+
+    async def source(self, count: int) -> AsyncIterator[int]:
+        for value in range(count):
+            self.consumed += 1
+            yield value
+
+    async def test_collect_results_in_order(self) -> None:
+        broker, square, _, _ = self._broker()
+        values = [
+            value
+            async for value in square.map(
+                self.source(25), chunk_size=10, poll_interval=0.01
+            )
+        ]
+        assert values == [value * value for value in range(25)]
+        assert [len(chunk) for chunk in self.chunks] == [10, 10, 5]
+
+    async def test_kwargs_and_sync_tasks(self) -> None:
+        broker, square, double, _ = self._broker()
+        mapping = square.map(range(3), chunk_size=2, offset=1)
+        assert isinstance(mapping, TaskMap)
+        assert [value async for value in mapping] == [1, 2, 5]
+        assert [value async for value in double.map([1, 2, 3])] == [2, 4, 6]
+
+    async def test_backpressure(self) -> None:
+        broker, square, _, _ = self._broker()
+        mapping = square.map(
+            self.source(100), chunk_size=5, max_in_flight=2, poll_interval=0.01
+        )
+        assert await mapping.kiq() == 20
+        assert self.max_running <= 2
+        await asyncio.sleep(0.1)
+        assert sum(len(chunk) for chunk in self.chunks) == 100
+
+    async def test_source_is_consumed_lazily(self) -> None:
+        broker, square, _, _ = self._broker()
+        values = square.map(self.source(1000), chunk_size=10, max_in_flight=1)
+        iterator = values.__aiter__()
+        assert await iterator.__anext__() == 0
+        assert self.consumed <= 30
+        await iterator.aclose()
+
+    async def test_items_are_parsed_and_injected(self) -> None:
+        broker, _, _, _ = self._broker()
+
+        @broker.task(task_name="describe")
+        async def describe(
+            value: int,
+            context: Context = TaskiqDepends(),  # noqa: B008
+        ) -> str:
+            return f"{value * 2}:{context.message.task_name}"
+
+        values = [value async for value in describe.map(["1", "2"])]
+        assert values == ["2:describe", "4:describe"]
+
+    async def test_middlewares_see_each_item(self) -> None:
+        broker, square, _, _ = self._broker()
+        assert [value async for value in square.map(range(2))] == [0, 1]
+
+        chunk, *items = self.started
+        assert chunk == (
+            MAP_TASK_NAME,
+            {"priority": 1, MAP_TASK_LABEL: "square"},
+        )
+        assert items == [("square", {"priority": 1, "rate_limit": "100/s"})] * 2
+        assert self.finished == [
+            ("square", False),
+            ("square", False),
+            (MAP_TASK_NAME, False),
+        ]
+
+    async def test_failed_chunk_raises(self) -> None:
+        broker, _, _, fail = self._broker()
+        with pytest.raises(ValueError):
+            async for _ in fail.map(range(3)):
+                pass
+
+        assert self.finished == [("fail", True), (MAP_TASK_NAME, True)]
+        (item, _), (chunk, labels) = self.errors
+        assert (item, chunk) == ("fail", MAP_TASK_NAME)
+        assert labels[MAP_FAILED_ITEM_LABEL]
+
+    async def test_failed_item_is_reported_once(self) -> None:
+        broker, _, _, fail = self._broker()
+        middleware = UnfazedTaskiqExceptionMiddleware()
+        broker.add_middlewares(middleware)
+        reported: List[str] = []
+        middleware.reporter.submit = (  # type: ignore[method-assign]
+            lambda task_name, *args: reported.append(task_name)
+        )
+        with pytest.raises(ValueError):
+            async for _ in fail.map(range(3)):
+                pass
+        assert reported == ["fail"]
+
+    async def test_waiting_needs_result_backend(self) -> None:
+        broker, square, _, _ = self._broker()
+        broker.with_result_backend(DummyResultBackend())
+        with pytest.raises(ValueError, match="result backend"):
+            await square.map(range(3), max_in_flight=1).kiq()
+        assert await square.map(range(3)).kiq() == 1
+
+    def test_invalid_sizes(self) -> None:
+        broker, square, _, _ = self._broker()
+        with pytest.raises(ValueError):
+            square.map([], chunk_size=0)
+        with pytest.raises(ValueError):
+            square.map([], max_in_flight=0)
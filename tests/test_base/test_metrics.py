@@ -0,0 +1,90 @@
+import pytest
+from taskiq import InMemoryBroker
+
+from unfazed_taskiq.metrics import Histogram, MetricsRegistry
+from unfazed_taskiq.middleware import UnfazedTaskiqMetricsMiddleware
+
+
+def test_histogram() -> None:
+    histogram = Histogram([1, 0.1])
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(3.65)
+    assert histogram.cumulative() == [("0.1", 2), ("1", 3), ("+Inf", 4)]
+
+
+def test_registry_render() -> None:
+    registry = MetricsRegistry(latency_buckets=[1], duration_buckets=[1])
+    metrics = registry.get("default", 'app.tasks."quoted"')
+    metrics.latency.observe(0.5)
+    metrics.duration.observe(2)
+    metrics.succeeded += 1
+    metrics.in_flight += 1
+    assert registry.get("default", 'app.tasks."quoted"') is metrics
+
+    text = registry.render()
+    labels = 'alias="default",task="app.tasks.\\"quoted\\""'
+    assert "# TYPE unfazed_taskiq_task_queue_latency_seconds histogram" in text
+    assert (
+        f'unfazed_taskiq_task_queue_latency_seconds_bucket{{{labels},le="1"}} 1' in text
+    )
+    assert f'unfazed_taskiq_task_duration_seconds_bucket{{{labels},le="1"}} 0' in text
+    assert (
+        f'unfazed_taskiq_task_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    )
+    assert f"unfazed_taskiq_task_duration_seconds_sum{{{labels}}} 2.0" in text
+    assert f"unfazed_taskiq_task_succeeded_total{{{labels}}} 1" in text
+    assert f"unfazed_taskiq_task_failed_total{{{labels}}} 0" in text
+    assert "# TYPE unfazed_taskiq_task_in_flight gauge" in text
+    assert text.endswith("\n")
+
+    registry.clear()
+    assert registry.tasks == {}
+
+
+def test_registry_render_pools() -> None:
+    registry = MetricsRegistry(latency_buckets=[1])
+    metrics = registry.pool("payments", 4)
+    assert registry.pool("payments", 4) is metrics
+    metrics.queue_wait.observe(0.5)
+    metrics.active = 2
+    metrics.busy_seconds = 1.5
+    assert metrics.utilization == 0.5
+
+    text = registry.render()
+    labels = 'pool="payments"'
+    assert (
+        f'unfazed_taskiq_thread_pool_queue_wait_seconds_bucket{{{labels},le="1"}} 1'
+        in text
+    )
+    assert f"unfazed_taskiq_thread_pool_max_workers{{{labels}}} 4" in text
+    assert f"unfazed_taskiq_thread_pool_active{{{labels}}} 2" in text
+    assert f"unfazed_taskiq_thread_pool_busy_seconds_total{{{labels}}} 1.5" in text
+
+    registry.clear()
+    assert registry.pools == {}
+
+
+async def test_metrics_middleware() -> None:
+    registry = MetricsRegistry()
+    middleware = UnfazedTaskiqMetricsMiddleware(registry=registry)
+    middleware.alias_name = "default"
+    broker = InMemoryBroker(await_inplace=True)
+    broker.add_middlewares(middleware)
+
+    @broker.task
+    async def divide(a: int, b: int) -> float:
+        return a / b
+
+    await divide.kiq(1, 1)
+    await divide.kiq(1, 0)
+
+    metrics = registry.get("default", divide.task_name)
+    assert metrics.succeeded == 1
+    assert metrics.failed == 1
+    assert metrics.in_flight == 0
+    assert metrics.latency.count == 2
+    assert metrics.duration.count == 2
+    assert middleware.started == {}
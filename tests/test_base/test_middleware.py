@@ -2,15 +2,24 @@
 Unit tests for middleware module.
 
 This module contains tests for the UnfazedTaskiqExceptionMiddleware functionality,
-covering error handling, logging, and Sentry integration.
+covering error handling, logging, and Sentry integration, and for the
+UnfazedTaskiqRateLimitMiddleware and UnfazedTaskiqConcurrencyMiddleware.
 """
 
-from unittest.mock import MagicMock, patch
+import asyncio
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from taskiq import TaskiqMessage, TaskiqResult
+from taskiq import InMemoryBroker, TaskiqMessage, TaskiqResult
 
-from unfazed_taskiq.middleware import UnfazedTaskiqExceptionMiddleware
+from unfazed_taskiq.drain import Defer, deferrable
+from unfazed_taskiq.middleware import (
+    UnfazedTaskiqConcurrencyMiddleware,
+    UnfazedTaskiqExceptionMiddleware,
+    UnfazedTaskiqRateLimitMiddleware,
+)
+from unfazed_taskiq.store import InMemorySharedStore
 
 
 class TestUnfazedTaskiqExceptionMiddleware:
@@ -23,6 +32,7 @@ class TestUnfazedTaskiqExceptionMiddleware:
         self.mock_message.task_name = "test_task"
         self.mock_message.args = ("arg1", "arg2")
         self.mock_message.kwargs = {"key1": "value1", "key2": "value2"}
+        self.mock_message.labels = {}
 
         self.mock_result = MagicMock(spec=TaskiqResult)
         self.test_exception = ValueError("Test error message")
@@ -33,6 +43,9 @@ class TestUnfazedTaskiqExceptionMiddleware:
             await self.middleware.on_error(
                 self.mock_message, self.mock_result, self.test_exception
             )
+            # reported in the background, not on the worker's hot path
+            mock_capture.assert_not_called()
+            await self.middleware.shutdown()
 
             mock_capture.assert_called_once_with(
                 self.test_exception, result=self.mock_result, message=self.mock_message
@@ -46,6 +59,7 @@ class TestUnfazedTaskiqExceptionMiddleware:
                 await self.middleware.on_error(
                     self.mock_message, self.mock_result, self.test_exception
                 )
+                await self.middleware.shutdown()
 
                 # Verify error log was called
                 mock_logger.error.assert_called_once()
@@ -71,3 +85,297 @@ class TestUnfazedTaskiqExceptionMiddleware:
                 )
                 assert extra_data["exception"] == str(self.test_exception)
                 assert "traceback" in extra_data
+
+    async def test_on_error_aggregates_identical_errors(self) -> None:
+        """Test that a burst of identical errors is sampled and summarized."""
+        self.middleware = UnfazedTaskiqExceptionMiddleware(
+            sample_threshold=2, sample_every=10
+        )
+        with patch("unfazed_taskiq.middleware.capture_exception") as mock_capture:
+            with patch("unfazed_taskiq.middleware.log") as mock_logger:
+                for _ in range(25):
+                    await self.middleware.on_error(
+                        self.mock_message, self.mock_result, self.test_exception
+                    )
+                await self.middleware.shutdown()
+
+        # the first two, then the 10th and 20th
+        assert mock_capture.call_count == 4
+        assert mock_logger.error.call_count == 5
+        summary = mock_logger.error.call_args
+        assert summary[0][0] == (
+            "Task 'test_task' failed 25 times with ValueError: Test error message"
+        )
+        assert summary[1]["extra"]["count"] == 25
+        assert summary[1]["extra"]["unreported"] == 21
+
+
+class TestUnfazedTaskiqRateLimitMiddleware:
+    """Test UnfazedTaskiqRateLimitMiddleware functionality."""
+
+    def _message(self, task_name: str = "app.tasks.call_api", **labels: Any) -> Any:
+        return TaskiqMessage(
+            task_id="id", task_name=task_name, labels=labels, args=[], kwargs={}
+        )
+
+    async def test_unlimited_task_passes_through(self) -> None:
+        middleware = UnfazedTaskiqRateLimitMiddleware(limits={"other": "1/s"})
+        with patch("unfazed_taskiq.middleware.asyncio.sleep") as mock_sleep:
+            for _ in range(5):
+                await middleware.pre_execute(self._message())
+        mock_sleep.assert_not_called()
+        assert middleware.deferred == 0
+
+    async def test_over_limit_messages_are_deferred(self) -> None:
+        middleware = UnfazedTaskiqRateLimitMiddleware(
+            limits={"app.tasks.call_api": "2/s"}
+        )
+        with patch(
+            "unfazed_taskiq.middleware.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep:
+            for _ in range(3):
+                await middleware.pre_execute(self._message())
+
+        mock_sleep.assert_awaited_once()
+        assert 0 < mock_sleep.await_args_list[0].args[0] <= 0.5
+        assert middleware.deferred == 1
+
+    async def test_long_delays_free_the_slot(self) -> None:
+        middleware = UnfazedTaskiqRateLimitMiddleware(
+            limits={"app.tasks.call_api": "1/m"}
+        )
+        deferrable.set(True)
+        await middleware.pre_execute(self._message())
+        with pytest.raises(Defer) as exc_info:
+            await middleware.pre_execute(self._message())
+        assert 59 < exc_info.value.delay <= 60
+        ready_at = exc_info.value.labels["rate_limit_ready_at"]
+
+        # the requeued message keeps its reservation instead of taking a token
+        with patch(
+            "unfazed_taskiq.middleware.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep:
+            message = await middleware.pre_execute(
+                self._message(rate_limit_ready_at=ready_at - 59.5)
+            )
+        assert 0 < mock_sleep.await_args_list[0].args[0] <= 0.5
+        assert "rate_limit_ready_at" not in message.labels
+        assert middleware.buckets["app.tasks.call_api"].tokens == pytest.approx(
+            -1, abs=0.01
+        )
+
+    async def test_limit_from_labels(self) -> None:
+        middleware = UnfazedTaskiqRateLimitMiddleware(limits={"github": "1/m"})
+        assert middleware.get_limit(self._message(rate_limit="5/s")) == (
+            "app.tasks.call_api",
+            5.0,
+            5.0,
+        )
+        assert middleware.get_limit(
+            self._message("app.tasks.sync_repo", rate_limit_group="github")
+        ) == ("github", 1 / 60, 1.0)
+
+        with patch(
+            "unfazed_taskiq.middleware.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep:
+            await middleware.pre_execute(self._message("a", rate_limit_group="github"))
+            await middleware.pre_execute(self._message("b", rate_limit_group="github"))
+        mock_sleep.assert_awaited_once()
+
+    async def test_shared_buckets(self) -> None:
+        store = InMemorySharedStore()
+        workers = [
+            UnfazedTaskiqRateLimitMiddleware(limits={"job": "1/s"}, shared=True)
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.with_store(store, "alias")
+
+        with patch(
+            "unfazed_taskiq.middleware.asyncio.sleep", new_callable=AsyncMock
+        ) as mock_sleep:
+            await workers[0].pre_execute(self._message("job"))
+            await workers[1].pre_execute(self._message("job"))
+
+        mock_sleep.assert_awaited_once()
+        assert workers[0].buckets == workers[1].buckets == {}
+        assert "unfazed_taskiq:ratelimit:job" in store.buckets
+
+
+class TestUnfazedTaskiqConcurrencyMiddleware:
+    """Test UnfazedTaskiqConcurrencyMiddleware functionality."""
+
+    def _message(self, task_id: str, task_name: str = "job", **labels: Any) -> Any:
+        return TaskiqMessage(
+            task_id=task_id, task_name=task_name, labels=labels, args=[], kwargs={}
+        )
+
+    async def test_per_worker_cap_does_not_block_other_tasks(self) -> None:
+        broker = InMemoryBroker(max_async_tasks=10)
+        middleware = UnfazedTaskiqConcurrencyMiddleware()
+        broker.add_middlewares(middleware)
+        gate = asyncio.Event()
+        running: list = []
+        peak: list = [0]
+
+        @broker.task(max_concurrency=1)
+        async def heavy() -> None:
+            running.append(1)
+            peak[0] = max(peak[0], len(running))
+            await gate.wait()
+            running.pop()
+
+        @broker.task
+        async def light() -> str:
+            return "ok"
+
+        heavy_tasks = [await heavy.kiq() for _ in range(3)]
+        light_task = await light.kiq()
+        result = await light_task.wait_result(timeout=1)
+        assert result.return_value == "ok"
+        assert middleware.stats()[heavy.task_name]["waiting"] == 2
+
+        gate.set()
+        for task in heavy_tasks:
+            await task.wait_result(timeout=1)
+        await broker.wait_all()
+
+        assert peak[0] == 1
+        stats = middleware.stats()[heavy.task_name]
+        assert stats["wait_count"] == 3
+        assert stats["waiting"] == 0
+        assert stats["wait_max"] > 0
+        assert middleware.acquired == {}
+
+    async def test_cluster_cap(self) -> None:
+        store = InMemorySharedStore()
+        store.process_local = False
+        workers = [
+            UnfazedTaskiqConcurrencyMiddleware(
+                cluster_limits={"db": 1}, poll_interval=0.01
+            )
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.with_store(store, "alias")
+
+        first = self._message("1", concurrency_group="db")
+        second = self._message("2", "other", concurrency_group="db")
+        await workers[0].pre_execute(first)
+        waiter = asyncio.create_task(workers[1].pre_execute(second))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+        await workers[0].post_execute(first, MagicMock())
+        message = await asyncio.wait_for(waiter, 1)
+        assert message.labels["concurrency_wait"] >= 0.05
+        await workers[1].post_execute(second, MagicMock())
+        assert store.data == {}
+
+    async def test_leaked_cluster_slots_expire(self) -> None:
+        store = InMemorySharedStore()
+        store.process_local = False
+        middleware = UnfazedTaskiqConcurrencyMiddleware(
+            cluster_limits={"db": 1}, lease_ttl=0.05
+        )
+        middleware.with_store(store, "alias")
+        # the holder crashes before post_execute
+        await middleware.pre_execute(self._message("crashed", concurrency_group="db"))
+        deferrable.set(True)
+        for _ in range(3):
+            with pytest.raises(Defer):
+                await middleware.pre_execute(self._message("2", concurrency_group="db"))
+            await asyncio.sleep(0.02)
+        # failed attempts don't extend the lease of the crashed holder
+        message = await middleware.pre_execute(
+            self._message("2", concurrency_group="db")
+        )
+        assert "concurrency_wait" in message.labels
+
+    async def test_excess_messages_are_deferred(self) -> None:
+        middleware = UnfazedTaskiqConcurrencyMiddleware(
+            limits={"job": 1}, poll_interval=0.2
+        )
+        deferrable.set(True)
+        first = await middleware.pre_execute(self._message("1"))
+        with pytest.raises(Defer) as exc_info:
+            await middleware.pre_execute(self._message("2"))
+        assert 0.1 <= exc_info.value.delay <= 0.2
+        deferred_at = exc_info.value.labels["concurrency_deferred_at"]
+        assert exc_info.value.labels["concurrency_attempts"] == 1
+
+        # deferred again, the message keeps the time of its first deferral
+        with pytest.raises(Defer) as exc_info:
+            await middleware.pre_execute(
+                self._message(
+                    "2", concurrency_deferred_at=deferred_at - 1, concurrency_attempts=1
+                )
+            )
+        assert exc_info.value.labels["concurrency_deferred_at"] == deferred_at - 1
+        assert exc_info.value.labels["concurrency_attempts"] == 2
+        assert 0.2 <= exc_info.value.delay <= 0.4
+
+        await middleware.post_execute(first, MagicMock())
+        message = await middleware.pre_execute(
+            self._message(
+                "2", concurrency_deferred_at=deferred_at - 1, concurrency_attempts=2
+            )
+        )
+        assert message.labels["concurrency_wait"] >= 1
+        assert "concurrency_deferred_at" not in message.labels
+        assert "concurrency_attempts" not in message.labels
+        stats = middleware.stats()["job"]
+        assert (stats["deferred"], stats["waiting"]) == (2, 0)
+
+    async def test_deferral_backs_off(self) -> None:
+        middleware = UnfazedTaskiqConcurrencyMiddleware(
+            limits={"job": 1}, poll_interval=0.5, max_poll_interval=4
+        )
+        deferrable.set(True)
+        await middleware.pre_execute(self._message("1"))
+        delays = []
+        for attempts in (0, 1, 2, 3, 10, 5000):
+            with pytest.raises(Defer) as exc_info:
+                await middleware.pre_execute(
+                    self._message("2", concurrency_attempts=attempts)
+                )
+            delays.append(exc_info.value.delay)
+        for delay, ceiling in zip(delays, (0.5, 1, 2, 4, 4, 4)):
+            assert ceiling / 2 <= delay <= ceiling
+
+    def test_cluster_caps_need_a_shared_store(self) -> None:
+        broker = InMemoryBroker()
+        middleware = UnfazedTaskiqConcurrencyMiddleware(cluster_limits={"db": 1})
+        broker.add_middlewares(middleware)
+        store = InMemorySharedStore()
+        middleware.with_store(store, "alias")
+        with pytest.raises(ValueError, match="local to this process"):
+            middleware.startup()
+        with pytest.raises(ValueError, match="local to this process"):
+            middleware.pre_send(self._message("1", max_cluster_concurrency=2))
+
+        # a store shared by the workers
+        store.process_local = False
+        middleware.startup()
+        middleware.pre_send(self._message("1", max_cluster_concurrency=2))
+
+    def test_task_cluster_caps_are_checked_on_startup(self) -> None:
+        broker = InMemoryBroker()
+        middleware = UnfazedTaskiqConcurrencyMiddleware()
+        broker.add_middlewares(middleware)
+        middleware.startup()
+        # only messages capped across the cluster need the shared store
+        middleware.pre_send(self._message("1", max_concurrency=2))
+
+        @broker.task(max_cluster_concurrency=1)
+        async def capped() -> None:
+            pass
+
+        with pytest.raises(ValueError):
+            middleware.startup()
+
+    async def test_uncapped_task_passes_through(self) -> None:
+        middleware = UnfazedTaskiqConcurrencyMiddleware(limits={"other": 1})
+        message = await middleware.pre_execute(self._message("1"))
+        assert "concurrency_wait" not in message.labels
+        assert middleware.acquired == {}
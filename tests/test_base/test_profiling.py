@@ -0,0 +1,156 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import Any
+
+from taskiq import InMemoryBroker
+
+from unfazed_taskiq.middleware import UnfazedTaskiqProfilingMiddleware
+from unfazed_taskiq.profiling import SamplingProfiler
+
+
+def busy(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _folded(path: Path) -> dict:
+    lines = path.read_text().splitlines()
+    return {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+
+
+class TestSamplingProfiler:
+    def test_samples_registered_code(self, tmp_path: Path) -> None:
+        profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path))
+
+        def work() -> None:
+            busy(0.1)
+
+        profiler.add_target(work.__code__, "app.tasks.work")
+        work()
+        profiler.remove_target(work.__code__)
+        busy(0.05)
+        profiler.stop()
+
+        stacks = _folded(tmp_path / "app.tasks.work.folded")
+        assert sum(stacks.values()) > 10
+        for stack in stacks:
+            assert stack.startswith(
+                "TestSamplingProfiler.test_samples_registered_code.<locals>.work ("
+            )
+            assert "busy (" in stack
+        assert profiler.targets == {}
+
+    def test_skips_threads_while_unselected_executions_run(
+        self, tmp_path: Path
+    ) -> None:
+        profiler = SamplingProfiler(interval=0.001, output_dir=str(tmp_path))
+
+        def work() -> None:
+            busy(0.05)
+
+        profiler.add_target(work.__code__, "app.tasks.work")
+        profiler.add_unselected(work.__code__)
+        work()
+        profiler.remove_unselected(work.__code__)
+        profiler.remove_target(work.__code__)
+        profiler.stop()
+        assert not (tmp_path / "app.tasks.work.folded").exists()
+        assert profiler.unselected == {}
+
+    def test_nothing_written_without_samples(self, tmp_path: Path) -> None:
+        profiler = SamplingProfiler(output_dir=str(tmp_path / "profiles"))
+        profiler.stop()
+        assert not (tmp_path / "profiles").exists()
+
+
+class TestUnfazedTaskiqProfilingMiddleware:
+    def _broker(self, tmp_path: Path, **kwargs: Any) -> Any:
+        middleware = UnfazedTaskiqProfilingMiddleware(
+            interval=0.001, output_dir=str(tmp_path), **kwargs
+        )
+        broker = InMemoryBroker(await_inplace=True)
+        broker.add_middlewares(middleware)
+
+        @broker.task(task_name="profiled")
+        async def profiled() -> None:
+            busy(0.05)
+            await asyncio.sleep(0)
+
+        @broker.task(task_name="other")
+        def other() -> None:
+            busy(0.05)
+
+        return broker, middleware, profiled, other
+
+    async def test_profiles_selected_tasks(self, tmp_path: Path) -> None:
+        broker, middleware, profiled, other = self._broker(tmp_path, tasks=["profiled"])
+        await profiled.kiq()
+        await other.kiq()
+        await other.kicker().with_labels(profile=True).kiq()
+        middleware.shutdown()
+
+        assert sum(_folded(tmp_path / "profiled.folded").values()) > 0
+        assert sum(_folded(tmp_path / "other.folded").values()) > 0
+        assert middleware.profiled == {}
+        assert middleware.profiler.targets == {}
+
+    async def test_samples_only_the_selected_execution(self, tmp_path: Path) -> None:
+        middleware = UnfazedTaskiqProfilingMiddleware(
+            interval=0.001, output_dir=str(tmp_path)
+        )
+        broker = InMemoryBroker()
+        broker.add_middlewares(middleware)
+
+        def selected_work() -> None:
+            busy(0.02)
+
+        def other_work() -> None:
+            busy(0.02)
+
+        @broker.task(task_name="job")
+        async def job(selected: bool) -> None:
+            for _ in range(5):
+                if selected:
+                    selected_work()
+                else:
+                    other_work()
+                await asyncio.sleep(0)
+
+        # both executions of the task interleave on the loop
+        await job.kicker().with_labels(profile=True).kiq(True)
+        await job.kicker().with_labels(profile=False).kiq(False)
+        await broker.wait_all()
+        middleware.shutdown()
+
+        stacks = _folded(tmp_path / "job.folded")
+        assert any("selected_work" in stack for stack in stacks)
+        assert not any("other_work" in stack for stack in stacks)
+        assert middleware.profiled == {}
+        assert middleware.profiler.tasks == {}
+
+    async def test_toggle(self, tmp_path: Path) -> None:
+        broker, middleware, profiled, _ = self._broker(
+            tmp_path, tasks=["profiled"], enabled=False
+        )
+        await profiled.kiq()
+        assert middleware.profiled == {}
+        assert middleware.profiler.thread is None
+
+        middleware.toggle()
+        assert middleware.enabled
+        await profiled.kiq()
+        middleware.toggle()
+        assert not middleware.enabled
+        assert (tmp_path / "profiled.folded").exists()
+        middleware.shutdown()
+
+    def test_sample_rate(self, tmp_path: Path) -> None:
+        middleware = UnfazedTaskiqProfilingMiddleware(sample_rate=1.0)
+        message: Any = type("Message", (), {"task_name": "x", "labels": {}})()
+        assert middleware.should_profile(message)
+        middleware.sample_rate = 0
+        assert not middleware.should_profile(message)
+        message.labels["profile"] = True
+        assert middleware.should_profile(message)
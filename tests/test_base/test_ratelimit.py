@@ -0,0 +1,39 @@
+import pytest
+
+from unfazed_taskiq.ratelimit import TokenBucket, parse_rate
+from unfazed_taskiq.store import InMemorySharedStore
+
+
+def test_parse_rate() -> None:
+    assert parse_rate("10/s") == (10.0, 10.0)
+    assert parse_rate("120/m") == (2.0, 120.0)
+    assert parse_rate("36/hour") == (0.01, 36.0)
+    assert parse_rate("60/ Minutes") == (1.0, 60.0)
+    assert parse_rate("2/sec") == (2.0, 2.0)
+    assert parse_rate("86400/day") == (1.0, 86400.0)
+    assert parse_rate(5) == (5.0, 5.0)
+    assert parse_rate("0.5") == (0.5, 1.0)
+
+    for value in ("10/w", "10/ms", "10/month", "10/hz", "0/s", "abc"):
+        with pytest.raises(ValueError):
+            parse_rate(value)
+
+
+def test_token_bucket_reservations() -> None:
+    bucket = TokenBucket(rate=2, capacity=2)
+    now = bucket.updated_at
+    assert bucket.reserve(now) == 0
+    assert bucket.reserve(now) == 0
+    # reservations queue up instead of failing
+    assert bucket.reserve(now) == pytest.approx(0.5)
+    assert bucket.reserve(now) == pytest.approx(1.0)
+    # refilled tokens pay back the debt first
+    assert bucket.reserve(now + 1.0) == pytest.approx(0.5)
+    assert bucket.reserve(now + 10) == 0
+
+
+async def test_shared_store_reserve_token() -> None:
+    store = InMemorySharedStore()
+    assert await store.reserve_token("k", 1, 1) == 0
+    assert await store.reserve_token("k", 1, 1) > 0
+    assert await store.reserve_token("other", 1, 1) == 0
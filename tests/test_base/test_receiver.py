@@ -0,0 +1,504 @@
+import asyncio
+import multiprocessing
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, List
+
+import orjson as json
+import pytest
+from taskiq import AckableMessage, Context, InMemoryBroker, TaskiqDepends
+from taskiq.message import BrokerMessage
+
+from unfazed_taskiq import recycling
+from unfazed_taskiq.drain import InFlightTracker
+from unfazed_taskiq.metrics import MetricsRegistry
+from unfazed_taskiq.middleware import (
+    UnfazedTaskiqConcurrencyMiddleware,
+    UnfazedTaskiqMetricsMiddleware,
+    UnfazedTaskiqMiddleware,
+    UnfazedTaskiqRateLimitMiddleware,
+    UnfazedTaskiqWorkflowMiddleware,
+)
+from unfazed_taskiq.receiver import (
+    AdaptiveController,
+    AdaptiveLimit,
+    AdaptiveReceiver,
+    UnfazedReceiver,
+    resident_memory,
+)
+
+
+class QueueBroker(InMemoryBroker):
+    """InMemoryBroker delivering messages through listen."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.queue: "asyncio.Queue[bytes]" = asyncio.Queue()
+
+    async def kick(self, message: BrokerMessage) -> None:
+        await self.queue.put(message.message)
+
+    async def listen(self) -> AsyncGenerator[bytes, None]:  # type: ignore[override]
+        while True:
+            yield await self.queue.get()
+
+
+class DelayingBroker(QueueBroker):
+    """QueueBroker with acks, keeping the messages it should delay."""
+
+    supports_delay = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.delayed: List[BrokerMessage] = []
+        self.acks: List[str] = []
+
+    async def kick(self, message: BrokerMessage) -> None:
+        if "delay" in message.labels:
+            self.delayed.append(message)
+        else:
+            await super().kick(message)
+
+    async def listen(self) -> AsyncGenerator[AckableMessage, None]:  # type: ignore[override]
+        while True:
+            data = await self.queue.get()
+
+            async def ack(data: bytes = data) -> None:
+                self.acks.append(self.formatter.loads(data).task_id)
+
+            yield AckableMessage(data=data, ack=ack)
+
+
+def saturate(controller: AdaptiveController, duration: float = 0.01) -> None:
+    for _ in range(controller.in_flight):
+        controller.started()
+    for _ in range(controller.in_flight):
+        controller.finished(duration)
+
+
+class TestAdaptiveLimit:
+    async def test_grow_and_shrink(self) -> None:
+        semaphore = asyncio.Semaphore(2)
+        limit = AdaptiveLimit(semaphore, 2)
+        await semaphore.acquire()
+        await semaphore.acquire()
+
+        # shrinking waits for the holders instead of interrupting them
+        limit.resize(1)
+        assert semaphore.locked()
+        semaphore.release()
+        semaphore.release()
+        await asyncio.sleep(0)
+        await semaphore.acquire()
+        assert semaphore.locked()
+
+        limit.resize(3)
+        await asyncio.wait_for(semaphore.acquire(), 1)
+        await asyncio.wait_for(semaphore.acquire(), 1)
+        assert semaphore.locked()
+
+    async def test_grow_cancels_pending_shrink(self) -> None:
+        semaphore = asyncio.Semaphore(1)
+        limit = AdaptiveLimit(semaphore, 1)
+        await semaphore.acquire()
+        limit.resize(0)
+        limit.resize(1)
+        await asyncio.sleep(0)
+        semaphore.release()
+        await asyncio.wait_for(semaphore.acquire(), 1)
+        assert limit.taken == []
+
+
+class TestAdaptiveController:
+    def test_slow_start_then_additive(self) -> None:
+        controller = AdaptiveController(min_in_flight=2, max_in_flight=40)
+        sizes = []
+        for _ in range(4):
+            saturate(controller)
+            controller.adjust(loop_lag=0)
+            sizes.append(controller.in_flight)
+        assert sizes == [4, 8, 16, 32]
+
+        controller.adjust(loop_lag=1)
+        assert controller.in_flight == 16
+        assert controller.prefetch == 0
+        saturate(controller)
+        controller.adjust(loop_lag=0)
+        assert controller.in_flight == 17
+
+    def test_keeps_limit_when_not_saturated(self) -> None:
+        controller = AdaptiveController(min_in_flight=4)
+        controller.started()
+        controller.finished(0.01)
+        controller.adjust(loop_lag=0)
+        assert controller.in_flight == 4
+
+    def test_backs_off_on_memory_and_latency(self) -> None:
+        controller = AdaptiveController(
+            min_in_flight=1, max_in_flight=64, max_memory=1000
+        )
+        controller.in_flight = 32
+        controller.adjust(loop_lag=0, memory=2000)
+        assert controller.in_flight == 16
+
+        saturate(controller, duration=0.01)
+        controller.adjust(loop_lag=0, memory=10)
+        assert controller.in_flight == 17
+        saturate(controller, duration=0.05)
+        controller.adjust(loop_lag=0)
+        assert controller.in_flight == 8
+
+    def test_prefetch_follows_throughput(self) -> None:
+        controller = AdaptiveController(max_prefetch=10, prefetch_window=1)
+        controller.window_started_at -= 1
+        for _ in range(5):
+            controller.started()
+            controller.finished(0.001)
+        controller.adjust(loop_lag=0)
+        assert 1 <= controller.prefetch <= 5
+        controller.window_started_at -= 1
+        for _ in range(50):
+            controller.started()
+            controller.finished(0.001)
+        controller.adjust(loop_lag=0)
+        assert controller.prefetch == 10
+
+    def test_validation(self) -> None:
+        with pytest.raises(ValueError):
+            AdaptiveController(min_in_flight=0)
+        with pytest.raises(ValueError):
+            AdaptiveController(min_in_flight=5, max_in_flight=4)
+        with pytest.raises(ValueError):
+            AdaptiveController(min_prefetch=-1)
+
+
+def test_resident_memory() -> None:
+    memory = resident_memory()
+    assert memory is None or memory > 0
+
+
+async def test_receiver_runs_tasks() -> None:
+    broker = QueueBroker()
+    done: List[int] = []
+
+    @broker.task(task_name="work")
+    async def work(value: int) -> None:
+        await asyncio.sleep(0.005)
+        done.append(value)
+
+    # receiver arguments come as strings from the command line
+    receiver = AdaptiveReceiver(
+        broker, max_in_flight="8", max_prefetch="4", interval="0.02"
+    )
+    assert receiver.controller.max_in_flight == 8
+    assert receiver.controller.interval == 0.02
+
+    for value in range(100):
+        await work.kiq(value)
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+
+    async def drained() -> Any:
+        while len(done) < 100:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(drained(), 10)
+    assert receiver.controller.in_flight > 1
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+    assert sorted(done) == list(range(100))
+
+
+async def test_receiver_drains_and_requeues() -> None:
+    broker = QueueBroker()
+    started = asyncio.Event()
+
+    @broker.task(task_name="quick")
+    async def quick() -> int:
+        return 1
+
+    @broker.task(task_name="stuck")
+    async def stuck() -> None:
+        started.set()
+        await asyncio.sleep(10)
+
+    tracker = InFlightTracker()
+    receiver = UnfazedReceiver(
+        broker,
+        max_async_tasks=10,
+        wait_tasks_timeout=0.2,
+        requeue="true",
+        drain_interval="0.05",
+        tracker=tracker,
+    )
+    quick_task = await quick.kiq()
+    stuck_task = await stuck.kiq()
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+    await asyncio.wait_for(started.wait(), 5)
+    assert [item["task_name"] for item in tracker.snapshot()] == ["stuck"]
+
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+    assert receiver.drain_report is not None
+    assert (receiver.drain_report.requeued, receiver.drain_report.cancelled) == (1, 0)
+    assert len(tracker) == 0
+    assert await broker.result_backend.is_result_ready(quick_task.task_id)
+    # the cancelled run leaves no result, its message is back in the queue
+    assert not await broker.result_backend.is_result_ready(stuck_task.task_id)
+    requeued = broker.formatter.loads(broker.queue.get_nowait())
+    assert requeued.task_id == stuck_task.task_id
+
+
+class HookRecorder(UnfazedTaskiqMiddleware):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: List[Any] = []
+
+    def pre_execute(self, message: Any) -> Any:
+        self.calls.append(("pre_execute", message.task_name))
+        return message
+
+    def on_error(self, message: Any, result: Any, exception: BaseException) -> None:
+        self.calls.append(("on_error", message.task_name))
+
+    def post_execute(self, message: Any, result: Any) -> None:
+        self.calls.append(("post_execute", message.task_name))
+
+    def release(self, message: Any) -> None:
+        self.calls.append(("release", message.task_name))
+
+
+@pytest.mark.parametrize("sync", [False, True])
+async def test_drain_cancellation_skips_error_hooks(sync: bool) -> None:
+    broker = QueueBroker()
+    recorder = HookRecorder()
+    broker.add_middlewares(recorder)
+    started = asyncio.Event()
+    loop = asyncio.get_running_loop()
+
+    if sync:
+
+        @broker.task(task_name="stuck")
+        def stuck() -> None:
+            loop.call_soon_threadsafe(started.set)
+            time.sleep(0.5)
+
+    else:
+
+        @broker.task(task_name="stuck")  # type: ignore[no-redef]
+        async def stuck() -> None:
+            started.set()
+            await asyncio.sleep(10)
+
+    receiver = UnfazedReceiver(
+        broker, max_async_tasks=10, wait_tasks_timeout=0.1, tracker=InFlightTracker()
+    )
+    await stuck.kiq()
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+    await asyncio.wait_for(started.wait(), 5)
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+
+    assert receiver.drain_report is not None
+    assert receiver.drain_report.requeued == 1
+    assert recorder.calls == [("pre_execute", "stuck"), ("release", "stuck")]
+
+
+async def test_receiver_defers_rate_limited_messages() -> None:
+    broker = QueueBroker()
+    broker.add_middlewares(UnfazedTaskiqRateLimitMiddleware(limits={"limited": "1/m"}))
+    done: List[str] = []
+
+    @broker.task(task_name="limited")
+    async def limited() -> None:
+        done.append("limited")
+
+    @broker.task(task_name="other")
+    async def other() -> None:
+        done.append("other")
+
+    tracker = InFlightTracker()
+    receiver = UnfazedReceiver(broker, max_async_tasks=1, tracker=tracker)
+    await limited.kiq()
+    await limited.kiq()
+    await other.kiq()
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+
+    async def ran_other() -> None:
+        while "other" not in done:
+            await asyncio.sleep(0.01)
+
+    # the second message waits for its token outside of the only slot
+    await asyncio.wait_for(ran_other(), 5)
+    assert done == ["limited", "other"]
+    assert len(tracker.deferred) == 1
+
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+    assert receiver.drain_report is not None
+    assert receiver.drain_report.requeued == 1
+    assert tracker.deferred == {}
+    requeued = broker.formatter.loads(broker.queue.get_nowait())
+    assert requeued.task_name == "limited"
+    assert float(requeued.labels["rate_limit_ready_at"]) > 0
+
+
+async def test_deferral_releases_the_middlewares() -> None:
+    broker = QueueBroker()
+    registry = MetricsRegistry()
+    metrics = UnfazedTaskiqMetricsMiddleware(registry)
+    # the second message takes a slot before the rate limit defers it
+    concurrency = UnfazedTaskiqConcurrencyMiddleware(limits={"capped": 2})
+    broker.add_middlewares(
+        metrics,
+        concurrency,
+        UnfazedTaskiqRateLimitMiddleware(limits={"capped": "1/m"}, max_delay=0.1),
+    )
+    done: List[int] = []
+
+    @broker.task(task_name="capped")
+    async def capped(value: int) -> None:
+        await asyncio.sleep(0.05)
+        done.append(value)
+
+    tracker = InFlightTracker()
+    receiver = UnfazedReceiver(broker, max_async_tasks=3, tracker=tracker)
+    for value in range(3):
+        await capped.kiq(value)
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+
+    async def settled() -> None:
+        while not done or tracker.entries:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(settled(), 5)
+    assert len(done) == 1
+    assert concurrency.acquired == {}
+    assert metrics.started == {}
+    assert registry.get("", "capped").in_flight == 0
+
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+
+
+async def test_deferred_messages_are_acked_and_delayed_by_the_broker() -> None:
+    broker = DelayingBroker()
+    broker.add_middlewares(UnfazedTaskiqRateLimitMiddleware(limits={"limited": "1/m"}))
+    labels: List[Any] = []
+
+    @broker.task(task_name="limited")
+    async def limited(context: Context = TaskiqDepends()) -> None:  # noqa: B008
+        labels.append(dict(context.message.labels))
+
+    tracker = InFlightTracker()
+    receiver = UnfazedReceiver(broker, max_async_tasks=1, tracker=tracker)
+    first = await limited.kiq()
+    second = await limited.kiq()
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+
+    async def delayed() -> None:
+        while not broker.delayed:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(delayed(), 5)
+    # the copy is in the broker, nothing waits in the process
+    assert tracker.deferred == {}
+    copy = broker.delayed[0]
+    assert copy.task_id == second.task_id
+    assert 0 < float(copy.labels["delay"]) <= 60
+    assert copy.labels["deferred"] == 1
+    assert float(copy.labels["rate_limit_ready_at"]) > 0
+    assert sorted(broker.acks) == sorted([first.task_id, second.task_id])
+
+    # its delay is over once it is delivered, retries must not inherit it
+    message = broker.formatter.loads(copy.message)
+    message.labels["rate_limit_ready_at"] = 0
+    await broker.queue.put(broker.formatter.dumps(message).message)
+
+    async def ran() -> None:
+        while len(labels) < 2:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(ran(), 5)
+    assert "delay" not in labels[1] and "deferred" not in labels[1]
+
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+
+
+async def test_receiver_health_file(tmp_path: Path) -> None:
+    broker = QueueBroker()
+    receiver = UnfazedReceiver(
+        broker,
+        max_async_tasks=1,
+        health_file=str(tmp_path / "worker-{worker}.json"),
+        lag_threshold="1",
+        tracker=InFlightTracker(),
+    )
+    assert receiver.lag_threshold == 1.0
+    finish = asyncio.Event()
+    listening = asyncio.create_task(receiver.listen(finish))
+    path = tmp_path / "worker-0.json"
+    while not path.exists():
+        await asyncio.sleep(0.01)
+    status = json.loads(path.read_bytes())
+    assert status["ready"] is True
+    assert status["checks"] == {"broker": None, "fetching": True}
+
+    finish.set()
+    await asyncio.wait_for(listening, 5)
+    assert json.loads(path.read_bytes())["live"] is False
+
+
+@pytest.mark.skipif(resident_memory() is None, reason="needs /proc")
+async def test_receiver_recycles_on_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    stopped = multiprocessing.Event()
+    monkeypatch.setattr(recycling, "fetching_stopped", stopped)
+    receiver = UnfazedReceiver(
+        QueueBroker(),
+        max_async_tasks=1,
+        max_rss="1",
+        memory_interval="0.01",
+        tracker=InFlightTracker(),
+    )
+    finish = asyncio.Event()
+    # the process is over its limit, it stops by itself
+    await asyncio.wait_for(receiver.listen(finish), 5)
+    assert finish.is_set()
+    assert stopped.is_set()
+
+
+async def test_receiver_stops_fetching_after_max_tasks(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    stopped = multiprocessing.Event()
+    monkeypatch.setattr(recycling, "fetching_stopped", stopped)
+    broker = QueueBroker()
+
+    @broker.task(task_name="noop")
+    async def noop() -> None:
+        pass
+
+    receiver = UnfazedReceiver(
+        broker, max_async_tasks=2, max_tasks_to_execute=3, tracker=InFlightTracker()
+    )
+    for _ in range(5):
+        await noop.kiq()
+    await asyncio.wait_for(receiver.listen(asyncio.Event()), 5)
+    assert stopped.is_set()
+    assert broker.queue.qsize() > 0
+
+
+def test_receiver_tells_the_middlewares_the_worker_count() -> None:
+    broker = QueueBroker()
+    middleware = UnfazedTaskiqWorkflowMiddleware()
+    broker.add_middlewares(middleware)
+    UnfazedReceiver(broker, tracker=InFlightTracker())
+    assert middleware.worker_processes is None
+    UnfazedReceiver(broker, workers="4", tracker=InFlightTracker())
+    assert middleware.worker_processes == 4
@@ -0,0 +1,97 @@
+import signal
+import time
+from typing import Any, Iterator
+
+import pytest
+from taskiq.cli.worker.args import WorkerArgs
+from taskiq.cli.worker.process_manager import ShutdownAction
+
+from unfazed_taskiq.recycling import RecyclingProcessManager, stop_fetching
+
+
+def recycled_worker(args: WorkerArgs) -> None:
+    stop_fetching()
+    # still draining when its replacement starts
+    time.sleep(1)
+
+
+def crashing_worker(args: WorkerArgs) -> None:
+    raise SystemExit(1)
+
+
+def idle_worker(args: WorkerArgs) -> None:
+    time.sleep(30)
+
+
+def wait_for(predicate: Any, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class TestRecyclingProcessManager:
+    @pytest.fixture(autouse=True)
+    def restore_signals(self) -> Iterator[None]:
+        signals = [signal.SIGINT, signal.SIGTERM, signal.SIGHUP]
+        handlers = [signal.getsignal(signum) for signum in signals]
+        yield
+        for signum, handler in zip(signals, handlers):
+            signal.signal(signum, handler)
+
+    def _manager(self, worker: Any, **kwargs: Any) -> RecyclingProcessManager:
+        return RecyclingProcessManager(
+            WorkerArgs(broker="broker", modules=[], **kwargs),
+            worker,
+            drain_timeout=5,
+        )
+
+    def _stop(self, manager: RecyclingProcessManager) -> None:
+        manager.shutdown()
+        for process in [*manager.workers, *(p for p, _ in manager.retiring)]:
+            process.join(5)
+
+    def test_replaces_before_the_old_process_exits(self) -> None:
+        manager = self._manager(recycled_worker, workers=2)
+        try:
+            manager.prepare_workers()
+            old = manager.workers[0]
+            wait_for(lambda: manager.fetching[old].is_set())
+            assert manager.recycle()
+
+            assert [worker.name for worker in manager.workers] == [
+                "worker-0",
+                "worker-1",
+            ]
+            assert old not in manager.workers
+            assert old in [process for process, _ in manager.retiring]
+            # the replacement runs while the old process drains
+            assert old.is_alive() and manager.workers[0].is_alive()
+            assert manager.failures == 0
+
+            wait_for(lambda: not old.is_alive())
+            manager.reap()
+            assert old not in [process for process, _ in manager.retiring]
+            assert old.exitcode == 0
+        finally:
+            self._stop(manager)
+
+    def test_dead_processes_count_as_failures(self) -> None:
+        manager = self._manager(crashing_worker, workers=1, max_fails=2)
+        try:
+            manager.prepare_workers()
+            wait_for(lambda: not manager.workers[0].is_alive())
+            assert manager.recycle()
+            assert manager.failures == 1
+            wait_for(lambda: not manager.workers[0].is_alive())
+            assert not manager.recycle()
+        finally:
+            self._stop(manager)
+
+    def test_shutdown_action(self) -> None:
+        manager = self._manager(idle_worker, workers=1)
+        manager.action_queue.put(ShutdownAction())
+        assert manager.start() is None
+        worker = manager.workers[0]
+        worker.join(5)
+        assert worker.exitcode is not None
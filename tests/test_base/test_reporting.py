@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, List
+
+from unfazed_taskiq.reporting import ErrorGroup, ErrorReporter, fingerprint
+
+
+def _raise(exc: BaseException) -> BaseException:
+    try:
+        raise exc
+    except BaseException as caught:
+        return caught
+
+
+def test_fingerprint() -> None:
+    first = fingerprint("job", _raise(ValueError("a")))
+    second = fingerprint("job", _raise(ValueError("b")))
+    assert first == second
+    assert first.startswith("builtins.ValueError|job|")
+    assert first.endswith(":_raise:9")
+    assert fingerprint("other", _raise(ValueError("a"))) != first
+    assert fingerprint("job", _raise(KeyError("a"))) != first
+
+
+class TestErrorReporter:
+    def _reporter(self, **kwargs: Any) -> Any:
+        reported: List[str] = []
+        summaries: List[tuple] = []
+
+        def report(group: ErrorGroup, exception: BaseException, tag: str) -> None:
+            reported.append(tag)
+
+        def summarize(group: ErrorGroup, unreported: int) -> None:
+            summaries.append((group.task_name, group.count, unreported))
+
+        return ErrorReporter(report, summarize, **kwargs), reported, summaries
+
+    async def test_reports_in_background(self) -> None:
+        reporter, reported, summaries = self._reporter()
+        reporter.submit("job", _raise(ValueError()), "a")
+        assert reported == []
+
+        await asyncio.sleep(0.01)
+        assert reported == ["a"]
+        await reporter.close()
+        assert summaries == []
+
+    async def test_sheds_when_full(self) -> None:
+        reporter, reported, summaries = self._reporter(
+            max_queue_size=2, sample_threshold=100
+        )
+        for i in range(5):
+            reporter.submit("job", _raise(ValueError()), str(i))
+
+        assert reporter.shed == 3
+        await reporter.close()
+        assert reported == ["0", "1"]
+        assert summaries == [("job", 5, 3)]
+
+    async def test_window_summary(self) -> None:
+        reporter, reported, summaries = self._reporter(
+            flush_interval=0.01, sample_threshold=1, sample_every=1000
+        )
+        for i in range(3):
+            reporter.submit("job", _raise(ValueError()), str(i))
+        await asyncio.sleep(0.05)
+
+        assert reported == ["0"]
+        assert summaries == [("job", 3, 2)]
+        # counting restarts with the next window
+        reporter.submit("job", _raise(ValueError()), "3")
+        await reporter.close()
+        assert reported == ["0", "3"]
+
+    async def test_report_errors_are_swallowed(self) -> None:
+        def report(*args: Any) -> None:
+            raise RuntimeError("sentry down")
+
+        reporter = ErrorReporter(report, lambda group, unreported: None)
+        reporter.submit("job", _raise(ValueError()))
+        await reporter.close()
+        assert reporter.reported == {}
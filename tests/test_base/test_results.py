@@ -0,0 +1,286 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+import pytest
+from taskiq import InMemoryBroker, TaskiqResult
+from taskiq.brokers.inmemory_broker import InmemoryResultBackend
+from taskiq.exceptions import TaskiqResultTimeoutError
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.results import (
+    CachedResultBackend,
+    InMemoryResultNotifier,
+    NotifyingResultBackend,
+    RedisResultNotifier,
+)
+from unfazed_taskiq.task import UnfazedTaskiqTask
+
+
+def _result(value: Any) -> TaskiqResult[Any]:
+    return TaskiqResult(is_err=False, return_value=value, execution_time=0)
+
+
+class SlowResultBackend(InmemoryResultBackend[Any]):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: List[str] = []
+
+    async def is_result_ready(self, task_id: str) -> bool:
+        self.calls.append("ready")
+        await asyncio.sleep(0.01)
+        return await super().is_result_ready(task_id)
+
+    async def get_result(
+        self, task_id: str, with_logs: bool = False
+    ) -> TaskiqResult[Any]:
+        self.calls.append("get")
+        await asyncio.sleep(0.01)
+        return await super().get_result(task_id, with_logs)
+
+
+class TestCachedResultBackend:
+    async def test_repeated_reads_hit_the_cache(self) -> None:
+        inner = SlowResultBackend()
+        await inner.set_result("id", _result(1))
+        backend = CachedResultBackend(inner)
+
+        assert (await backend.get_result("id")).return_value == 1
+        assert await backend.is_result_ready("id")
+        assert (await backend.get_result("id")).return_value == 1
+        assert inner.calls == ["get"]
+        assert backend.stats() == {"hits": 1, "misses": 1, "coalesced": 0, "size": 1}
+
+    async def test_concurrent_reads_are_coalesced(self) -> None:
+        inner = SlowResultBackend()
+        await inner.set_result("id", _result(1))
+        backend = CachedResultBackend(inner)
+
+        results = await asyncio.gather(*(backend.get_result("id") for _ in range(10)))
+        assert [result.return_value for result in results] == [1] * 10
+        assert inner.calls == ["get"]
+        assert backend.coalesced == 9
+
+        readiness = await asyncio.gather(
+            *(backend.is_result_ready("other") for _ in range(5))
+        )
+        assert readiness == [False] * 5
+        assert inner.calls == ["get", "ready"]
+        assert backend.pending == {}
+
+    async def test_unfinished_tasks_are_not_cached(self) -> None:
+        inner = SlowResultBackend()
+        backend = CachedResultBackend(inner)
+        assert not await backend.is_result_ready("id")
+        await inner.set_result("id", _result(2))
+        assert await backend.is_result_ready("id")
+        assert inner.calls == ["ready", "ready"]
+
+    async def test_errors_are_shared_and_not_cached(self) -> None:
+        inner = SlowResultBackend()
+        backend = CachedResultBackend(inner)
+
+        results = await asyncio.gather(
+            *(backend.get_result("missing") for _ in range(3)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, Exception) for result in results)
+        assert inner.calls == ["get"]
+        assert backend.cached("missing") is None
+
+    async def test_cancelled_waiter_does_not_cancel_others(self) -> None:
+        inner = SlowResultBackend()
+        await inner.set_result("id", _result(1))
+        backend = CachedResultBackend(inner)
+
+        first = asyncio.create_task(backend.get_result("id"))
+        second = asyncio.create_task(backend.get_result("id"))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert (await second).return_value == 1
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    async def test_written_results_are_cached(self) -> None:
+        inner = SlowResultBackend()
+        backend = CachedResultBackend(inner, ttl=None)
+        await backend.set_result("id", _result(3))
+        assert (await backend.get_result("id", with_logs=True)).return_value == 3
+        assert inner.calls == []
+
+    async def test_ttl(self) -> None:
+        inner = SlowResultBackend()
+        await inner.set_result("id", _result(1))
+        backend = CachedResultBackend(inner, ttl=0.01)
+        await backend.get_result("id")
+        await asyncio.sleep(0.02)
+        await backend.get_result("id")
+        assert inner.calls == ["get", "get"]
+
+    async def test_logs_are_fetched_when_missing(self) -> None:
+        inner = SlowResultBackend()
+        await inner.set_result("id", _result(1))
+        backend = CachedResultBackend(inner)
+        await backend.get_result("id")
+        await backend.get_result("id", with_logs=True)
+        await backend.get_result("id")
+        assert inner.calls == ["get", "get"]
+
+    async def test_wait_result_through_broker(self) -> None:
+        broker = InMemoryBroker(await_inplace=True)
+        backend = CachedResultBackend(broker.result_backend)
+        broker.with_result_backend(backend)
+
+        @broker.task(task_name="double")
+        async def double(value: int) -> int:
+            return value * 2
+
+        task = await double.kiq(2)
+        assert (await task.wait_result()).return_value == 4
+        assert backend.cached(task.task_id) is not None
+
+    async def test_lifecycle_is_forwarded(self) -> None:
+        inner = DummyResultBackend()  # type: ignore[var-annotated]
+        backend = CachedResultBackend(inner)
+        await backend.startup()
+        await backend.shutdown()
+        assert await backend.get_progress("id") is None
+
+
+class SilentNotifier(InMemoryResultNotifier):
+    async def publish(self, task_id: str) -> None:
+        pass
+
+
+class BrokenNotifier(InMemoryResultNotifier):
+    async def subscribe(self) -> AsyncIterator[str]:
+        raise ConnectionError("lost")
+
+
+class SlowSubscriptionNotifier(InMemoryResultNotifier):
+    async def subscribe(self) -> AsyncIterator[str]:
+        await asyncio.sleep(0.05)
+        return await super().subscribe()
+
+
+class FakePubSub:
+    def __init__(self, redis: "FakeRedis") -> None:
+        self.redis = redis
+        self.queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue()
+        self.closed = False
+
+    async def subscribe(self, channel: str) -> None:
+        self.redis.subscribers.setdefault(channel, []).append(self)
+
+    async def listen(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            yield await self.queue.get()
+
+    async def aclose(self) -> None:
+        self.closed = True
+        for subscribers in self.redis.subscribers.values():
+            if self in subscribers:
+                subscribers.remove(self)
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.subscribers: Dict[str, List[FakePubSub]] = {}
+        self.closed = False
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> FakePubSub:
+        return FakePubSub(self)
+
+    async def publish(self, channel: str, message: str) -> None:
+        for pubsub in self.subscribers.get(channel, []):
+            pubsub.queue.put_nowait({"type": "message", "data": message.encode()})
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class TestNotifyingResultBackend:
+    def _broker(self, notifier: InMemoryResultNotifier, poll_interval: float) -> Any:
+        broker = InMemoryBroker()
+        broker.decorator_class = UnfazedTaskiqDecoratedTask
+        backend = NotifyingResultBackend(
+            broker.result_backend, notifier, poll_interval=poll_interval
+        )
+        broker.with_result_backend(backend)
+
+        @broker.task(task_name="slow")
+        async def slow(delay: float) -> float:
+            await asyncio.sleep(delay)
+            return delay
+
+        return broker, backend, slow
+
+    async def test_waiters_are_woken_by_notification(self) -> None:
+        notifier = InMemoryResultNotifier()
+        broker, backend, slow = self._broker(notifier, poll_interval=10)
+
+        tasks = [await slow.kiq(0.05) for _ in range(3)]
+        assert all(isinstance(task, UnfazedTaskiqTask) for task in tasks)
+        started_at = time.monotonic()
+        results = await asyncio.gather(*(task.wait_result() for task in tasks))
+        assert time.monotonic() - started_at < 1
+        assert [result.return_value for result in results] == [0.05] * 3
+        assert notifier.waiters == {}
+
+        await backend.shutdown()
+        assert notifier.listener is None
+
+    async def test_polling_is_the_fallback(self) -> None:
+        broker, backend, slow = self._broker(SilentNotifier(), poll_interval=0.02)
+        task = await slow.kiq(0.05)
+        assert (await task.wait_result()).return_value == 0.05
+        await backend.shutdown()
+
+    async def test_listener_failure_falls_back_to_polling(self) -> None:
+        broker, backend, slow = self._broker(BrokenNotifier(), poll_interval=0.02)
+        task = await slow.kiq(0.05)
+        assert (await task.wait_result()).return_value == 0.05
+        await backend.shutdown()
+
+    async def test_notification_right_after_register_is_kept(self) -> None:
+        notifier = SlowSubscriptionNotifier()
+        event = await notifier.register("id")
+        # published after register, before the waiter checks the backend
+        await notifier.publish("id")
+        await asyncio.wait_for(event.wait(), 1)
+        await notifier.shutdown()
+
+    async def test_result_stored_while_subscribing_is_seen(self) -> None:
+        broker, backend, slow = self._broker(SlowSubscriptionNotifier(), 10)
+        task = await slow.kiq(0.01)
+        started_at = time.monotonic()
+        assert (await task.wait_result()).return_value == 0.01
+        assert time.monotonic() - started_at < 1
+        await backend.shutdown()
+
+    async def test_redis_notifier(self) -> None:
+        pytest.importorskip("redis")
+        notifiers = [RedisResultNotifier(channel="results") for _ in range(2)]
+        redis = FakeRedis()
+        for notifier in notifiers:
+            notifier.redis = redis  # type: ignore[assignment]
+
+        event = await notifiers[0].register("id")
+        other = await notifiers[0].register("other")
+        await notifiers[1].publish("id")
+        await asyncio.wait_for(event.wait(), 1)
+        assert not other.is_set()
+
+        await notifiers[0].shutdown()
+        assert redis.closed
+        assert redis.subscribers == {"results": []}
+
+    async def test_timeout(self) -> None:
+        broker, backend, slow = self._broker(InMemoryResultNotifier(), 10)
+        task = await slow.kiq(0.2)
+        started_at = time.monotonic()
+        with pytest.raises(TaskiqResultTimeoutError):
+            await task.wait_result(timeout=0.05)
+        assert time.monotonic() - started_at < 0.5
+        await backend.shutdown()
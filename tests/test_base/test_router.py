@@ -0,0 +1,98 @@
+from collections import Counter
+from typing import Any, Dict
+
+import pytest
+from taskiq import InMemoryBroker
+
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.router import HashRing, Router
+
+
+class TestHashRing:
+    def test_keys_are_spread_and_stable(self) -> None:
+        ring = HashRing(["a", "b", "c"])
+        owners = {str(key): ring.get(str(key)) for key in range(3000)}
+        counts = Counter(owners.values())
+        assert set(counts) == {"a", "b", "c"}
+        assert min(counts.values()) > 700
+        assert HashRing(["c", "a", "b"]).get("42") == owners["42"]
+
+    def test_adding_a_node_moves_few_keys(self) -> None:
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "b", "c", "d"])
+        moved = [
+            key for key in map(str, range(3000)) if before.get(key) != after.get(key)
+        ]
+        assert all(after.get(key) == "d" for key in moved)
+        assert len(moved) < 1200
+
+    def test_needs_nodes(self) -> None:
+        with pytest.raises(ValueError):
+            HashRing([])
+
+
+def _router(brokers: Dict[str, Any], aliases: Any, **kwargs: Any) -> Router:
+    return Router("tenants", aliases, brokers, **kwargs)
+
+
+class TestRouter:
+    def test_rules_come_first(self) -> None:
+        router = _router(
+            {},
+            ["a", "b"],
+            key="tenant_id",
+            rules=[({"priority": "high"}, "fast")],
+        )
+        assert router.select({"priority": "high", "tenant_id": 1}) == "fast"
+        assert router.select({"priority": "low", "tenant_id": 1}) == router.ring.get(
+            "1"
+        )
+        assert router.all_aliases == ["a", "b", "fast"]
+
+    def test_routing_key_from_labels_and_arguments(self) -> None:
+        router = _router({}, ["a", "b", "c"], key="tenant_id")
+
+        def sync_tenant(tenant_id: int, full: bool = False) -> None:
+            pass
+
+        expected = router.ring.get("7")
+        assert router.select({"tenant_id": 7}) == expected
+        assert router.select({}, kwargs={"tenant_id": 7}) == expected
+        assert router.select({}, (7,), {"full": True}, sync_tenant) == expected
+        assert router.routing_key({}, (1, 2, 3), {}, sync_tenant) is None
+
+    def test_round_robin_without_key(self) -> None:
+        router = _router({}, ["a", "b"])
+        assert [router.select({}) for _ in range(4)] == ["a", "b", "a", "b"]
+
+
+class TestRoutedKicker:
+    async def test_messages_go_to_the_selected_broker(self) -> None:
+        brokers = {}
+        for alias in ("a", "b"):
+            broker = InMemoryBroker(await_inplace=True)
+            broker.decorator_class = UnfazedTaskiqDecoratedTask
+            brokers[alias] = broker
+        received: Dict[str, Counter] = {"a": Counter(), "b": Counter()}
+
+        def register(alias: str) -> Any:
+            @brokers[alias].task(task_name="sync_tenant")
+            async def sync_tenant(tenant_id: int) -> str:
+                received[alias][tenant_id] += 1
+                return alias
+
+            return sync_tenant
+
+        primary = register("a")
+        register("b")
+        primary.router = _router(brokers, ["a", "b"], key="tenant_id")
+
+        for tenant_id in range(20):
+            for _ in range(2):
+                task = await primary.kiq(tenant_id)
+                result = await task.wait_result()
+                assert result.return_value == primary.router.ring.get(str(tenant_id))
+
+        assert received["a"] and received["b"]
+        # every tenant lands on a single alias
+        assert not set(received["a"]) & set(received["b"])
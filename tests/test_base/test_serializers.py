@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+import pytest
+from pydantic import BaseModel
+from taskiq import InMemoryBroker, TaskiqMessage
+from taskiq.serializers import JSONSerializer
+
+from unfazed_taskiq import serializers
+from unfazed_taskiq.serializers import (
+    MSGPackSerializer,
+    ORJSONSerializer,
+    encode_default,
+)
+
+
+class Point(BaseModel):
+    x: int
+    y: int
+
+
+def _message(*args: object) -> TaskiqMessage:
+    return TaskiqMessage(
+        task_id="id", task_name="job", labels={"a": 1}, args=list(args), kwargs={}
+    )
+
+
+def test_encode_default() -> None:
+    assert encode_default(Point(x=1, y=2)) == {"x": 1, "y": 2}
+    assert sorted(encode_default({2, 1})) == [1, 2]
+    assert encode_default(Decimal("1.50")) == "1.50"
+    with pytest.raises(TypeError):
+        encode_default(object())
+
+
+class TestORJSONSerializer:
+    def test_roundtrip_through_formatter(self) -> None:
+        broker = InMemoryBroker().with_serializer(ORJSONSerializer())
+        message = _message({"key": [1, 2.5, None]}, "text")
+        body = broker.formatter.dumps(message).message
+        assert broker.formatter.loads(body) == message
+
+    def test_wire_compatible_with_json(self) -> None:
+        message = _message({"key": [1, 2.5, None]}, "text")
+        sender = InMemoryBroker().with_serializer(ORJSONSerializer())
+        worker = InMemoryBroker().with_serializer(JSONSerializer())
+        assert worker.formatter.loads(sender.formatter.dumps(message).message) == (
+            message
+        )
+        assert sender.formatter.loads(worker.formatter.dumps(message).message) == (
+            message
+        )
+
+    def test_extended_types(self) -> None:
+        serializer = ORJSONSerializer()
+        body = serializer.dumpb({1: Point(x=1, y=2), "d": Decimal("2.5")})
+        assert serializer.loadb(body) == {"1": {"x": 1, "y": 2}, "d": "2.5"}
+
+
+class TestMSGPackSerializer:
+    def test_roundtrip_through_formatter(self) -> None:
+        pytest.importorskip("msgpack")
+        broker = InMemoryBroker().with_serializer(MSGPackSerializer())
+        message = _message({"key": [1, 2.5, None]}, Point(x=1, y=2))
+        body = broker.formatter.dumps(message).message
+        loaded = broker.formatter.loads(body)
+        assert loaded.args == [{"key": [1, 2.5, None]}, {"x": 1, "y": 2}]
+
+    def test_missing_package(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        monkeypatch.setattr(serializers, "msgpack", None)
+        with pytest.raises(ImportError, match=r"unfazed-taskiq\[msgpack\]"):
+            MSGPackSerializer()
@@ -0,0 +1,172 @@
+import asyncio
+from pathlib import Path
+from typing import Any, Dict
+
+import orjson as json
+from taskiq import InMemoryBroker, TaskiqResult
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.middleware import UnfazedTaskiqTracingMiddleware, saving
+from unfazed_taskiq.tracing import (
+    FileSpanExporter,
+    InMemorySpanExporter,
+    Span,
+    Tracer,
+    current_span,
+)
+from unfazed_taskiq.tracing import tracer as default_tracer
+
+
+class FailingResultBackend(DummyResultBackend):
+    async def set_result(self, task_id: str, result: TaskiqResult[Any]) -> None:
+        raise ConnectionError("backend is down")
+
+
+class TestTracer:
+    def test_sampling_is_decided_at_the_root(self) -> None:
+        tracer = Tracer(InMemorySpanExporter(), sample_rate=0)
+        root = tracer.child_context()
+        child = tracer.child_context(root)
+        assert not root.sampled and not child.sampled
+        assert child.trace_id == root.trace_id
+        assert child.span_id != root.span_id
+
+        tracer.sample_rate = 1
+        assert tracer.child_context().sampled
+        assert not tracer.child_context(root).sampled
+
+    def test_nothing_sampled_without_exporter(self) -> None:
+        assert not Tracer().child_context().sampled
+
+    def test_span_context_manager(self) -> None:
+        exporter = InMemorySpanExporter()
+        tracer = Tracer(exporter, batch_size=2)
+        with tracer.span("outer", path="/orders") as outer:
+            assert current_span.get() is outer
+            with tracer.span("inner") as inner:
+                assert inner.trace_id == outer.trace_id
+        assert current_span.get() is None
+
+        spans = list(exporter.spans)
+        assert [span.name for span in spans] == ["inner", "outer"]
+        assert spans[0].parent_id == outer.span_id
+        assert spans[1].parent_id is None
+        assert spans[1].attributes == {"path": "/orders"}
+        assert spans[1].end_ns >= spans[1].start_ns
+
+    def test_file_exporter(self, tmp_path: Path) -> None:
+        path = tmp_path / "spans.jsonl"
+        tracer = Tracer(FileSpanExporter(str(path)))
+        tracer.record(Span("a", "t", "s1", None, 1, 2))
+        tracer.record(Span("b", "t", "s2", "s1", 1, 2, {"k": "v"}))
+        tracer.flush()
+        tracer.record(Span("c", "t", "s3", "s1", 1, 2))
+        tracer.shutdown()
+        assert tracer.exporter.thread is None  # type: ignore[union-attr]
+
+        lines = [json.loads(line) for line in path.read_bytes().splitlines()]
+        assert lines[1] == {
+            "name": "b",
+            "trace_id": "t",
+            "span_id": "s2",
+            "parent_id": "s1",
+            "start_ns": 1,
+            "end_ns": 2,
+            "attributes": {"k": "v"},
+        }
+        assert [line["name"] for line in lines] == ["a", "b", "c"]
+
+
+class TestUnfazedTaskiqTracingMiddleware:
+    def _broker(self, sample_rate: float = 1.0) -> Any:
+        exporter = InMemorySpanExporter()
+        middleware = UnfazedTaskiqTracingMiddleware(
+            exporter=exporter,
+            sample_rate=sample_rate,
+            batch_size=1,
+            tracer=Tracer(),
+        )
+        broker = InMemoryBroker(await_inplace=True)
+        broker.add_middlewares(middleware)
+        return broker, middleware, exporter
+
+    async def test_trace_follows_child_tasks(self) -> None:
+        broker, middleware, exporter = self._broker()
+
+        @broker.task
+        async def child() -> None:
+            pass
+
+        @broker.task
+        async def parent() -> None:
+            await child.kiq()
+
+        with middleware.tracer.span("GET /orders") as root:
+            await parent.kiq()
+
+        spans: Dict[str, Span] = {span.name: span for span in exporter.spans}
+        assert {span.trace_id for span in spans.values()} == {root.trace_id}
+        parent_task = spans[f"task {parent.task_name}"]
+        child_task = spans[f"task {child.task_name}"]
+        assert parent_task.parent_id == root.span_id
+        assert child_task.parent_id == spans[f"execute {parent.task_name}"].span_id
+        for kind in ("queue", "execute", "result"):
+            assert spans[f"{kind} {parent.task_name}"].parent_id == parent_task.span_id
+        assert parent_task.attributes["error"] is False
+        assert middleware.executions == {}
+        assert saving.get() is None
+        assert current_span.get() is None
+
+    async def test_unsaved_results_leave_nothing_behind(self) -> None:
+        broker, middleware, exporter = self._broker()
+        broker.with_result_backend(FailingResultBackend())
+
+        @broker.task
+        async def job() -> None:
+            pass
+
+        async def run() -> None:
+            await job.kiq()
+            assert saving.get() is not None
+
+        # each message runs in its own context, as with a worker
+        await asyncio.create_task(run())
+        assert saving.get() is None
+        names = {span.name for span in exporter.spans}
+        assert f"execute {job.task_name}" in names
+        assert f"result {job.task_name}" not in names
+
+    def test_install_configures_the_global_tracer(self) -> None:
+        exporter = InMemorySpanExporter()
+        middleware = UnfazedTaskiqTracingMiddleware(exporter=exporter, sample_rate=0.5)
+        other = UnfazedTaskiqTracingMiddleware(exporter=InMemorySpanExporter())
+        assert default_tracer.exporter is None
+        assert other.tracer is not middleware.tracer
+        try:
+            middleware.install()
+            assert middleware.tracer is default_tracer
+            assert default_tracer.exporter is exporter
+            assert default_tracer.sample_rate == 0.5
+        finally:
+            default_tracer.configure(sample_rate=1.0)
+            default_tracer.exporter = None
+
+    async def test_unsampled_trace_records_nothing(self) -> None:
+        broker, middleware, exporter = self._broker(sample_rate=0)
+        sampled: list = []
+
+        @broker.task
+        async def child() -> None:
+            sampled.append(current_span.get().sampled)  # type: ignore[union-attr]
+
+        @broker.task
+        async def parent() -> None:
+            await child.kiq()
+
+        task = await parent.kiq()
+        result = await task.wait_result()
+        assert not result.is_err
+        assert sampled == [False]
+        assert result.labels["trace_sampled"] == 0
+        assert "sent_at_ns" not in result.labels
+        assert list(exporter.spans) == []
@@ -0,0 +1,161 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from taskiq import InMemoryBroker
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.middleware import UnfazedTaskiqWorkflowMiddleware
+from unfazed_taskiq.store import InMemorySharedStore
+from unfazed_taskiq.workflow import (
+    CHAIN_LABEL,
+    Chain,
+    Signature,
+    chain,
+    chord,
+    group,
+)
+
+
+class TestWorkflow:
+    def _broker(self) -> Any:
+        broker = InMemoryBroker()
+        broker.decorator_class = UnfazedTaskiqDecoratedTask
+        self.store = InMemorySharedStore()
+        self.middleware = UnfazedTaskiqWorkflowMiddleware()
+        self.middleware.with_store(self.store, "alias")
+        broker.add_middlewares(self.middleware)
+        self.calls: List[Any] = []
+
+        @broker.task(task_name="add")
+        async def add(value: int, amount: int) -> int:
+            await asyncio.sleep(0.01)
+            self.calls.append(("add", value, amount))
+            return value + amount
+
+        @broker.task(task_name="total")
+        async def total(values: List[int], offset: int = 0) -> int:
+            self.calls.append(("total", values))
+            return sum(values) + offset
+
+        @broker.task(task_name="fail")
+        async def fail(value: int) -> int:
+            raise ValueError("boom")
+
+        return broker, add, total, fail
+
+    def test_signature(self) -> None:
+        broker, add, _, _ = self._broker()
+        signature = add.s(1, amount=2)
+        assert isinstance(signature, Signature)
+        assert signature.to_dict() == {
+            "task_name": "add",
+            "args": [1],
+            "kwargs": {"amount": 2},
+            "labels": {},
+            "task_id": None,
+        }
+        assert Signature.from_dict(signature.to_dict()).task_name == "add"
+        with pytest.raises(ValueError):
+            Signature("add").get_broker()
+
+    async def test_chain(self) -> None:
+        broker, add, _, _ = self._broker()
+        task = await chain(add.s(1, 1), add.s(10), add.s(100)).kiq()
+        result = await task.wait_result(timeout=2)
+        assert result.return_value == 112
+        assert self.calls == [("add", 1, 1), ("add", 2, 10), ("add", 12, 100)]
+
+    async def test_chain_stops_on_error(self) -> None:
+        broker, add, _, fail = self._broker()
+        last = add.s(1)
+        task = await chain(add.s(1, 1), fail.s(), last).kiq()
+        await asyncio.sleep(0.1)
+        assert self.calls == [("add", 1, 1)]
+        assert not await task.is_ready()
+        assert last.task_id == task.task_id
+
+    async def test_single_step_chain(self) -> None:
+        broker, add, _, _ = self._broker()
+        first = Chain(add.s(1, 1)).prepare(broker)
+        assert CHAIN_LABEL not in first.labels
+        with pytest.raises(ValueError):
+            Chain()
+
+    async def test_group(self) -> None:
+        broker, add, _, _ = self._broker()
+        tasks = await group(add.s(1, 1), add.s(2, 2)).kiq()
+        results = [await task.wait_result(timeout=2) for task in tasks]
+        assert [result.return_value for result in results] == [2, 4]
+
+    async def test_chord(self) -> None:
+        broker, add, total, _ = self._broker()
+        task = await chord(
+            [add.s(index, 1) for index in range(5)], total.s(offset=100)
+        ).kiq()
+        result = await task.wait_result(timeout=2)
+        assert result.return_value == 115
+        assert self.calls[-1] == ("total", [1, 2, 3, 4, 5])
+        assert len([call for call in self.calls if call[0] == "total"]) == 1
+
+    async def test_chord_with_chain_callback(self) -> None:
+        broker, add, total, _ = self._broker()
+        task = await chord(
+            group(add.s(1, 1), add.s(2, 2)), chain(total.s(), add.s(1))
+        ).kiq()
+        result = await task.wait_result(timeout=2)
+        assert result.return_value == 7
+
+    async def test_chord_counts_redelivered_tasks_once(self) -> None:
+        broker, _, total, _ = self._broker()
+        spec = {
+            "id": "chord",
+            "tasks": ["first", "second"],
+            "index": 0,
+            "callback": total.s().to_dict(),
+        }
+        await self.middleware.join_chord(spec)
+        await self.middleware.join_chord(spec)
+        assert await self.store.incr("unfazed_taskiq:chord:chord", 0) == 1
+
+    async def test_chord_is_not_joined_on_error(self) -> None:
+        broker, add, total, fail = self._broker()
+        task = await chord([add.s(1, 1), fail.s(1)], total.s()).kiq()
+        await asyncio.sleep(0.1)
+        assert not await task.is_ready()
+        assert all(call[0] == "add" for call in self.calls)
+
+    async def test_chord_needs_result_backend(self) -> None:
+        broker, add, total, _ = self._broker()
+        broker.with_result_backend(DummyResultBackend())
+        with pytest.raises(ValueError):
+            await chord([add.s(1, 1)], total.s()).kiq()
+        with pytest.raises(ValueError):
+            chord([], total.s())
+
+    async def test_chord_ids_come_from_the_broker(self) -> None:
+        broker, add, total, _ = self._broker()
+        ids = iter(f"id-{index}" for index in range(10))
+        broker.id_generator = lambda: next(ids)
+        task = await chord([add.s(1, 1), add.s(2, 2)], total.s()).kiq()
+        result = await task.wait_result(timeout=2)
+        assert result.return_value == 6
+        assert task.task_id == "id-0"
+        for task_id in ("id-1", "id-2"):
+            assert (await broker.result_backend.get_result(task_id)).return_value
+
+    def test_refuses_process_local_store(self) -> None:
+        broker, _, _, _ = self._broker()
+        broker.is_worker_process = True
+        with pytest.raises(ValueError, match="local to this process"):
+            self.middleware.startup()
+        self.middleware.worker_processes = 2
+        with pytest.raises(ValueError, match="2 worker processes"):
+            self.middleware.startup()
+
+        self.middleware.worker_processes = 1
+        self.middleware.startup()
+        self.middleware.worker_processes = 2
+        self.store.process_local = False
+        self.middleware.startup()
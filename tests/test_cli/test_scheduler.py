@@ -23,7 +23,7 @@ class TestSchedulerCMD:
         assert cmd.unfazed is unfazed
 
     def _run_exec(
-        self, alias_name: list[str] | None, storage: dict[str, Any]
+        self, alias_name: list[str] | None, storage: dict[str, Any], **options: Any
     ) -> MagicMock:
         cmd = SchedulerCMD()
         args = ["module", "pkg"] + (
@@ -33,6 +33,7 @@ class TestSchedulerCMD:
             scheduler="scheduler.path",
             modules=["pkg"],
             alias_name=[] if alias_name is None else alias_name,
+            **options,
         )
         run_spy = AsyncMock()
         agents = {alias: MagicMock(scheduler=sched) for alias, sched in storage.items()}
@@ -57,6 +58,26 @@ class TestSchedulerCMD:
         run_spy = self._run_exec(None, {"alpha": AsyncMock(), "beta": AsyncMock()})
         assert run_spy.await_count == 2
 
+    def test_exec_with_health(self) -> None:
+        health = MagicMock(checks={}, start=AsyncMock(), stop=AsyncMock())
+        with (
+            patch(
+                "unfazed_taskiq.cli.scheduler.cmd.Health", return_value=health
+            ) as health_cls,
+            patch("unfazed_taskiq.cli.scheduler.cmd.track_ticks") as track_ticks,
+        ):
+            run_spy = self._run_exec(
+                ["alpha"],
+                {"alpha": AsyncMock(), "beta": AsyncMock()},
+                health_port=9100,
+            )
+        assert run_spy.await_count == 1
+        assert health_cls.call_args.kwargs["port"] == 9100
+        assert list(health.checks) == ["broker:alpha"]
+        track_ticks.assert_called_once()
+        health.start.assert_awaited_once()
+        health.stop.assert_awaited_once()
+
 
 class TestSchedulerEventArgs:
     def test_defaults(self) -> None:
@@ -95,12 +116,19 @@ class TestSchedulerEventArgs:
                 "30",
                 "--alias-name",
                 "alpha",
+                "--health-file",
+                "/tmp/scheduler.json",
+                "--lag-threshold",
+                "0.2",
             ]
         )
         assert args.modules == ["module"]
         assert args.tasks_pattern == ["**/jobs.py"]
         assert args.alias_name == ["alpha"]
         assert args.update_interval == 30
+        assert args.health_port is None
+        assert args.health_file == "/tmp/scheduler.json"
+        assert args.lag_threshold == 0.2
 
     def test_replace(self) -> None:
         original = SchedulerEventArgs(scheduler="a", modules=["m"])
@@ -2,7 +2,9 @@ import asyncio
 from typing import Any, Optional
 from unittest.mock import AsyncMock, Mock, patch
 
+from unfazed_taskiq.autoscale import InMemoryDepthSampler
 from unfazed_taskiq.cli.worker.cmd import WorkerCMD
+from unfazed_taskiq.settings import Adaptive, Autoscale
 
 
 class TestWorkerCMD(object):
@@ -32,14 +34,18 @@ class TestWorkerCMD(object):
         args = ["test_broker", "test_module"]
 
         with (
-            patch("unfazed_taskiq.cli.worker.cmd.WorkerArgs") as mock_worker_args,
+            patch("unfazed_taskiq.cli.worker.cmd.WorkerEventArgs") as mock_worker_args,
             patch("unfazed_taskiq.cli.worker.cmd.asyncio.run") as mock_asyncio_run,
             patch("unfazed_taskiq.cli.worker.cmd.run_worker") as mock_run_worker,
+            patch("unfazed_taskiq.cli.worker.cmd.agents") as mock_agents,
         ):
             # Setup mocks
-            mock_worker_args_instance = Mock()
+            mock_worker_args_instance = Mock(
+                max_rss_per_child=None, max_tasks_per_child=None
+            )
             mock_worker_args.from_cli.return_value = mock_worker_args_instance
             mock_run_worker.return_value = 0
+            mock_agents.get_agent.return_value = None
 
             # Mock asyncio.run to properly handle coroutines
             def mock_asyncio_run_func(coro: Any) -> Any:
@@ -65,3 +71,111 @@ class TestWorkerCMD(object):
 
             # Verify return value
             assert result == 0
+
+    def test_exec_autoscale(self) -> None:
+        """Test exec runs an autoscaled pool when the alias has AUTOSCALE."""
+        cmd = WorkerCMD()
+        args = ["test_broker", "--alias-name", "alpha"]
+        autoscale = Autoscale.model_validate(
+            {
+                "SAMPLER": {"BACKEND": "unfazed_taskiq.autoscale.InMemoryDepthSampler"},
+                "MIN_WORKERS": 2,
+                "MAX_WORKERS": 8,
+                "INTERVAL": 1,
+            }
+        )
+        agent = Mock()
+        agent.config.autoscale = autoscale
+        agent.config.adaptive = None
+
+        with (
+            patch("unfazed_taskiq.cli.worker.cmd.asyncio.run"),
+            patch("unfazed_taskiq.cli.worker.cmd.run_worker") as mock_run_worker,
+            patch(
+                "unfazed_taskiq.cli.worker.cmd.run_autoscaled_worker", return_value=0
+            ) as mock_run_autoscaled,
+            patch("unfazed_taskiq.cli.worker.cmd.agents") as mock_agents,
+        ):
+            mock_agents.get_agent.return_value = agent
+            result = cmd.exec(args)
+
+        mock_agents.get_agent.assert_called_once_with("alpha")
+        mock_run_worker.assert_not_called()
+        wargs, sampler, autoscaler = mock_run_autoscaled.call_args.args
+        assert wargs.broker == "test_broker"
+        assert wargs.receiver == "unfazed_taskiq.receiver:UnfazedReceiver"
+        assert dict(wargs.receiver_arg)["workers"] == "8"
+        assert isinstance(sampler, InMemoryDepthSampler)
+        assert (autoscaler.min_workers, autoscaler.max_workers) == (2, 8)
+        assert mock_run_autoscaled.call_args.kwargs["interval"] == 1
+        assert result == 0
+
+    def test_exec_adaptive(self) -> None:
+        """Test exec runs AdaptiveReceiver when the alias has ADAPTIVE."""
+        cmd = WorkerCMD()
+        args = [
+            "test_broker",
+            "--receiver_arg",
+            "max_in_flight=8",
+            "--health-port",
+            "9100",
+        ]
+        agent = Mock()
+        agent.config.autoscale = None
+        agent.config.adaptive = Adaptive.model_validate(
+            {"MAX_IN_FLIGHT": 50, "MAX_PREFETCH": 20}
+        )
+
+        with (
+            patch("unfazed_taskiq.cli.worker.cmd.asyncio.run"),
+            patch(
+                "unfazed_taskiq.cli.worker.cmd.run_worker", return_value=0
+            ) as mock_run_worker,
+            patch("unfazed_taskiq.cli.worker.cmd.agents") as mock_agents,
+        ):
+            mock_agents.get_agent.return_value = agent
+            result = cmd.exec(args)
+
+        wargs = mock_run_worker.call_args.args[0]
+        assert wargs.receiver == "unfazed_taskiq.receiver:AdaptiveReceiver"
+        options = dict(wargs.receiver_arg)
+        assert options["max_in_flight"] == "8"
+        assert options["health_port"] == "9100"
+        assert options["lag_threshold"] == "0.5"
+        assert options["max_prefetch"] == "20"
+        assert options["workers"] == "2"
+        assert "max_memory" not in options
+        assert result == 0
+
+    def test_exec_recycling(self) -> None:
+        """Test exec recycles processes with the per child limits."""
+        cmd = WorkerCMD()
+        args = [
+            "test_broker",
+            "--max-tasks-per-child",
+            "1000",
+            "--max-rss-per-child",
+            "512",
+            "--wait-tasks-timeout",
+            "30",
+        ]
+
+        with (
+            patch("unfazed_taskiq.cli.worker.cmd.asyncio.run"),
+            patch("unfazed_taskiq.cli.worker.cmd.run_worker") as mock_run_worker,
+            patch(
+                "unfazed_taskiq.cli.worker.cmd.run_recycling_worker", return_value=0
+            ) as mock_run_recycling,
+            patch("unfazed_taskiq.cli.worker.cmd.agents") as mock_agents,
+        ):
+            mock_agents.get_agent.return_value = None
+            result = cmd.exec(args)
+
+        mock_run_worker.assert_not_called()
+        wargs = mock_run_recycling.call_args.args[0]
+        assert wargs.max_tasks_per_child == 1000
+        assert dict(wargs.receiver_arg)["max_rss"] == str(512 * 1024 * 1024)
+        # the draining process runs next to its replacement
+        assert dict(wargs.receiver_arg)["workers"] == "3"
+        assert mock_run_recycling.call_args.kwargs["drain_timeout"] == 40
+        assert result == 0
@@ -266,6 +266,21 @@ class TestTortoiseScheduleSource(object):
         assert db_data.total_run_count == origin_db_data.total_run_count + 1
         assert db_data.enabled == 0
 
+    async def test_tortoise_schedule_source_follows_reinitialized_connection(
+        self, test_scheduler_sample_data: list[dict]
+    ) -> None:
+        """Queries use the connection registered when Tortoise is initialized again."""
+        from unittest.mock import MagicMock, patch
+
+        source = TortoiseScheduleSource(schedule_alias="test_schedule3")
+        await source.startup()
+        current = source.alias
+        reinitialized = MagicMock()
+        with patch.object(Tortoise, "get_connection", return_value=reinitialized):
+            assert source.connection() is reinitialized
+        assert source.connection() is current
+        assert len(await source.get_schedules()) == 1
+
 
 class TestTortoiseScheduleSourceErrors(object):
     """Test error conditions in TortoiseScheduleSource."""
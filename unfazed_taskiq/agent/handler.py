@@ -1,10 +1,14 @@
 import os
-from typing import Optional
+from typing import Dict, Optional
 
 from taskiq import AsyncBroker, TaskiqScheduler
 from unfazed.utils import Storage, import_setting
 
 from unfazed_taskiq.agent.model import TaskiqAgent
+from unfazed_taskiq.drain import DrainReport, drain, in_flight
+from unfazed_taskiq.executors import ThreadPool
+from unfazed_taskiq.middleware import UnfazedTaskiqTracingMiddleware
+from unfazed_taskiq.router import Router
 from unfazed_taskiq.settings import UnfazedTaskiqSettings
 
 
@@ -12,6 +16,9 @@ class AgentHandler(Storage[TaskiqAgent]):
     def __init__(self) -> None:
         super().__init__()
         self.default_alias_name: str = "default"  # Default fallback
+        self.routers: Dict[str, Router] = {}
+        self.thread_pools: Dict[str, ThreadPool] = {}
+        self.drain_timeout: Optional[float] = 30
         self._ready = False
         self.check_ready()
 
@@ -22,6 +29,10 @@ class AgentHandler(Storage[TaskiqAgent]):
 
     def reset(self) -> None:
         self.clear()
+        self.routers = {}
+        for thread_pool in self.thread_pools.values():
+            thread_pool.shutdown()
+        self.thread_pools = {}
         self._ready = False
 
     def setup(self) -> None:
@@ -50,9 +61,47 @@ class AgentHandler(Storage[TaskiqAgent]):
         for alias_name, taskiq_config in taskiq_config_settings.taskiq_config.items():
             taskiq_agent: TaskiqAgent = TaskiqAgent.setup(alias_name, taskiq_config)
             self.register(alias_name, taskiq_agent)
+
+        for route_name, route in taskiq_config_settings.routes.items():
+            brokers = {}
+            for alias_name in [*route.aliases, *(rule.alias for rule in route.rules)]:
+                if alias_name not in self.storage:
+                    raise ValueError(
+                        f"Route {route_name} uses unknown alias {alias_name}"
+                    )
+                brokers[alias_name] = self.storage[alias_name].broker
+            self.routers[route_name] = Router(
+                route_name,
+                route.aliases,
+                brokers,
+                key=route.key,
+                rules=[(rule.labels, rule.alias) for rule in route.rules],
+                replicas=route.replicas,
+            )
+
+        for pool_name, pool in taskiq_config_settings.thread_pools.items():
+            self.thread_pools[pool_name] = ThreadPool(pool_name, pool.max_workers)
+
+        self.drain_timeout = taskiq_config_settings.drain_timeout
+
+        self.setup_tracer()
+
         if self.storage:
             self._ready = True
 
+    def setup_tracer(self) -> None:
+        """
+        Install the tracing middleware of the default alias, or of the first
+        alias having one, as the global tracer, which starts traces outside
+        of tasks.
+        """
+        aliases = sorted(self.storage, key=lambda name: name != self.default_alias_name)
+        for alias_name in aliases:
+            for middleware in self.storage[alias_name].broker.middlewares:
+                if isinstance(middleware, UnfazedTaskiqTracingMiddleware):
+                    middleware.install()
+                    return
+
     def check_ready(self) -> None:
         if not self._ready:
             self.setup()
@@ -63,6 +112,16 @@ class AgentHandler(Storage[TaskiqAgent]):
         _alias_name = self.default_alias_name if alias_name is None else alias_name
         return self.storage.get(_alias_name, None)
 
+    def get_router(self, route_name: str) -> Optional[Router]:
+        """Get the router of a route configured in ROUTES"""
+        self.check_ready()
+        return self.routers.get(route_name, None)
+
+    def get_thread_pool(self, pool_name: str) -> Optional[ThreadPool]:
+        """Get a thread pool configured in THREAD_POOLS"""
+        self.check_ready()
+        return self.thread_pools.get(pool_name, None)
+
     @property
     def scheduler(self) -> TaskiqScheduler:
         """Get the default scheduler"""
@@ -77,6 +136,16 @@ class AgentHandler(Storage[TaskiqAgent]):
         for agent_model in self.storage.values():
             await agent_model.startup()
 
+    async def drain(self, timeout: Optional[float] = None) -> DrainReport:
+        """
+        Wait for the tasks executing in this process, up to DRAIN_TIMEOUT
+        seconds by default, then cancel the remaining ones. Their messages
+        are requeued, except those of in-memory brokers, which are dropped.
+        """
+        return await drain(
+            in_flight, self.drain_timeout if timeout is None else timeout
+        )
+
     async def shutdown(self) -> None:
         for agent_model in self.storage.values():
             await agent_model.shutdown()
@@ -1,10 +1,30 @@
+import inspect
 from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
-from taskiq import AsyncBroker, ScheduleSource, TaskiqEvents, TaskiqScheduler
+from taskiq import (
+    AsyncBroker,
+    InMemoryBroker,
+    ScheduleSource,
+    TaskiqEvents,
+    TaskiqScheduler,
+)
 from unfazed.utils import import_string
 
-from unfazed_taskiq.settings import TaskiqConfig
+from unfazed_taskiq.compression import CompressingFormatter
+from unfazed_taskiq.decor import UnfazedTaskiqDecoratedTask
+from unfazed_taskiq.executors import ProcessPool
+from unfazed_taskiq.mapping import register_map_task
+from unfazed_taskiq.middleware import UnfazedTaskiqMiddleware
+from unfazed_taskiq.receiver import UnfazedReceiver
+from unfazed_taskiq.results import CachedResultBackend, NotifyingResultBackend
+from unfazed_taskiq.settings import Middleware, TaskiqConfig
+from unfazed_taskiq.store import AsyncSharedStore
+
+
+def use_process_pool(broker: AsyncBroker, process_pool: ProcessPool) -> None:
+    broker.add_event_handler(TaskiqEvents.WORKER_STARTUP, process_pool.worker_startup)
+    broker.add_event_handler(TaskiqEvents.WORKER_SHUTDOWN, process_pool.worker_shutdown)
 
 
 class TaskiqAgent(BaseModel):
@@ -12,6 +32,8 @@ class TaskiqAgent(BaseModel):
     alias_name: str
     broker: AsyncBroker
     scheduler: Optional[TaskiqScheduler]
+    store: AsyncSharedStore
+    process_pool: Optional[ProcessPool]
     config: TaskiqConfig
 
     @classmethod
@@ -20,13 +42,50 @@ class TaskiqAgent(BaseModel):
         broker_cls = import_string(config.broker.backend)
         broker_options = config.broker.options or {}
         broker: AsyncBroker = broker_cls(**broker_options)
+        broker.decorator_class = UnfazedTaskiqDecoratedTask
+        register_map_task(broker)
+
+        # setup serializer and formatter
+        if config.broker.serializer:
+            serializer_cls = import_string(config.broker.serializer.backend)
+            serializer_options = config.broker.serializer.options or {}
+            broker.with_serializer(serializer_cls(**serializer_options))
+
+        if config.broker.formatter:
+            formatter_cls = import_string(config.broker.formatter.backend)
+            formatter_options = dict(config.broker.formatter.options or {})
+            # only some formatters, such as ProxyFormatter, wrap the broker
+            if "broker" in inspect.signature(formatter_cls).parameters:
+                formatter_options["broker"] = broker
+            broker.with_formatter(formatter_cls(**formatter_options))
+
+        # setup compression
+        if config.broker.compression:
+            broker.formatter = CompressingFormatter(
+                broker.formatter,
+                threshold=config.broker.compression.threshold,
+                codec=config.broker.compression.codec,
+                level=config.broker.compression.level,
+            )
+
+        # setup shared store
+        store_cls = import_string(config.store.backend)
+        store_options = config.store.options or {}
+        store: AsyncSharedStore = store_cls(**store_options)
 
         # setup middlewares
-        for middleware_path in config.broker.middlewares:
-            if middleware_path:  # Skip empty middleware paths
-                middleware_cls = import_string(middleware_path)
-                middleware = middleware_cls()
-                broker.add_middlewares(middleware)
+        for middleware_conf in config.broker.middlewares:
+            if isinstance(middleware_conf, str):
+                if not middleware_conf:  # Skip empty middleware paths
+                    continue
+                middleware_conf = Middleware(BACKEND=middleware_conf)
+            middleware_cls = import_string(middleware_conf.backend)
+            middleware = middleware_cls(**(middleware_conf.options or {}))
+            if isinstance(middleware, UnfazedTaskiqMiddleware):
+                middleware.with_store(store, alias_name)
+            elif hasattr(middleware, "with_store"):
+                middleware.with_store(store)
+            broker.add_middlewares(middleware)
 
         # setup handlers
         for handler in config.broker.handlers:
@@ -40,7 +99,47 @@ class TaskiqAgent(BaseModel):
         if config.result:
             result_cls = import_string(config.result.backend)
             result_options = config.result.options or {}
-            broker.with_result_backend(result_cls(**result_options))
+            result_backend = result_cls(**result_options)
+            if config.result.cache:
+                result_backend = CachedResultBackend(
+                    result_backend,
+                    maxsize=config.result.cache.maxsize,
+                    ttl=config.result.cache.ttl,
+                )
+            if config.result.notifier:
+                notifier_cls = import_string(config.result.notifier.backend)
+                notifier_options = config.result.notifier.options or {}
+                result_backend = NotifyingResultBackend(
+                    result_backend,
+                    notifier_cls(**notifier_options),
+                    poll_interval=config.result.notifier.poll_interval,
+                )
+            broker.with_result_backend(result_backend)
+
+        # track the tasks an in memory broker runs, so that shutdown drains them,
+        # requeueing into a broker that is closing would only lose them
+        if isinstance(broker, InMemoryBroker):
+            broker.receiver = UnfazedReceiver(
+                broker,
+                executor=broker.executor,
+                validate_params=broker.receiver.validate_params,
+                # kick runs the callbacks directly, the semaphore is unused
+                max_async_tasks=1,
+                propagate_exceptions=broker.receiver.propagate_exceptions,
+                requeue=False,
+            )
+
+        # setup process pool, processes start on first use unless prewarmed
+        process_pool = None
+        if config.process_pool:
+            process_pool = ProcessPool(
+                max_workers=config.process_pool.max_workers,
+                shared_memory_threshold=config.process_pool.shared_memory_threshold,
+                initializer=config.process_pool.initializer,
+                start_method=config.process_pool.start_method,
+                prewarm=config.process_pool.prewarm,
+            )
+            use_process_pool(broker, process_pool)
 
         # setup scheduler
         scheduler = None
@@ -59,10 +158,23 @@ class TaskiqAgent(BaseModel):
             scheduler = scheduler_cls(broker=broker, sources=sources)
 
         return cls(
-            alias_name=alias_name, broker=broker, scheduler=scheduler, config=config
+            alias_name=alias_name,
+            broker=broker,
+            scheduler=scheduler,
+            store=store,
+            process_pool=process_pool,
+            config=config,
         )
 
+    def get_process_pool(self) -> ProcessPool:
+        """Process pool of the alias, a default one for the first process task."""
+        if self.process_pool is None:
+            self.process_pool = ProcessPool()
+            use_process_pool(self.broker, self.process_pool)
+        return self.process_pool
+
     async def startup(self) -> None:
+        await self.store.startup()
         if self.scheduler and isinstance(self.scheduler, TaskiqScheduler):
             await self.scheduler.startup()
             if self.scheduler.sources:
@@ -77,3 +189,6 @@ class TaskiqAgent(BaseModel):
                 for source in self.scheduler.sources:
                     await source.shutdown()
         await self.broker.shutdown()
+        await self.store.shutdown()
+        if self.process_pool is not None:
+            await self.process_pool.shutdown()
@@ -0,0 +1,13 @@
+from unfazed_taskiq.autoscale.amqp import AioPikaDepthSampler
+from unfazed_taskiq.autoscale.base import DepthSampler, QueueDepth
+from unfazed_taskiq.autoscale.manager import Autoscaler, AutoscalingProcessManager
+from unfazed_taskiq.autoscale.memory import InMemoryDepthSampler
+
+__all__ = [
+    "AioPikaDepthSampler",
+    "Autoscaler",
+    "AutoscalingProcessManager",
+    "DepthSampler",
+    "InMemoryDepthSampler",
+    "QueueDepth",
+]
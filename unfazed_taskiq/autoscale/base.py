@@ -0,0 +1,36 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class QueueDepth:
+    """
+    Backlog of an alias queue.
+
+    :param messages: messages waiting to be fetched.
+    :param lag: seconds the oldest waiting message has waited, None when the
+        broker does not tell.
+    """
+
+    messages: int
+    lag: Optional[float] = None
+
+
+class DepthSampler(ABC):
+    """
+    Read the backlog of the queue consumed by the workers of an alias.
+
+    Samplers run in the worker main process, which has no broker of its own,
+    so they open their own connection.
+    """
+
+    async def startup(self) -> None:  # noqa: B027
+        """Do something before the first sample."""
+
+    async def shutdown(self) -> None:  # noqa: B027
+        """Do something on shutdown."""
+
+    @abstractmethod
+    async def sample(self) -> QueueDepth:
+        """Return the current backlog of the queue."""
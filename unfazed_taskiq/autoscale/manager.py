@@ -0,0 +1,198 @@
+import asyncio
+import math
+import time
+from typing import Callable, Optional
+
+from taskiq.cli.worker.args import WorkerArgs
+from taskiq.cli.worker.run import start_listen
+
+from unfazed_taskiq.autoscale.base import DepthSampler, QueueDepth
+from unfazed_taskiq.logger import log
+from unfazed_taskiq.recycling import RecyclingProcessManager, configure_logging
+
+
+class Autoscaler:
+    """
+    Decide the number of worker processes from queue depth samples.
+
+    The pool grows as soon as there are more than `target_depth` waiting
+    messages per process, or the oldest message waited more than `max_lag`
+    seconds, straight to the size the backlog needs. It shrinks one process
+    at a time, only once `down_samples` samples in a row show that one
+    process less would still be under `scale_down_ratio` of its target.
+    The gap between both thresholds and the `cooldown` after each change
+    keep the pool from flapping around a steady load.
+
+    :param min_workers: minimum number of processes.
+    :param max_workers: maximum number of processes.
+    :param target_depth: waiting messages one process is expected to absorb.
+    :param scale_down_ratio: share of target_depth under which a process
+        is removed.
+    :param down_samples: consecutive low samples needed to remove a process.
+    :param max_lag: seconds of lag that trigger growth, None to ignore lag.
+    :param cooldown: seconds without any change after a change.
+    """
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int = 4,
+        target_depth: int = 100,
+        scale_down_ratio: float = 0.5,
+        down_samples: int = 3,
+        max_lag: Optional[float] = None,
+        cooldown: float = 30,
+    ) -> None:
+        if min_workers < 1 or max_workers < min_workers:
+            raise ValueError("Autoscaling needs 1 <= min_workers <= max_workers")
+        if target_depth <= 0:
+            raise ValueError("target_depth must be greater than 0")
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.target_depth = target_depth
+        self.scale_down_ratio = scale_down_ratio
+        self.down_samples = down_samples
+        self.max_lag = max_lag
+        self.cooldown = cooldown
+        self.low_samples = 0
+        self.last_change: Optional[float] = None
+
+    def clamp(self, workers: int) -> int:
+        return max(self.min_workers, min(workers, self.max_workers))
+
+    def decide(
+        self, current: int, depth: QueueDepth, now: Optional[float] = None
+    ) -> int:
+        """Return the number of processes wanted for this sample."""
+        now = time.monotonic() if now is None else now
+        if current != self.clamp(current):
+            return self.change(current, self.clamp(current), now)
+        if self.last_change is not None and now - self.last_change < self.cooldown:
+            self.low_samples = 0
+            return current
+
+        lagging = (
+            self.max_lag is not None
+            and depth.lag is not None
+            and depth.lag > self.max_lag
+        )
+        if lagging or depth.messages > current * self.target_depth:
+            self.low_samples = 0
+            wanted = max(current + 1, math.ceil(depth.messages / self.target_depth))
+            return self.change(current, self.clamp(wanted), now)
+
+        low = (current - 1) * self.target_depth * self.scale_down_ratio
+        if current > self.min_workers and depth.messages <= low:
+            self.low_samples += 1
+            if self.low_samples >= self.down_samples:
+                self.low_samples = 0
+                return self.change(current, current - 1, now)
+            return current
+
+        self.low_samples = 0
+        return current
+
+    def change(self, current: int, workers: int, now: float) -> int:
+        if workers != current:
+            self.last_change = now
+        return workers
+
+
+class AutoscalingProcessManager(RecyclingProcessManager):
+    """
+    Process manager resizing the worker pool with the queue backlog.
+
+    Every `interval` seconds the depth sampler is read and the autoscaler
+    picks the pool size. New processes start like the fixed ones. Retired
+    processes get SIGINT: they stop fetching, finish their running tasks
+    within the worker `--wait-tasks-timeout` and exit. Those still alive
+    after `drain_timeout` seconds are killed. Processes are recycled like in
+    `RecyclingProcessManager`.
+
+    :param args: worker CLI arguments, `workers` is the initial size.
+    :param worker_function: function run by each process.
+    :param sampler: depth sampler of the consumed queue.
+    :param autoscaler: sizing policy.
+    :param interval: seconds between two samples.
+    :param drain_timeout: seconds a retired process has to exit.
+    """
+
+    def __init__(
+        self,
+        args: WorkerArgs,
+        worker_function: Callable[[WorkerArgs], None],
+        sampler: DepthSampler,
+        autoscaler: Autoscaler,
+        interval: float = 5,
+        drain_timeout: Optional[float] = 60,
+    ) -> None:
+        super().__init__(
+            args=args, worker_function=worker_function, drain_timeout=drain_timeout
+        )
+        self.sampler = sampler
+        self.autoscaler = autoscaler
+        self.interval = interval
+        self.next_sample = 0.0
+        self.loop = asyncio.new_event_loop()
+
+    def scale(self, workers: int) -> None:
+        while len(self.workers) < workers:
+            self.spawn()
+        while len(self.workers) > workers:
+            self.retire()
+
+    def autoscale(self) -> None:
+        now = time.monotonic()
+        if now < self.next_sample:
+            return
+        self.next_sample = now + self.interval
+        try:
+            depth = self.loop.run_until_complete(self.sampler.sample())
+        except Exception:
+            log.exception("Failed to sample the queue depth")
+            return
+        workers = self.autoscaler.decide(len(self.workers), depth, now)
+        if workers != len(self.workers):
+            log.info(
+                f"Scaling workers from {len(self.workers)} to {workers}, "
+                f"{depth.messages} messages waiting"
+            )
+            self.scale(workers)
+
+    def tick(self) -> None:
+        self.autoscale()
+
+    def prepare_workers(self) -> None:
+        self.scale(self.autoscaler.clamp(self.args.workers))
+
+    def start(self) -> Optional[int]:
+        self.loop.run_until_complete(self.sampler.startup())
+        try:
+            return self.run()
+        finally:
+            self.loop.run_until_complete(self.sampler.shutdown())
+            self.loop.close()
+
+
+def run_autoscaled_worker(
+    args: WorkerArgs,
+    sampler: DepthSampler,
+    autoscaler: Autoscaler,
+    interval: float = 5,
+    drain_timeout: Optional[float] = 60,
+) -> Optional[int]:
+    """`taskiq.cli.worker.run.run_worker` with an autoscaled process pool."""
+    configure_logging(args)
+    log.info(
+        f"Starting between {autoscaler.min_workers} and "
+        f"{autoscaler.max_workers} worker processes."
+    )
+    manager = AutoscalingProcessManager(
+        args,
+        start_listen,
+        sampler,
+        autoscaler,
+        interval=interval,
+        drain_timeout=drain_timeout,
+    )
+    return manager.start()
@@ -0,0 +1,20 @@
+from typing import Optional
+
+from unfazed_taskiq.autoscale.base import DepthSampler, QueueDepth
+
+
+class InMemoryDepthSampler(DepthSampler):
+    """
+    Sampler returning the depth it was given.
+
+    Intended for tests only.
+    """
+
+    def __init__(self, messages: int = 0, lag: Optional[float] = None) -> None:
+        self.depth = QueueDepth(messages, lag)
+
+    def set(self, messages: int, lag: Optional[float] = None) -> None:
+        self.depth = QueueDepth(messages, lag)
+
+    async def sample(self) -> QueueDepth:
+        return self.depth
@@ -0,0 +1,5 @@
+from unfazed_taskiq.blobstore.base import Blob, BlobStore
+from unfazed_taskiq.blobstore.filesystem import FileSystemBlobStore
+from unfazed_taskiq.blobstore.memory import InMemoryBlobStore
+
+__all__ = ["Blob", "BlobStore", "FileSystemBlobStore", "InMemoryBlobStore"]
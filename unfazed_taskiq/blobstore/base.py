@@ -0,0 +1,57 @@
+from abc import ABC, abstractmethod
+from typing import Union
+
+Blob = Union[bytes, memoryview]
+
+
+class BlobStore(ABC):
+    """
+    Object store for payloads too large to travel through the broker.
+
+    Keys are `/` separated strings, like object store keys. Implementations
+    must be reachable from every sender and worker of an alias.
+    """
+
+    async def startup(self) -> None:  # noqa: B027
+        """Do something when starting the middleware."""
+
+    async def shutdown(self) -> None:  # noqa: B027
+        """Do something on shutdown."""
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> None:
+        """
+        Store data under key, replacing any previous blob.
+
+        :param key: blob key.
+        :param data: blob content.
+        """
+
+    @abstractmethod
+    async def get(self, key: str) -> Blob:
+        """
+        Load the blob stored under key.
+
+        :param key: blob key.
+        :raises KeyError: if there is no such blob.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """
+        Delete the blob stored under key if it exists.
+
+        :param key: blob key.
+        """
+
+    async def cleanup(self, max_age: float) -> int:
+        """
+        Delete the blobs stored more than max_age seconds ago.
+
+        Stores with their own expiry, like object store lifecycle rules,
+        may leave it unimplemented.
+
+        :param max_age: age in seconds.
+        :return: number of blobs deleted.
+        """
+        raise NotImplementedError
@@ -0,0 +1,97 @@
+import asyncio
+import mmap
+import os
+import tempfile
+import time
+
+from unfazed_taskiq.blobstore.base import Blob, BlobStore
+
+
+class FileSystemBlobStore(BlobStore):
+    """
+    Store blobs as files under a directory, for hosts sharing a filesystem.
+
+    Files are written to a temporary name and renamed, so a reader never
+    sees a partial blob. With `use_mmap` blobs are returned as a memoryview
+    of a read-only memory map: pages are only read when they are touched
+    and nothing is copied up front. `cleanup` goes by modification time.
+
+    :param directory: root directory of the blobs, created if missing.
+    :param use_mmap: map blobs instead of reading them.
+    """
+
+    def __init__(self, directory: str = "blobs", use_mmap: bool = False) -> None:
+        self.directory = directory
+        self.use_mmap = use_mmap
+
+    def path(self, key: str) -> str:
+        parts = [part for part in key.split("/") if part not in ("", ".", "..")]
+        return os.path.join(self.directory, *parts)
+
+    def _put(self, key: str, data: bytes) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _get(self, key: str) -> Blob:
+        try:
+            with open(self.path(key), "rb") as f:
+                if not self.use_mmap:
+                    return f.read()
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            raise KeyError(key) from None
+
+    def _delete(self, key: str) -> None:
+        try:
+            os.unlink(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def _cleanup(self, max_age: float) -> int:
+        oldest = time.time() - max_age
+        deleted = 0
+        for root, _, files in os.walk(self.directory, topdown=False):
+            # unlinking the blobs touches the directory, check its age first,
+            # a fresh directory may be about to get a blob
+            try:
+                stale = root != self.directory and os.stat(root).st_mtime < oldest
+            except FileNotFoundError:
+                continue
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime < oldest:
+                        os.unlink(path)
+                        deleted += 1
+                except FileNotFoundError:
+                    pass
+            if stale:
+                try:
+                    os.rmdir(root)
+                except OSError:  # not empty
+                    pass
+        return deleted
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._put, key, data)
+
+    async def get(self, key: str) -> Blob:
+        if self.use_mmap:
+            return self._get(key)
+        return await asyncio.to_thread(self._get, key)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._delete, key)
+
+    async def cleanup(self, max_age: float) -> int:
+        return await asyncio.to_thread(self._cleanup, max_age)
@@ -0,0 +1,34 @@
+import time
+from typing import Dict
+
+from unfazed_taskiq.blobstore.base import Blob, BlobStore
+
+
+class InMemoryBlobStore(BlobStore):
+    """
+    Process-local blob store.
+
+    Intended for tests and `InMemoryBroker` only.
+    """
+
+    def __init__(self) -> None:
+        self.blobs: Dict[str, bytes] = {}
+        self.stored_at: Dict[str, float] = {}
+
+    async def put(self, key: str, data: bytes) -> None:
+        self.blobs[key] = data
+        self.stored_at[key] = time.monotonic()
+
+    async def get(self, key: str) -> Blob:
+        return self.blobs[key]
+
+    async def delete(self, key: str) -> None:
+        self.blobs.pop(key, None)
+        self.stored_at.pop(key, None)
+
+    async def cleanup(self, max_age: float) -> int:
+        oldest = time.monotonic() - max_age
+        keys = [key for key, stored_at in self.stored_at.items() if stored_at < oldest]
+        for key in keys:
+            await self.delete(key)
+        return len(keys)
@@ -0,0 +1,333 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+import orjson as json
+from taskiq import AsyncResultBackend, TaskiqResult
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.executors import dependency_names, run_sync
+from unfazed_taskiq.logger import log
+
+T = TypeVar("T")
+
+MEMO_TASK_ID_PREFIX = "unfazed_taskiq:memo"
+MEMO_INVALIDATED_PREFIX = "unfazed_taskiq:memo_invalidated"
+MEMO_STORED_LABEL = "memo_stored_at"
+MEMO_EXPIRES_LABEL = "memo_expires_at"
+
+
+class LRUCache(Generic[T]):
+    """
+    Bounded in-process LRU cache with optional per-entry ttl.
+
+    Not thread safe, it is meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than 0")
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Tuple[Optional[float], T]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[T]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: T, ttl: Optional[float] = None) -> None:
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        keys = [key for key in self._data if key.startswith(prefix)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def make_args_key(args: Any, kwargs: Any) -> str:
+    """Stable hash of json-normalized call arguments."""
+    payload = json.dumps(
+        [args, kwargs], option=json.OPT_SORT_KEYS | json.OPT_NON_STR_KEYS, default=str
+    )
+    return hashlib.sha1(payload).hexdigest()
+
+
+class TaskMemo:
+    """
+    Two-tier memoization for a task function.
+
+    Results are looked up in an in-process LRU first, then in the result
+    backend of the task's broker under a synthetic task id.
+
+    Invalidations are recorded in the result backend too, every process
+    reads them again at most every `refresh_interval` seconds and ignores
+    the entries stored before them, in its LRU as in the backend.
+    Without a result backend only the calling process forgets its entries.
+
+    Arguments injected with `TaskiqDepends` are not part of the key.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        ttl: Optional[float] = None,
+        key: Optional[Callable[..., str]] = None,
+        result_backend: Optional[Callable[[], AsyncResultBackend]] = None,
+        maxsize: int = 1024,
+        refresh_interval: float = 1.0,
+    ) -> None:
+        self.func = func
+        self.ttl = ttl
+        self.key = key
+        self.result_backend = result_backend
+        self.refresh_interval = refresh_interval
+        self.namespace = f"{func.__module__}.{func.__name__}"
+        # values with the time they were stored
+        self.local: LRUCache[Tuple[Any, float]] = LRUCache(maxsize)
+        self.signature = inspect.signature(func)
+        self.dependencies = dependency_names(func)
+        self.hits = 0
+        self.misses = 0
+        # entries stored before these timestamps are stale, by key prefix
+        self._invalidated: Dict[str, float] = {}
+        self._refreshed_at: Optional[float] = None
+
+    def make_key(self, *args: Any, **kwargs: Any) -> str:
+        kwargs = {
+            name: value
+            for name, value in kwargs.items()
+            if name not in self.dependencies
+        }
+        if self.key is not None:
+            return str(self.key(*args, **kwargs))
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {
+            name: value
+            for name, value in bound.arguments.items()
+            if name not in self.dependencies
+        }
+        return make_args_key([], arguments)
+
+    def backend_task_id(self, key: str) -> str:
+        return f"{MEMO_TASK_ID_PREFIX}:{self.namespace}:{key}"
+
+    @property
+    def invalidations_task_id(self) -> str:
+        return f"{MEMO_INVALIDATED_PREFIX}:{self.namespace}"
+
+    def _backend(self) -> Optional[AsyncResultBackend]:
+        if self.result_backend is None:
+            return None
+        backend = self.result_backend()
+        # dummy backend reports every id as ready with a None value
+        if isinstance(backend, DummyResultBackend):
+            return None
+        return backend
+
+    async def lookup(self, key: str) -> Tuple[bool, Any]:
+        await self.refresh()
+        entry = self.local.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            if not self._is_invalidated(key, stored_at):
+                self.hits += 1
+                return True, value
+            self.local.delete(key)
+
+        backend = self._backend()
+        if backend is not None:
+            task_id = self.backend_task_id(key)
+            try:
+                if await backend.is_result_ready(task_id):
+                    result = await backend.get_result(task_id)
+                    if self._is_fresh(key, result):
+                        self.hits += 1
+                        stored_at = float(result.labels[MEMO_STORED_LABEL])
+                        self.local.set(
+                            key,
+                            (result.return_value, stored_at),
+                            self._remaining(result),
+                        )
+                        return True, result.return_value
+            except Exception as e:
+                log.debug(f"Memo lookup for {task_id} failed: {e}")
+
+        self.misses += 1
+        return False, None
+
+    async def store(self, key: str, value: Any) -> None:
+        now = time.time()
+        self.local.set(key, (value, now), self.ttl)
+
+        backend = self._backend()
+        if backend is None:
+            return
+        labels = {MEMO_STORED_LABEL: now}
+        if self.ttl is not None:
+            labels[MEMO_EXPIRES_LABEL] = now + self.ttl
+        result: TaskiqResult[Any] = TaskiqResult(
+            is_err=False, return_value=value, execution_time=0, labels=labels
+        )
+        try:
+            await backend.set_result(self.backend_task_id(key), result)
+        except Exception as e:
+            log.warning(f"Failed to store memoized result of {self.namespace}: {e}")
+
+    async def invalidate(self, prefix: str = "") -> int:
+        """
+        Drop every cached entry whose key starts with prefix.
+
+        Backend entries can not be enumerated, so the invalidation is
+        recorded in the backend, and entries stored before it are ignored
+        by every process once it refreshed its invalidations.
+
+        :return: number of entries dropped from the LRU of this process.
+        """
+        now = time.time()
+        self._invalidated[prefix] = max(self._invalidated.get(prefix, 0.0), now)
+        dropped = self.local.invalidate_prefix(prefix)
+        backend = self._backend()
+        if backend is None:
+            return dropped
+        # invalidations of other processes may overwrite the record meanwhile,
+        # write it until it holds this one
+        for _ in range(3):
+            invalidated = await self._load_invalidations(backend)
+            if invalidated.get(prefix, 0.0) >= now:
+                break
+            invalidated[prefix] = now
+            result: TaskiqResult[Any] = TaskiqResult(
+                is_err=False,
+                return_value=self._prune(invalidated),
+                execution_time=0,
+            )
+            await backend.set_result(self.invalidations_task_id, result)
+        else:
+            log.warning(f"Failed to record the invalidation of {self.namespace}")
+        return dropped
+
+    async def refresh(self, force: bool = False) -> None:
+        """Read the invalidations of other processes, every refresh_interval."""
+        backend = self._backend()
+        if backend is None:
+            return
+        now = time.monotonic()
+        if (
+            not force
+            and self._refreshed_at is not None
+            and now - self._refreshed_at < self.refresh_interval
+        ):
+            return
+        self._refreshed_at = now
+        try:
+            invalidated = await self._load_invalidations(backend)
+        except Exception as e:
+            log.debug(f"Failed to read the invalidations of {self.namespace}: {e}")
+            return
+        for prefix, invalidated_at in invalidated.items():
+            if invalidated_at > self._invalidated.get(prefix, 0.0):
+                self._invalidated[prefix] = invalidated_at
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.local)}
+
+    async def _load_invalidations(
+        self, backend: AsyncResultBackend
+    ) -> Dict[str, float]:
+        task_id = self.invalidations_task_id
+        if not await backend.is_result_ready(task_id):
+            return {}
+        result = await backend.get_result(task_id)
+        return {
+            prefix: float(invalidated_at)
+            for prefix, invalidated_at in (result.return_value or {}).items()
+        }
+
+    def _prune(self, invalidated: Dict[str, float]) -> Dict[str, float]:
+        """Drop invalidations implied by a later one of a shorter prefix."""
+        oldest = None if self.ttl is None else time.time() - self.ttl
+        return {
+            prefix: invalidated_at
+            for prefix, invalidated_at in invalidated.items()
+            # entries stored before oldest are expired anyway
+            if (oldest is None or invalidated_at >= oldest)
+            and not any(
+                other != prefix and prefix.startswith(other) and at >= invalidated_at
+                for other, at in invalidated.items()
+            )
+        }
+
+    def _is_invalidated(self, key: str, stored_at: float) -> bool:
+        return any(
+            key.startswith(prefix) and stored_at <= invalidated_at
+            for prefix, invalidated_at in self._invalidated.items()
+        )
+
+    def _is_fresh(self, key: str, result: TaskiqResult[Any]) -> bool:
+        if result.is_err:
+            return False
+        expires_at = result.labels.get(MEMO_EXPIRES_LABEL)
+        if expires_at is not None and float(expires_at) <= time.time():
+            return False
+        stored_at = float(result.labels.get(MEMO_STORED_LABEL, 0))
+        return not self._is_invalidated(key, stored_at)
+
+    def _remaining(self, result: TaskiqResult[Any]) -> Optional[float]:
+        expires_at = result.labels.get(MEMO_EXPIRES_LABEL)
+        if expires_at is None:
+            return None
+        return max(float(expires_at) - time.time(), 0)
+
+
+def memoize(func: Callable, memo: TaskMemo) -> Callable:
+    """
+    Wrap func so that calls are answered from memo when possible.
+
+    The wrapper is always async, sync functions run in the executor of the
+    receiver, like taskiq runs them.
+    """
+    is_coroutine = asyncio.iscoroutinefunction(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        key = memo.make_key(*args, **kwargs)
+        hit, value = await memo.lookup(key)
+        if hit:
+            return value
+        if is_coroutine:
+            value = await func(*args, **kwargs)
+        else:
+            value = await run_sync(func, *args, **kwargs)
+        await memo.store(key, value)
+        return value
+
+    wrapper.memo = memo  # type: ignore[attr-defined]
+    return wrapper
@@ -20,6 +20,9 @@ class SchedulerEventArgs(SchedulerArgs):
     skip_first_run: bool = False
     update_interval: Optional[int] = None
     alias_name: Sequence[str] = ()
+    health_port: Optional[int] = None
+    health_file: Optional[str] = None
+    lag_threshold: float = 0.5
 
     @classmethod
     def from_cli(cls, args: Optional[Sequence[str]] = None) -> "SchedulerEventArgs":
@@ -99,6 +102,23 @@ class SchedulerEventArgs(SchedulerArgs):
             action="append",
             help="should run the scheduler with the given alias",
         )
+        parser.add_argument(
+            "--health-port",
+            type=int,
+            default=None,
+            help="serve the health of the scheduler on 127.0.0.1 on this port",
+        )
+        parser.add_argument(
+            "--health-file",
+            default=None,
+            help="write the health of the scheduler to this file",
+        )
+        parser.add_argument(
+            "--lag-threshold",
+            type=float,
+            default=0.5,
+            help="log the stack blocking the event loop for longer than this",
+        )
 
         namespace = parser.parse_args(args)
         # If there are any patterns specified, remove default.
@@ -1,4 +1,5 @@
 import asyncio
+import functools
 from dataclasses import replace
 from typing import Sequence
 
@@ -8,6 +9,7 @@ from unfazed.core import Unfazed
 
 from unfazed_taskiq.agent.handler import agents
 from unfazed_taskiq.cli.scheduler.args import SchedulerEventArgs
+from unfazed_taskiq.health import Health, LoopMonitor, broker_connected, track_ticks
 
 
 class SchedulerCMD(TaskiqCMD):
@@ -28,6 +30,9 @@ class SchedulerCMD(TaskiqCMD):
         It periodically loads schedule for tasks
         and executes them.
 
+        --health-port and --health-file expose the event loop lag,
+        the broker connections and the last schedule load.
+
         :param args: CLI arguments.
         """
 
@@ -49,14 +54,33 @@ class SchedulerCMD(TaskiqCMD):
             if len(parsed.alias_name) == 0:
                 parsed.alias_name = list(schedulers.keys())
 
+            health = None
+            if parsed.health_port is not None or parsed.health_file is not None:
+                health = Health(
+                    LoopMonitor(threshold=parsed.lag_threshold),
+                    port=parsed.health_port,
+                    path=parsed.health_file,
+                )
+
             # init all schedulers
             for alias, scheduler_obj in schedulers.items():
                 if alias in parsed.alias_name:
+                    if health is not None:
+                        health.checks[f"broker:{alias}"] = functools.partial(
+                            broker_connected, scheduler_obj.broker
+                        )
+                        track_ticks(scheduler_obj, health, alias)
                     event_parsed = replace(parsed, scheduler=scheduler_obj)
                     tasks.append(asyncio.create_task(run_scheduler(event_parsed)))
 
             # run all schedulers
             if tasks:
-                await asyncio.gather(*tasks)
+                if health is not None:
+                    await health.start()
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    if health is not None:
+                        await health.stop()
 
         asyncio.run(_run_all_scheduler())
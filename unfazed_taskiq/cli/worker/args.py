@@ -0,0 +1,73 @@
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass
+from typing import Optional, Sequence
+
+from taskiq.cli.worker.args import WorkerArgs
+
+
+@dataclass
+class WorkerEventArgs(WorkerArgs):
+    """Arguments for worker."""
+
+    alias_name: Optional[str] = None
+    health_port: Optional[int] = None
+    health_file: Optional[str] = None
+    lag_threshold: float = 0.5
+    max_rss_per_child: Optional[int] = None
+
+    @classmethod
+    def from_cli(cls, args: Optional[Sequence[str]] = None) -> "WorkerEventArgs":
+        """
+        Build worker args from CLI arguments.
+
+        Options of this plugin are read first, the remaining arguments are
+        parsed by taskiq.
+
+        :param args: current CLI arguments, defaults to None
+        :return: instance of worker args.
+        """
+        parser = ArgumentParser(add_help=False)
+        parser.add_argument(
+            "--alias-name",
+            "-an",
+            default=None,
+            help=(
+                "alias whose settings apply to the workers, "
+                "defaults to DEFAULT_TASKIQ_NAME"
+            ),
+        )
+        parser.add_argument(
+            "--health-port",
+            type=int,
+            default=None,
+            help=(
+                "serve the health and task metrics of each worker process "
+                "on 127.0.0.1, on this port plus the process index"
+            ),
+        )
+        parser.add_argument(
+            "--health-file",
+            default=None,
+            help=(
+                "write the health of each worker process to this file, "
+                "{worker} is replaced by the process index"
+            ),
+        )
+        parser.add_argument(
+            "--lag-threshold",
+            type=float,
+            default=0.5,
+            help="log the stack blocking the event loop for longer than this",
+        )
+        parser.add_argument(
+            "--max-rss-per-child",
+            type=int,
+            default=None,
+            help=(
+                "replace a worker process once its resident memory "
+                "exceeds this many MiB"
+            ),
+        )
+        namespace, rest = parser.parse_known_args(args)
+        worker_args = WorkerArgs.from_cli(rest)
+        return cls(**asdict(worker_args), **namespace.__dict__)
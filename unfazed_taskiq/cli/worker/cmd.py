@@ -2,9 +2,79 @@ import asyncio
 from typing import Optional, Sequence
 
 from taskiq.abc.cmd import TaskiqCMD
-from taskiq.cli.worker.args import WorkerArgs
 from taskiq.cli.worker.run import run_worker
 from unfazed.core import Unfazed
+from unfazed.utils import import_string
+
+from unfazed_taskiq.agent.handler import agents
+from unfazed_taskiq.autoscale.manager import Autoscaler, run_autoscaled_worker
+from unfazed_taskiq.cli.worker.args import WorkerEventArgs
+from unfazed_taskiq.logger import log
+from unfazed_taskiq.recycling import run_recycling_worker
+from unfazed_taskiq.settings import Adaptive, Autoscale
+
+DEFAULT_RECEIVER = "taskiq.receiver:Receiver"
+UNFAZED_RECEIVER = "unfazed_taskiq.receiver:UnfazedReceiver"
+ADAPTIVE_RECEIVER = "unfazed_taskiq.receiver:AdaptiveReceiver"
+
+
+def use_adaptive_receiver(wargs: WorkerEventArgs, adaptive: Adaptive) -> None:
+    """Run the alias with AdaptiveReceiver, --receiver_arg overrides settings."""
+    if wargs.receiver in (DEFAULT_RECEIVER, UNFAZED_RECEIVER):
+        wargs.receiver = ADAPTIVE_RECEIVER
+    options = [
+        (name, str(value))
+        for name, value in adaptive.model_dump().items()
+        if value is not None
+    ]
+    wargs.receiver_arg = [*options, *wargs.receiver_arg]
+
+
+def use_health(wargs: WorkerEventArgs) -> None:
+    """Pass the health options to the receiver of the worker processes."""
+    if wargs.health_port is None and wargs.health_file is None:
+        return
+    if wargs.receiver not in (UNFAZED_RECEIVER, ADAPTIVE_RECEIVER):
+        log.warning(f"{wargs.receiver} doesn't support the health options")
+        return
+    options = [("lag_threshold", str(wargs.lag_threshold))]
+    if wargs.health_port is not None:
+        options.append(("health_port", str(wargs.health_port)))
+    if wargs.health_file is not None:
+        options.append(("health_file", wargs.health_file))
+    wargs.receiver_arg = [*options, *wargs.receiver_arg]
+
+
+def use_recycling(wargs: WorkerEventArgs) -> None:
+    """Pass --max-rss-per-child to the receiver of the worker processes."""
+    if wargs.max_rss_per_child is None:
+        return
+    if wargs.receiver not in (UNFAZED_RECEIVER, ADAPTIVE_RECEIVER):
+        log.warning(f"{wargs.receiver} doesn't support --max-rss-per-child")
+        return
+    max_rss = str(wargs.max_rss_per_child << 20)
+    wargs.receiver_arg = [("max_rss", max_rss), *wargs.receiver_arg]
+
+
+def use_worker_count(wargs: WorkerEventArgs, autoscale: Optional[Autoscale]) -> None:
+    """Pass the number of processes running at once to the receiver."""
+    if wargs.receiver not in (UNFAZED_RECEIVER, ADAPTIVE_RECEIVER):
+        return
+    if autoscale is not None:
+        workers = autoscale.max_workers
+    else:
+        workers = wargs.workers
+        # a recycled process drains next to its replacement
+        if wargs.max_tasks_per_child or wargs.max_rss_per_child:
+            workers += 1
+    wargs.receiver_arg = [("workers", str(workers)), *wargs.receiver_arg]
+
+
+def recycling_drain_timeout(wargs: WorkerEventArgs) -> Optional[float]:
+    """Seconds a recycled process has to drain and exit, None to wait."""
+    if wargs.wait_tasks_timeout is None:
+        return None
+    return wargs.wait_tasks_timeout + wargs.shutdown_timeout + 5
 
 
 class WorkerCMD(TaskiqCMD):
@@ -23,11 +93,58 @@ class WorkerCMD(TaskiqCMD):
         Worker process creates several small
         processes in which tasks are actually processed.
 
+        Tasks still running on shutdown get --wait-tasks-timeout
+        seconds to finish, then their messages are requeued.
+
+        When the alias has AUTOSCALE settings, the number of
+        processes follows the depth of its queue. With ADAPTIVE
+        settings, the in-flight and prefetch limits of every
+        process follow its load.
+
+        --health-port and --health-file expose the event loop lag
+        and broker connection of every process.
+
+        A process reaching --max-tasks-per-child messages or
+        --max-rss-per-child MiB stops fetching and drains, its
+        replacement starts right away.
+
         :param args: CLI arguments.
         :returns: status code.
         """
         # setup unfazed
         asyncio.run(self.init_unfazed())
         # setup worker
-        wargs: WorkerArgs = WorkerArgs.from_cli(args)
-        return run_worker(wargs)
+        wargs: WorkerEventArgs = WorkerEventArgs.from_cli(args)
+        if wargs.receiver == DEFAULT_RECEIVER:
+            wargs.receiver = UNFAZED_RECEIVER
+        agent = agents.get_agent(wargs.alias_name)
+        if agent is not None and agent.config.adaptive is not None:
+            use_adaptive_receiver(wargs, agent.config.adaptive)
+        use_health(wargs)
+        use_recycling(wargs)
+        use_worker_count(wargs, None if agent is None else agent.config.autoscale)
+        if agent is None or agent.config.autoscale is None:
+            if wargs.max_tasks_per_child or wargs.max_rss_per_child:
+                return run_recycling_worker(
+                    wargs, drain_timeout=recycling_drain_timeout(wargs)
+                )
+            return run_worker(wargs)
+
+        autoscale = agent.config.autoscale
+        sampler_cls = import_string(autoscale.sampler.backend)
+        autoscaler = Autoscaler(
+            min_workers=autoscale.min_workers,
+            max_workers=autoscale.max_workers,
+            target_depth=autoscale.target_depth,
+            scale_down_ratio=autoscale.scale_down_ratio,
+            down_samples=autoscale.down_samples,
+            max_lag=autoscale.max_lag,
+            cooldown=autoscale.cooldown,
+        )
+        return run_autoscaled_worker(
+            wargs,
+            sampler_cls(**(autoscale.sampler.options or {})),
+            autoscaler,
+            interval=autoscale.interval,
+            drain_timeout=autoscale.drain_timeout,
+        )
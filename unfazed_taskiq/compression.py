@@ -0,0 +1,152 @@
+import zlib
+from typing import Callable, Dict, Optional
+
+from taskiq.abc.formatter import TaskiqFormatter
+from taskiq.message import BrokerMessage, TaskiqMessage
+
+COMPRESSED_MAGIC = b"\x00utq"
+DEFAULT_COMPRESSION_THRESHOLD = 16 * 1024
+
+
+class Codec:
+    """
+    Compression codec, identified in compressed bodies by a single byte.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        codec_id: int,
+        compress: Callable[[bytes, Optional[int]], bytes],
+        decompress: Callable[[bytes], bytes],
+    ) -> None:
+        self.name = name
+        self.codec_id = codec_id
+        self.header = COMPRESSED_MAGIC + bytes([codec_id])
+        self._compress = compress
+        self._decompress = decompress
+
+    def compress(self, data: bytes, level: Optional[int] = None) -> bytes:
+        return self._compress(data, level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompress(data)
+
+
+def _zlib_codec() -> Codec:
+    return Codec(
+        "zlib",
+        1,
+        lambda data, level: zlib.compress(data, 1 if level is None else level),
+        zlib.decompress,
+    )
+
+
+def _lz4_codec() -> Codec:
+    import lz4.frame
+
+    return Codec(
+        "lz4",
+        2,
+        lambda data, level: lz4.frame.compress(data, compression_level=level or 0),
+        lz4.frame.decompress,
+    )
+
+
+def _zstd_codec() -> Codec:
+    import zstandard
+
+    return Codec(
+        "zstd",
+        3,
+        lambda data, level: zstandard.ZstdCompressor(
+            level=1 if level is None else level
+        ).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+
+
+CODECS: Dict[str, Callable[[], Codec]] = {
+    "zlib": _zlib_codec,
+    "lz4": _lz4_codec,
+    "zstd": _zstd_codec,
+}
+CODEC_NAMES = {1: "zlib", 2: "lz4", 3: "zstd"}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Build a codec by name.
+
+    :raises ValueError: if the codec is unknown or its package is missing.
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression codec {name}")
+    try:
+        return CODECS[name]()
+    except ImportError as exc:
+        raise ValueError(
+            f"Compression codec {name} requires the {exc.name} package"
+        ) from exc
+
+
+class CompressingFormatter(TaskiqFormatter):
+    """
+    Compress message bodies larger than `threshold` bytes.
+
+    Compressed bodies start with a magic header naming the codec and the
+    message gets a `compression` label on both ends, smaller or
+    incompressible bodies are sent untouched. Any compressed body is
+    decompressed on load, so workers accept messages from senders with or
+    without compression.
+
+    :param formatter: formatter producing the body.
+    :param threshold: minimum body size to compress, in bytes.
+    :param codec: `zlib`, `lz4` or `zstd`, the latter two need their package.
+    :param level: compression level, defaults to a fast one.
+    """
+
+    def __init__(
+        self,
+        formatter: TaskiqFormatter,
+        threshold: int = DEFAULT_COMPRESSION_THRESHOLD,
+        codec: str = "zlib",
+        level: Optional[int] = None,
+    ) -> None:
+        self.formatter = formatter
+        self.threshold = threshold
+        self.codec = get_codec(codec)
+        self.level = level
+        self.codecs: Dict[int, Codec] = {self.codec.codec_id: self.codec}
+
+    def dumps(self, message: TaskiqMessage) -> BrokerMessage:
+        broker_message = self.formatter.dumps(message)
+        body = broker_message.message
+        if len(body) < self.threshold:
+            return broker_message
+
+        compressed = self.codec.header + self.codec.compress(body, self.level)
+        if len(compressed) >= len(body):
+            return broker_message
+        broker_message.message = compressed
+        broker_message.labels = {
+            **broker_message.labels,
+            "compression": self.codec.name,
+        }
+        return broker_message
+
+    def loads(self, message: bytes) -> TaskiqMessage:
+        if message.startswith(COMPRESSED_MAGIC):
+            header_size = len(COMPRESSED_MAGIC) + 1
+            codec_id = message[header_size - 1]
+            codec = self.codecs.get(codec_id)
+            if codec is None:
+                if codec_id not in CODEC_NAMES:
+                    raise ValueError(f"Unknown compression codec id {codec_id}")
+                codec = self.codecs[codec_id] = get_codec(CODEC_NAMES[codec_id])
+            taskiq_message = self.formatter.loads(
+                codec.decompress(message[header_size:])
+            )
+            taskiq_message.labels["compression"] = codec.name
+            return taskiq_message
+        return self.formatter.loads(message)
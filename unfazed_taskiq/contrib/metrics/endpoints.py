@@ -0,0 +1,7 @@
+from unfazed.http import HttpRequest, PlainTextResponse
+
+from unfazed_taskiq.metrics import PROMETHEUS_CONTENT_TYPE, registry
+
+
+async def metrics_endpoint(request: HttpRequest) -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,7 @@
+import typing as t
+
+from unfazed.route import Route, path
+
+from .endpoints import metrics_endpoint
+
+patterns: t.List[Route] = [path("/metrics", endpoint=metrics_endpoint)]
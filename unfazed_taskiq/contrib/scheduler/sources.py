@@ -68,12 +68,24 @@ class TortoiseScheduleSource(ScheduleSource):
 
         log.info("MysqlScheduleSource shutdown")
 
+    def connection(self) -> t.Optional[BaseDBAsyncClient]:
+        """
+        The connection of db_alias.
+
+        Tortoise creates new connections when it is initialized again, the one
+        from startup then points to a closed database, which for an in-memory
+        SQLite database is a new empty one.
+        """
+        if self.alias is not None and Tortoise._inited:
+            self.alias = Tortoise.get_connection(self._alias)
+        return self.alias
+
     async def get_schedules(self) -> t.List["ScheduledTask"]:
         """Get list of taskiq schedules."""
 
         schedules = await m.PeriodicTask.filter(
             enabled=1, schedule_alias=self.schedule_alias
-        ).using_db(self.alias)
+        ).using_db(self.connection())
         return [schedule.to_taskiq_schedule_task() for schedule in schedules]
 
     async def add_schedule(
@@ -99,7 +111,7 @@ class TortoiseScheduleSource(ScheduleSource):
 
         if (
             await m.PeriodicTask.filter(schedule_id=schedule_id)
-            .using_db(self.alias)
+            .using_db(self.connection())
             .exists()
         ):
             raise RuntimeError(f"Schedule {schedule_id} already exists")
@@ -121,7 +133,7 @@ class TortoiseScheduleSource(ScheduleSource):
         else:
             raise RuntimeError("No schedule found")
 
-        await pt.save(using_db=self.alias)
+        await pt.save(using_db=self.connection())
 
     async def delete_schedule(self, schedule_id: str) -> None:
         """
@@ -134,7 +146,7 @@ class TortoiseScheduleSource(ScheduleSource):
 
         await (
             m.PeriodicTask.filter(schedule_id=schedule_id)
-            .using_db(self.alias)
+            .using_db(self.connection())
             .update(enabled=0)
         )
 
@@ -153,7 +165,7 @@ class TortoiseScheduleSource(ScheduleSource):
         """
         await (
             m.PeriodicTask.filter(schedule_id=task.schedule_id)
-            .using_db(self.alias)
+            .using_db(self.connection())
             .update(last_run_at=datetime.now())
         )
 
@@ -173,5 +185,5 @@ class TortoiseScheduleSource(ScheduleSource):
             enabled = 0
 
         await m.PeriodicTask.filter(schedule_id=task.schedule_id).using_db(
-            self.alias
+            self.connection()
         ).update(total_run_count=F("total_run_count") + 1, enabled=enabled)
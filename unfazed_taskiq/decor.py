@@ -0,0 +1,52 @@
+from typing import Any, AsyncIterable, Iterable, Optional, Union
+
+from taskiq.decor import AsyncTaskiqDecoratedTask
+
+from unfazed_taskiq.dedup import Deduplicator
+from unfazed_taskiq.kicker import UnfazedKicker
+from unfazed_taskiq.mapping import TaskMap
+from unfazed_taskiq.router import Router
+from unfazed_taskiq.workflow import Signature
+
+
+class UnfazedTaskiqDecoratedTask(AsyncTaskiqDecoratedTask):
+    """Decorated task class used by every broker set up by unfazed-taskiq."""
+
+    deduplicator: Optional[Deduplicator] = None
+    router: Optional[Router] = None
+
+    def kicker(self) -> UnfazedKicker:
+        return UnfazedKicker(
+            task_name=self.task_name,
+            broker=self.broker,
+            labels=self.labels,
+            deduplicator=self.deduplicator,
+            router=self.router,
+            func=self.original_func,
+        )
+
+    def s(self, *args: Any, **kwargs: Any) -> Signature:
+        """Signature of a call of this task, for chains, groups and chords."""
+        return Signature(
+            self.task_name, args, kwargs, labels=dict(self.labels), broker=self.broker
+        )
+
+    def map(
+        self,
+        source: Union[AsyncIterable[Any], Iterable[Any]],
+        chunk_size: int = 100,
+        max_in_flight: Optional[int] = None,
+        **kwargs: Any,
+    ) -> TaskMap:
+        """
+        Apply this task to every item of source, in chunked messages.
+
+        `await task.map(ids, chunk_size=1000, max_in_flight=20).kiq()` sends
+        them, `async for value in task.map(...)` also collects the results.
+        """
+        return TaskMap(
+            self, source, chunk_size=chunk_size, max_in_flight=max_in_flight, **kwargs
+        )
+
+    def __repr__(self) -> str:
+        return f"UnfazedTaskiqDecoratedTask({self.task_name})"
@@ -2,13 +2,25 @@ from typing import Any, Callable, Optional
 
 from unfazed_taskiq.agent.handler import agents
 from unfazed_taskiq.agent.model import TaskiqAgent
+from unfazed_taskiq.cache import TaskMemo, memoize
+from unfazed_taskiq.dedup import Deduplicator
+from unfazed_taskiq.executors import run_in_process, run_in_thread
 from unfazed_taskiq.registry.task import rs
 
+DEFAULT_IDEMPOTENCY_TTL = 60
+
 
 def task(
     func: Optional[Callable] = None,
     *,
     alias_name: Optional[str] = None,
+    cache_ttl: Optional[float] = None,
+    cache_key: Optional[Callable[..., str]] = None,
+    idempotency_ttl: Optional[float] = None,
+    idempotency_key: Optional[Callable[..., str]] = None,
+    route: Optional[str] = None,
+    executor: Optional[str] = None,
+    thread_pool: Optional[str] = None,
     **task_kwargs: Any,
 ) -> Callable:
     """
@@ -17,6 +29,19 @@ def task(
     Args:
         func: function to decorate (when used without parentheses)
         alias_name: alias name, if None, use default alias
+        cache_ttl: memoize results for this many seconds, enables caching
+        cache_key: build the cache key from the task arguments,
+            defaults to a hash of the normalized arguments, enables caching
+        idempotency_ttl: drop enqueues of the same key within this many
+            seconds, enables deduplication
+        idempotency_key: build the idempotency key from the task arguments,
+            defaults to a hash of the arguments, enables deduplication
+        route: name of a route in ROUTES picking the alias of each message,
+            the task is registered on every alias of the route
+        executor: "process" runs the task in the process pool of the alias,
+            for CPU bound work that would block the worker event loop
+        thread_pool: name of a pool in THREAD_POOLS running this sync task,
+            isolating it from the other blocking tasks
         **task_kwargs: other arguments for taskiq task decorator
 
     Example:
@@ -31,15 +56,90 @@ def task(
         @task(alias_name="low_priority", schedule=[{"cron": "*/5 * * * *"}])
         async def scheduled_task():
             pass
+
+        @task(cache_ttl=300, cache_key=lambda report_id: f"report:{report_id}")
+        async def render_report(report_id: int) -> str:
+            pass
+
+        @task(idempotency_ttl=60, idempotency_key=lambda order_id: str(order_id))
+        async def charge_order(order_id: int) -> None:
+            pass
+
+        @task(route="tenants")
+        async def sync_tenant(tenant_id: int) -> None:
+            pass
+
+        @task(executor="process")
+        def render_report(rows: list) -> bytes:
+            pass
+
+        @task(thread_pool="payments")
+        def call_payment_gateway(order_id: int) -> None:
+            pass
     """
 
     def decorator(func: Callable) -> Callable:
         _agent: Optional[TaskiqAgent] = agents.get_agent(alias_name)
+        # validate the options before registering the task
+        if executor is not None and thread_pool is not None:
+            raise ValueError("executor and thread_pool cannot be used together")
+        if executor not in (None, "process"):
+            raise ValueError(f"Unknown executor {executor}")
+        pool = None
+        if thread_pool is not None:
+            pool = agents.get_thread_pool(thread_pool)
+            if pool is None:
+                raise ValueError(f"Thread pool {thread_pool} not found")
+        router = None
+        if route is not None:
+            router = agents.get_router(route)
+            if router is None:
+                raise ValueError(f"Route {route} not found")
+
         rs.register_broker(func, alias_name, **task_kwargs)
         # decorate task
         if _agent is None:
             raise ValueError(f"Agent {alias_name} not found")
-        return _agent.broker.task(**task_kwargs)(func)
+
+        target = func
+        if executor == "process":
+            target = run_in_process(func, _agent.get_process_pool())
+        if pool is not None:
+            target = run_in_thread(func, pool)
+
+        memo: Optional[TaskMemo] = None
+        if cache_ttl is not None or cache_key is not None:
+            broker = _agent.broker
+            memo = TaskMemo(
+                func,
+                ttl=cache_ttl,
+                key=cache_key,
+                result_backend=lambda: broker.result_backend,
+            )
+            target = memoize(target, memo)
+
+        decorated = _agent.broker.task(**task_kwargs)(target)
+        if memo is not None:
+            decorated.memo = memo
+        if idempotency_ttl is not None or idempotency_key is not None:
+            decorated.deduplicator = Deduplicator(
+                f"{func.__module__}.{func.__name__}",
+                ttl=DEFAULT_IDEMPOTENCY_TTL
+                if idempotency_ttl is None
+                else idempotency_ttl,
+                key=idempotency_key,
+                store=_agent.store,
+            )
+        if router is not None:
+            for route_alias in router.all_aliases:
+                route_agent = agents.get_agent(route_alias)
+                if route_agent is None or route_agent.broker is _agent.broker:
+                    continue
+                route_agent.broker.task(
+                    **{**task_kwargs, "task_name": decorated.task_name}
+                )(target)
+            decorated.router = router
+        return decorated
 
     # Support @task and @task()
     return decorator if func is None else decorator(func)
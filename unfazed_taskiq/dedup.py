@@ -0,0 +1,63 @@
+from typing import Any, Callable, Optional
+
+from unfazed_taskiq.cache import LRUCache, make_args_key
+from unfazed_taskiq.store import AsyncSharedStore
+
+DEDUP_KEY_PREFIX = "unfazed_taskiq:dedup"
+
+
+class Deduplicator:
+    """
+    Drop duplicate enqueues of a task within a ttl.
+
+    Keys seen by this process are answered by a bounded LRU, only unknown
+    keys are claimed in the shared store.
+    """
+
+    def __init__(
+        self,
+        task_name: str,
+        ttl: float,
+        key: Optional[Callable[..., str]] = None,
+        store: Optional[AsyncSharedStore] = None,
+        maxsize: int = 4096,
+    ) -> None:
+        self.task_name = task_name
+        self.ttl = ttl
+        self.key = key
+        self.store = store
+        self.local: LRUCache[str] = LRUCache(maxsize)
+        self.dropped = 0
+
+    def make_key(self, *args: Any, **kwargs: Any) -> str:
+        if self.key is not None:
+            return str(self.key(*args, **kwargs))
+        return make_args_key(args, kwargs)
+
+    def store_key(self, key: str) -> str:
+        return f"{DEDUP_KEY_PREFIX}:{self.task_name}:{key}"
+
+    async def claim(self, key: str, task_id: str) -> Optional[str]:
+        """
+        Claim key for task_id.
+
+        :return: id of the task that already owns key, None if claimed.
+        """
+        existing = self.local.get(key)
+        if existing is None and self.store is not None:
+            existing = await self.store.get_or_set(
+                self.store_key(key), task_id, self.ttl
+            )
+        if existing is not None:
+            self.dropped += 1
+            self.local.set(key, existing, self.ttl)
+            return existing
+
+        self.local.set(key, task_id, self.ttl)
+        return None
+
+    async def release(self, key: str) -> None:
+        """Forget key, e.g. when the message could not be sent."""
+        self.local.delete(key)
+        if self.store is not None:
+            await self.store.delete(self.store_key(key))
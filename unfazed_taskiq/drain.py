@@ -0,0 +1,257 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from taskiq import AckableMessage, AsyncBroker
+from taskiq.message import BrokerMessage
+from taskiq.utils import maybe_awaitable
+
+from unfazed_taskiq.logger import log
+
+# set while `UnfazedReceiver` handles a message, whose hooks may raise Defer
+deferrable: ContextVar[bool] = ContextVar("deferrable", default=False)
+
+# label delaying the delivery of a message, on brokers supporting it
+DELAY_LABEL = "delay"
+# marks the delayed copies of deferred messages
+DEFERRED_LABEL = "deferred"
+
+
+def delays_natively(broker: AsyncBroker) -> bool:
+    """
+    Whether broker delays messages by their `delay` label.
+
+    True for `AioPikaBroker`, other brokers opt in with a truthy
+    `supports_delay` attribute.
+    """
+    supports_delay = getattr(broker, "supports_delay", None)
+    if supports_delay is not None:
+        return bool(supports_delay)
+    try:
+        from taskiq_aio_pika import AioPikaBroker
+    except ImportError:  # pragma: no cover
+        return False
+    return isinstance(broker, AioPikaBroker)
+
+
+class Defer(Exception):
+    """
+    Raised by a `pre_execute` hook to run the message later.
+
+    The receiver frees the execution slot of the message and sends it back
+    to its broker after `delay` seconds, with `labels` added. Only raise it
+    when `deferrable` is set.
+    """
+
+    def __init__(self, delay: float, labels: Optional[Dict[str, Any]] = None) -> None:
+        super().__init__(f"Deferred for {delay:.3f}s")
+        self.delay = delay
+        self.labels = labels or {}
+
+
+@dataclass
+class InFlight:
+    """A message being executed by this process."""
+
+    message: Union[bytes, AckableMessage]
+    broker: AsyncBroker
+    requeue: bool = True
+    started_at: float = field(default_factory=time.monotonic)
+    task_id: Optional[str] = None
+    task_name: Optional[str] = None
+    # acked before execution, requeueing must not ack it again
+    acked: bool = False
+    # the task ran, what remains is saving its result
+    executed: bool = False
+    # cancelled by a drain, which requeues the message
+    cancelled: bool = False
+    # labels added to the message when it is requeued
+    labels: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def data(self) -> bytes:
+        if isinstance(self.message, AckableMessage):
+            return self.message.data
+        return self.message
+
+
+class InFlightTracker:
+    """Messages executing in this process, by the asyncio task running them."""
+
+    def __init__(self) -> None:
+        self.entries: Dict["asyncio.Task[Any]", InFlight] = {}
+        # deferred messages waiting to be requeued, by id of their entry
+        self.deferred: Dict[int, Tuple[asyncio.TimerHandle, InFlight]] = {}
+        self.requeueing: Set["asyncio.Task[bool]"] = set()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def track(self, task: "asyncio.Task[Any]", entry: InFlight) -> None:
+        self.entries[task] = entry
+
+    def get(self, task: Optional["asyncio.Task[Any]"]) -> Optional[InFlight]:
+        return self.entries.get(task) if task is not None else None
+
+    def discard(self, task: "asyncio.Task[Any]") -> None:
+        self.entries.pop(task, None)
+
+    async def defer(self, entry: InFlight, delay: float) -> None:
+        """
+        Requeue the message of entry in delay seconds.
+
+        Brokers delaying messages natively get a delayed copy right away and
+        the message is acked, so it doesn't hold a prefetch slot meanwhile.
+        Otherwise the message is kept until its delay ends.
+        """
+        if delays_natively(entry.broker):
+            entry.labels.update(
+                {DELAY_LABEL: round(max(delay, 0.0), 3), DEFERRED_LABEL: 1}
+            )
+            if await requeue(entry):
+                return
+            entry.labels.pop(DELAY_LABEL)
+            entry.labels.pop(DEFERRED_LABEL)
+        handle = asyncio.get_running_loop().call_later(
+            max(delay, 0.0), self.requeue_due, id(entry)
+        )
+        self.deferred[id(entry)] = (handle, entry)
+
+    def requeue_due(self, key: int) -> None:
+        _, entry = self.deferred.pop(key)
+        task = asyncio.ensure_future(requeue(entry))
+        self.requeueing.add(task)
+        task.add_done_callback(self.requeueing.discard)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "task_id": entry.task_id,
+                "task_name": entry.task_name,
+                "running_for": now - entry.started_at,
+            }
+            for entry in self.entries.values()
+        ]
+
+
+# one tracker per process, shared by its receivers
+in_flight = InFlightTracker()
+
+
+@dataclass
+class DrainReport:
+    finished: int = 0
+    requeued: int = 0
+    cancelled: int = 0
+    elapsed: float = 0.0
+
+
+async def requeue(entry: InFlight) -> bool:
+    """Send the message of entry back to its broker, with its labels added."""
+    try:
+        message = entry.broker.formatter.loads(entry.data)
+        if entry.labels:
+            message.labels.update(entry.labels)
+            broker_message = entry.broker.formatter.dumps(message)
+        else:
+            broker_message = BrokerMessage(
+                task_id=message.task_id,
+                task_name=message.task_name,
+                message=entry.data,
+                labels=message.labels,
+            )
+        await entry.broker.kick(broker_message)
+        if isinstance(entry.message, AckableMessage) and not entry.acked:
+            # the copy replaces the original, which must not be redelivered
+            await maybe_awaitable(entry.message.ack())
+    except Exception:
+        log.exception(f"Failed to requeue task {entry.task_name} {entry.task_id}")
+        return False
+    return True
+
+
+async def requeue_deferred(tracker: InFlightTracker) -> DrainReport:
+    """Requeue the deferred messages of tracker now instead of at their delay."""
+    report = DrainReport()
+    deferred = list(tracker.deferred.values())
+    tracker.deferred.clear()
+    for handle, entry in deferred:
+        handle.cancel()
+        if entry.requeue and await requeue(entry):
+            report.requeued += 1
+        else:
+            report.cancelled += 1
+    if tracker.requeueing:
+        await asyncio.wait(set(tracker.requeueing))
+    return report
+
+
+def describe(entries: List[InFlight]) -> str:
+    names = sorted({entry.task_name or "unknown" for entry in entries})
+    return ", ".join(names[:5]) + (", ..." if len(names) > 5 else "")
+
+
+async def drain(
+    tracker: InFlightTracker,
+    timeout: Optional[float],
+    interval: float = 1.0,
+) -> DrainReport:
+    """
+    Let the tasks in flight finish, up to `timeout` seconds.
+
+    Progress is logged every `interval` seconds. At the deadline the
+    remaining tasks are cancelled and their messages requeued, unless they
+    were tracked with `requeue=False`. Deferred messages are requeued right
+    away, or dropped with `requeue=False`.
+
+    :param tracker: tracker of the tasks to drain.
+    :param timeout: seconds to wait, None to wait for every task.
+    :param interval: seconds between two progress logs.
+    """
+    started_at = time.monotonic()
+    deferred = await requeue_deferred(tracker)
+    deadline = None if timeout is None else started_at + timeout
+    pending = set(tracker.entries)
+    total = len(pending)
+    while pending:
+        entries = [tracker.entries[task] for task in pending if task in tracker.entries]
+        left = None if deadline is None else deadline - time.monotonic()
+        if left is not None and left <= 0:
+            break
+        log.info(
+            f"Draining {len(pending)} of {total} tasks in flight"
+            + (f", {left:.0f}s left" if left is not None else "")
+            + f": {describe(entries)}"
+        )
+        wait = interval if left is None else min(interval, left)
+        _, pending = await asyncio.wait(pending, timeout=wait)
+
+    report = DrainReport(
+        finished=total - len(pending),
+        requeued=deferred.requeued,
+        cancelled=deferred.cancelled,
+    )
+    cancelled = []
+    for task in pending:
+        entry = tracker.get(task)
+        if entry is not None:
+            entry.cancelled = True
+            cancelled.append(entry)
+        task.cancel()
+    if pending:
+        await asyncio.wait(pending)
+    for entry in cancelled:
+        if entry.requeue and not entry.executed and await requeue(entry):
+            report.requeued += 1
+        else:
+            report.cancelled += 1
+    report.elapsed = time.monotonic() - started_at
+    if total or deferred.requeued or deferred.cancelled:
+        log.info(
+            f"Drained {total} tasks in {report.elapsed:.1f}s: {report.finished} "
+            f"finished, {report.requeued} requeued, {report.cancelled} cancelled"
+        )
+    return report
@@ -0,0 +1,355 @@
+import asyncio
+import contextvars
+import functools
+import importlib
+import inspect
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from taskiq import TaskiqState
+from taskiq_dependencies.dependency import Dependency
+from unfazed.utils import import_string
+
+from unfazed_taskiq.metrics import MetricsRegistry, PoolMetrics
+from unfazed_taskiq.metrics import registry as metrics_registry
+
+SHARED_MEMORY_THRESHOLD = 1024 * 1024
+DEFAULT_INITIALIZER = "unfazed_taskiq.executors.setup_unfazed"
+
+# functions declared with executor="process", by `module:qualname`
+process_functions: Dict[str, Callable[..., Any]] = {}
+
+# executor of the receiver running the current task, for its sync calls
+task_executor: ContextVar[Optional[Executor]] = ContextVar(
+    "task_executor", default=None
+)
+
+
+def dependency_names(func: Callable[..., Any]) -> Set[str]:
+    """Names of the parameters of func injected with `TaskiqDepends`."""
+    return {
+        name
+        for name, param in inspect.signature(func).parameters.items()
+        if isinstance(param.default, Dependency)
+    }
+
+
+async def run_sync(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Call the sync func in the executor of the current task, like taskiq."""
+    loop = asyncio.get_running_loop()
+    # like asyncio.to_thread, keep context variables such as the trace
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        task_executor.get(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def setup_unfazed() -> None:
+    """Default process initializer, loads the Unfazed project of the worker."""
+    from unfazed.core import Unfazed
+
+    asyncio.run(Unfazed(silent=True).setup())
+
+
+def init_process(initializer: Optional[str]) -> None:
+    if initializer:
+        import_string(initializer)()
+
+
+@dataclass
+class SharedBuffer:
+    """Handle of a bytes-like value placed in shared memory."""
+
+    name: str
+    size: int
+    kind: str
+
+
+def share(value: Any, threshold: Optional[int]) -> Any:
+    """Place a large bytes-like value in shared memory, return its handle."""
+    if threshold is None or not isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+    view = memoryview(value).cast("B")
+    if view.nbytes < max(threshold, 1):
+        return value
+    shm = SharedMemory(create=True, size=view.nbytes)
+    try:
+        assert shm.buf is not None
+        shm.buf[: view.nbytes] = view
+    finally:
+        shm.close()
+    kind = "bytearray" if isinstance(value, bytearray) else "bytes"
+    return SharedBuffer(shm.name, view.nbytes, kind)
+
+
+def load(value: Any, unlink: bool = False) -> Any:
+    """Read back a value passed through `share`."""
+    if not isinstance(value, SharedBuffer):
+        return value
+    shm = SharedMemory(name=value.name)
+    try:
+        assert shm.buf is not None
+        data = shm.buf[: value.size]
+        loaded = bytearray(data) if value.kind == "bytearray" else bytes(data)
+        data.release()
+    finally:
+        shm.close()
+        if unlink:
+            shm.unlink()
+    return loaded
+
+
+def release(value: Any) -> None:
+    if isinstance(value, SharedBuffer):
+        try:
+            SharedMemory(name=value.name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def resolve(path: str) -> Callable[..., Any]:
+    func = process_functions.get(path)
+    if func is None:
+        # importing the module declares its tasks again in this process
+        importlib.import_module(path.split(":", 1)[0])
+        func = process_functions.get(path)
+    if func is None:
+        raise ValueError(f"{path} is not declared with executor='process'")
+    return func
+
+
+def call_in_process(
+    path: str,
+    args: Sequence[Any],
+    kwargs: Dict[str, Any],
+    threshold: Optional[int],
+) -> Any:
+    """Run a process task, in a child process of the pool."""
+    func = resolve(path)
+    result = func(
+        *[load(arg) for arg in args],
+        **{name: load(value) for name, value in kwargs.items()},
+    )
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)  # type: ignore[arg-type]
+    return share(result, threshold)
+
+
+class ProcessPool:
+    """
+    Process pool running the CPU bound tasks of an alias.
+
+    Child processes are spawned, not forked from the worker, and run
+    `initializer` first, by default the Unfazed setup. With `prewarm`, every
+    process is started when the worker starts instead of on first use.
+
+    Arguments and results are pickled, bytes-like values of at least
+    `shared_memory_threshold` bytes go through shared memory instead of the
+    pool pipes.
+
+    :param max_workers: number of processes, defaults to the cpu count.
+    :param shared_memory_threshold: minimum size of buffers passed through
+        shared memory, None to always pickle them.
+    :param initializer: import path of a function run in each new process.
+    :param start_method: multiprocessing start method.
+    :param prewarm: start every process on worker startup.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        shared_memory_threshold: Optional[int] = SHARED_MEMORY_THRESHOLD,
+        initializer: Optional[str] = DEFAULT_INITIALIZER,
+        start_method: str = "spawn",
+        prewarm: bool = False,
+    ) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shared_memory_threshold = shared_memory_threshold
+        self.initializer = initializer
+        self.start_method = start_method
+        self.prewarm = prewarm
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            # children must share the tracker of shared memory blocks
+            resource_tracker.ensure_running()
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=init_process,
+                initargs=(self.initializer,),
+            )
+        return self.executor
+
+    async def startup(self) -> None:
+        """Start every process of the pool."""
+        loop = asyncio.get_running_loop()
+        executor = self.get_executor()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, os.getpid)
+                for _ in range(self.max_workers)
+            )
+        )
+
+    async def shutdown(self) -> None:
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            await asyncio.to_thread(executor.shutdown)
+
+    async def worker_startup(self, state: TaskiqState) -> None:
+        if self.prewarm:
+            await self.startup()
+
+    async def worker_shutdown(self, state: TaskiqState) -> None:
+        await self.shutdown()
+
+    async def run(self, path: str, args: Sequence[Any], kwargs: Dict[str, Any]) -> Any:
+        """Call the process task declared under path with these arguments."""
+        threshold = self.shared_memory_threshold
+        shared_args = [share(arg, threshold) for arg in args]
+        shared_kwargs = {
+            name: share(value, threshold) for name, value in kwargs.items()
+        }
+        handles: List[Any] = [*shared_args, *shared_kwargs.values()]
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.get_executor(),
+                functools.partial(
+                    call_in_process, path, shared_args, shared_kwargs, threshold
+                ),
+            )
+        finally:
+            for handle in handles:
+                release(handle)
+        return load(result, unlink=True)
+
+
+def run_in_process(func: Callable[..., Any], pool: ProcessPool) -> Callable[..., Any]:
+    """
+    Wrap func so that calls run in the process pool.
+
+    func must be importable from its module, the processes of the pool
+    import it to find the function. Arguments injected with `TaskiqDepends`
+    live in the worker and are not sent, func gets their defaults.
+    """
+    path = f"{func.__module__}:{func.__qualname__}"
+    process_functions[path] = func
+    dependencies = dependency_names(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        kwargs = {
+            name: value for name, value in kwargs.items() if name not in dependencies
+        }
+        return await pool.run(path, args, kwargs)
+
+    return wrapper
+
+
+class ThreadPool:
+    """
+    Named thread pool isolating the blocking sync tasks declared on it.
+
+    Sync tasks otherwise share the default executor of the worker, where a
+    few slow calls can hold every thread. Queue wait, active and queued
+    calls and busy time are recorded in the metrics registry under the pool
+    name.
+
+    :param name: pool name.
+    :param max_workers: number of threads.
+    :param registry: registry to record into, defaults to the global one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        registry: Optional[MetricsRegistry] = None,
+    ) -> None:
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self.name = name
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"unfazed-taskiq-{name}"
+        )
+        registry = metrics_registry if registry is None else registry
+        self.metrics: PoolMetrics = registry.pool(name, max_workers)
+        self.lock = threading.Lock()
+
+    def call(
+        self,
+        submitted_at: float,
+        func: Callable[..., Any],
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+    ) -> Any:
+        started_at = time.perf_counter()
+        metrics = self.metrics
+        with self.lock:
+            metrics.queued -= 1
+            metrics.active += 1
+            metrics.queue_wait.observe(started_at - submitted_at)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self.lock:
+                metrics.active -= 1
+                metrics.completed += 1
+                metrics.busy_seconds += time.perf_counter() - started_at
+
+    async def run(
+        self, func: Callable[..., Any], args: Sequence[Any], kwargs: Dict[str, Any]
+    ) -> Any:
+        with self.lock:
+            self.metrics.submitted += 1
+            self.metrics.queued += 1
+        loop = asyncio.get_running_loop()
+        # like asyncio.to_thread, keep context variables such as the trace
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(
+                context.run, self.call, time.perf_counter(), func, args, kwargs
+            ),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            metrics = self.metrics
+            count = metrics.queue_wait.count
+            return {
+                "max_workers": self.max_workers,
+                "active": metrics.active,
+                "queued": metrics.queued,
+                "completed": metrics.completed,
+                "utilization": metrics.utilization,
+                "busy_seconds": metrics.busy_seconds,
+                "queue_wait_avg": metrics.queue_wait.sum / count if count else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+def run_in_thread(func: Callable[..., Any], pool: ThreadPool) -> Callable[..., Any]:
+    """Wrap the sync func so that calls run in the thread pool."""
+    if inspect.iscoroutinefunction(func):
+        raise ValueError(f"Thread pool {pool.name} only runs sync functions")
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await pool.run(func, args, kwargs)
+
+    return wrapper
@@ -0,0 +1,305 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import orjson as json
+from taskiq import AsyncBroker, TaskiqScheduler
+
+from unfazed_taskiq.logger import log
+from unfazed_taskiq.metrics import PROMETHEUS_CONTENT_TYPE
+
+Check = Callable[[], Awaitable[Optional[bool]]]
+
+
+def percentile(ordered: List[float], ratio: float) -> float:
+    return ordered[min(int(len(ordered) * ratio), len(ordered) - 1)]
+
+
+class LoopMonitor:
+    """
+    Measure the lag of the running event loop.
+
+    A timer is scheduled every `interval` seconds, the delay with which it
+    runs is the time the loop spent on something else. A watchdog thread
+    logs the stack of the loop thread when no timer ran for `threshold`
+    seconds, which points at the sync call or the CPU bound code blocking
+    it.
+
+    :param interval: seconds between two timers.
+    :param threshold: seconds of lag logged with the blocking stack.
+    :param window: number of lags kept for the percentiles.
+    """
+
+    def __init__(
+        self, interval: float = 0.1, threshold: float = 0.5, window: int = 600
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: Deque[float] = deque(maxlen=window)
+        self.blocked = 0
+        self.beat_at = time.monotonic()
+        self.reported_at: Optional[float] = None
+        self.loop_thread: Optional[int] = None
+        self.task: Optional["asyncio.Task[None]"] = None
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            self.beat_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(loop.time() - expected, 0.0))
+
+    def check(self) -> None:
+        """Log the stack of the loop thread if it is blocked, once per block."""
+        beat_at = self.beat_at
+        blocked_for = time.monotonic() - beat_at - self.interval
+        if blocked_for < self.threshold or self.reported_at == beat_at:
+            return
+        self.reported_at = beat_at
+        self.blocked += 1
+        frame = sys._current_frames().get(self.loop_thread or 0)
+        stack = "".join(traceback.format_stack(frame)) if frame else "unknown\n"
+        log.warning(
+            f"Event loop blocked for {blocked_for:.3f}s, "
+            f"stack of the loop thread:\n{stack}"
+        )
+
+    def watch(self) -> None:
+        while not self.stopped.wait(max(self.threshold / 4, 0.01)):
+            self.check()
+
+    def start(self) -> None:
+        self.loop_thread = threading.get_ident()
+        self.beat_at = time.monotonic()
+        self.task = asyncio.create_task(self.run())
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self.watch, name="unfazed-taskiq-loop-monitor", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def stats(self) -> Dict[str, float]:
+        ordered = sorted(self.lags)
+        if not ordered:
+            return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0, "blocked": 0}
+        return {
+            "p50": percentile(ordered, 0.5),
+            "p90": percentile(ordered, 0.9),
+            "p99": percentile(ordered, 0.99),
+            "max": ordered[-1],
+            "blocked": self.blocked,
+        }
+
+
+async def broker_connected(broker: AsyncBroker) -> Optional[bool]:
+    """
+    Whether the connection of broker is open, None when it can't be told.
+
+    aio-pika connections are inspected, and redis pools are pinged.
+    """
+    for name in ("write_conn", "read_conn", "connection"):
+        connection = getattr(broker, name, None)
+        if connection is not None and hasattr(connection, "is_closed"):
+            return not connection.is_closed
+    pool = getattr(broker, "connection_pool", None)
+    if pool is not None:
+        try:
+            from redis.asyncio import Redis
+        except ImportError:  # pragma: no cover
+            return None
+        try:
+            async with Redis(connection_pool=pool) as redis:
+                return bool(await redis.ping())
+        except Exception:
+            return False
+    return None
+
+
+def process_index() -> int:
+    """Index of this worker process, from its `worker-<index>` name."""
+    _, _, index = multiprocessing.current_process().name.rpartition("-")
+    return int(index) if index.isdigit() else 0
+
+
+class Health:
+    """
+    Liveness and readiness of a worker or scheduler process.
+
+    The status holds the loop lag percentiles of `monitor`, the result of
+    each named check and the fields of `info`. It is served as JSON on
+    `host:port`: `/live` answers 200 as long as the loop runs, `/ready`
+    answers 503 when a check fails or `ready` is false, `/metrics` returns
+    the Prometheus text rendered by `metrics`, any other path returns the
+    status. With `path`, the status is also written to that file every
+    `interval` seconds, for probes that read files.
+
+    :param monitor: loop monitor to report.
+    :param checks: coroutines telling if a dependency is available.
+    :param port: local port of the HTTP endpoint, None to disable it.
+    :param path: status file, None to disable it.
+    :param host: address of the HTTP endpoint.
+    :param interval: seconds between two writes of the file.
+    :param metrics: renders the metrics of the process, None to disable them.
+    """
+
+    def __init__(
+        self,
+        monitor: LoopMonitor,
+        checks: Optional[Dict[str, Check]] = None,
+        port: Optional[int] = None,
+        path: Optional[str] = None,
+        host: str = "127.0.0.1",
+        interval: float = 5,
+        metrics: Optional[Callable[[], str]] = None,
+    ) -> None:
+        self.monitor = monitor
+        self.checks: Dict[str, Check] = checks or {}
+        self.port = port
+        self.path = path
+        self.host = host
+        self.interval = interval
+        self.metrics = metrics
+        self.ready = True
+        self.info: Dict[str, Any] = {}
+        self.server: Optional[asyncio.Server] = None
+        self.writer: Optional["asyncio.Task[None]"] = None
+
+    async def status(self) -> Dict[str, Any]:
+        results: Dict[str, Optional[bool]] = {}
+        for name, check in self.checks.items():
+            try:
+                results[name] = await check()
+            except Exception:
+                results[name] = False
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "live": True,
+            "ready": self.ready and all(r is not False for r in results.values()),
+            "loop_lag": self.monitor.stats(),
+            "checks": results,
+            **self.info,
+        }
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            parts = request.decode("latin-1").split()
+            target = parts[1] if len(parts) > 1 else "/"
+            if target == "/metrics" and self.metrics is not None:
+                code = 200
+                content_type = PROMETHEUS_CONTENT_TYPE
+                body = self.metrics().encode()
+            else:
+                status = await self.status()
+                code = 503 if target == "/ready" and not status["ready"] else 200
+                content_type = "application/json"
+                body = json.dumps(status)
+            reason = "OK" if code == 200 else "Service Unavailable"
+            writer.write(
+                f"HTTP/1.1 {code} {reason}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def write(self) -> None:
+        assert self.path is not None
+        status = await self.status()
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(json.dumps(status))
+            os.replace(temporary, self.path)
+        except OSError as exc:
+            log.warning(f"Failed to write health status to {self.path}: {exc}")
+
+    async def write_forever(self) -> None:
+        while True:
+            await self.write()
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        self.monitor.start()
+        if self.port is not None:
+            try:
+                self.server = await asyncio.start_server(
+                    self.handle, self.host, self.port
+                )
+            except OSError as exc:
+                # a recycled process may still hold the port while it drains
+                log.warning(f"Health endpoint not started on port {self.port}: {exc}")
+            else:
+                log.info(f"Health endpoint listening on {self.host}:{self.port}")
+        if self.path is not None:
+            self.writer = asyncio.create_task(self.write_forever())
+
+    async def stop(self) -> None:
+        self.monitor.stop()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self.writer is not None:
+            self.writer.cancel()
+            self.writer = None
+            # a stopped process must not look alive
+            self.ready = False
+            self.info["live"] = False
+            await self.write()
+
+
+def track_ticks(
+    scheduler: TaskiqScheduler, health: Health, alias: str, max_age: float = 150
+) -> None:
+    """
+    Record in health when the scheduler last loaded its schedules.
+
+    taskiq loads them once a minute, the scheduler is not ready when the
+    last load is older than `max_age` seconds.
+    """
+    ticks: Dict[str, float] = health.info.setdefault("last_tick", {})
+
+    for source in scheduler.sources:
+
+        def tracked(get_schedules: Any = source.get_schedules) -> Any:
+            async def get() -> Any:
+                schedules = await get_schedules()
+                ticks[alias] = time.time()
+                return schedules
+
+            return get
+
+        source.get_schedules = tracked()  # type: ignore[method-assign]
+
+    async def fresh() -> Optional[bool]:
+        tick = ticks.get(alias)
+        return None if tick is None else time.time() - tick < max_age
+
+    health.checks[f"scheduler:{alias}"] = fresh
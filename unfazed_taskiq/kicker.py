@@ -0,0 +1,80 @@
+import copy
+from typing import Any, Callable, Optional
+
+from taskiq.kicker import AsyncKicker
+
+from unfazed_taskiq.dedup import Deduplicator
+from unfazed_taskiq.logger import log
+from unfazed_taskiq.router import Router
+from unfazed_taskiq.task import UnfazedTaskiqTask
+
+
+class UnfazedKicker(AsyncKicker):
+    """
+    Kicker that drops duplicate enqueues of idempotent tasks.
+
+    With a router, each message is sent to the broker of the alias the
+    router picks for its labels and arguments. `kiq` returns an
+    `UnfazedTaskiqTask`, woken by result notifications.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        deduplicator: Optional[Deduplicator] = None,
+        router: Optional[Router] = None,
+        func: Optional[Callable[..., Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.deduplicator = deduplicator
+        self.router = router
+        self.func = func
+        self.idempotency_key: Optional[str] = None
+
+    def with_idempotency_key(self, key: str) -> "UnfazedKicker":
+        """
+        Set the idempotency key for current execution.
+
+        :param key: key to deduplicate on, overrides the task's key function.
+        :return: kicker with idempotency key.
+        """
+        if self.deduplicator is None:
+            raise ValueError(
+                f"Task {self.task_name} is not idempotent, set idempotency_ttl"
+            )
+        self.idempotency_key = key
+        return self
+
+    async def kiq(self, *args: Any, **kwargs: Any) -> Any:
+        # the kicker may send again, the broker and task id of this message
+        # are set on a copy
+        kicker = copy.copy(self)
+        if self.router is not None:
+            kicker.broker = self.router.broker(self.labels, args, kwargs, self.func)
+        if self.deduplicator is None:
+            return self.wrap(await super(UnfazedKicker, kicker).kiq(*args, **kwargs))
+
+        key = self.idempotency_key
+        if key is None:
+            key = self.deduplicator.make_key(*args, **kwargs)
+        task_id = self.custom_task_id or kicker.broker.id_generator()
+
+        existing = await self.deduplicator.claim(key, task_id)
+        if existing is not None:
+            log.info(f"Task '{self.task_name}' with key {key} is a duplicate, dropped")
+            return UnfazedTaskiqTask(
+                task_id=existing, result_backend=kicker.broker.result_backend
+            )
+
+        kicker.custom_task_id = task_id
+        try:
+            return self.wrap(await super(UnfazedKicker, kicker).kiq(*args, **kwargs))
+        except Exception:
+            await self.deduplicator.release(key)
+            raise
+
+    def wrap(self, task: Any) -> UnfazedTaskiqTask:
+        return UnfazedTaskiqTask(
+            task_id=task.task_id, result_backend=task.result_backend
+        )
@@ -1,7 +1,10 @@
+from typing import Optional
+
 from unfazed.core import Unfazed
 from unfazed.lifespan import BaseLifeSpan
 
 from unfazed_taskiq.agent.handler import agents
+from unfazed_taskiq.drain import DrainReport
 
 
 class TaskiqLifeSpan(BaseLifeSpan):
@@ -9,9 +12,12 @@ class TaskiqLifeSpan(BaseLifeSpan):
         self.unfazed = unfazed
         agents.setup()
         self.agents = agents
+        self.drain_report: Optional[DrainReport] = None
 
     async def on_startup(self) -> None:
         await self.agents.startup()
 
     async def on_shutdown(self) -> None:
+        # tasks run by this process finish or are requeued before the brokers close
+        self.drain_report = await self.agents.drain()
         await self.agents.shutdown()
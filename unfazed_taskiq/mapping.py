@@ -0,0 +1,222 @@
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+from weakref import WeakKeyDictionary
+
+from taskiq import AsyncBroker, Context, TaskiqDepends, TaskiqMessage
+from taskiq.abc.middleware import TaskiqMiddleware
+from taskiq.kicker import AsyncKicker
+from taskiq.receiver import Receiver
+from taskiq.result_backends.dummy import DummyResultBackend
+from taskiq.utils import maybe_awaitable
+
+from unfazed_taskiq.drain import DELAY_LABEL, deferrable
+from unfazed_taskiq.task import UnfazedTaskiqTask
+
+MAP_TASK_NAME = "unfazed_taskiq.map_chunk"
+MAP_TASK_LABEL = "map_task"
+# set on a chunk failing with the error of an item, with the id of the item
+MAP_FAILED_ITEM_LABEL = "map_failed_item"
+# labels of the mapped task used to deliver its chunks, the others apply to items
+DELIVERY_LABELS = ("priority", DELAY_LABEL)
+
+# receivers running the items of map chunks, by broker
+item_receivers: "WeakKeyDictionary[AsyncBroker, Receiver]" = WeakKeyDictionary()
+
+
+def item_receiver(broker: AsyncBroker) -> Receiver:
+    receiver = item_receivers.get(broker)
+    if receiver is None:
+        # run_task doesn't use the semaphore, a limit only skips its warning
+        receiver = Receiver(broker, run_startup=False, max_async_tasks=1)
+        item_receivers[broker] = receiver
+    return receiver
+
+
+async def run_map_chunk(
+    task_name: str,
+    items: List[Any],
+    kwargs: Dict[str, Any],
+    context: Context = TaskiqDepends(),  # noqa: B008
+) -> List[Any]:
+    """
+    Run task_name with each item of a chunk, in order.
+
+    Items go through `Receiver.run_task` like messages do, so their
+    arguments are parsed and dependencies injected. Each item is a message
+    of the mapped task, with its labels, and runs the `pre_execute`,
+    `on_error` and `post_execute` hooks of the middlewares: rate limits,
+    concurrency caps and metrics apply per item. Items wait in place when
+    limited, a deferral would run the whole chunk again.
+    """
+    task = context.broker.find_task(task_name)
+    if task is None:
+        raise ValueError(f"Task {task_name} is not registered on this worker")
+    receiver = item_receiver(context.broker)
+    middlewares = context.broker.middlewares
+    values = []
+    token = deferrable.set(False)
+    try:
+        for item in items:
+            message = TaskiqMessage(
+                task_id=context.broker.id_generator(),
+                task_name=task_name,
+                labels=dict(task.labels),
+                args=[item],
+                kwargs=dict(kwargs),
+            )
+            for middleware in middlewares:
+                if middleware.__class__.pre_execute != TaskiqMiddleware.pre_execute:
+                    message = await maybe_awaitable(middleware.pre_execute(message))
+            result = await receiver.run_task(task.original_func, message)
+            for middleware in middlewares:
+                if middleware.__class__.post_execute != TaskiqMiddleware.post_execute:
+                    await maybe_awaitable(middleware.post_execute(message, result))
+            if result.is_err:
+                # on_error already saw the item, the chunk fails with its error
+                context.message.labels[MAP_FAILED_ITEM_LABEL] = message.task_id
+                result.raise_for_error()
+            values.append(result.return_value)
+    finally:
+        deferrable.reset(token)
+    return values
+
+
+def register_map_task(broker: AsyncBroker) -> None:
+    """Register the task running map chunks, done by agent setup."""
+    if broker.find_task(MAP_TASK_NAME) is None:
+        broker.register_task(run_map_chunk, task_name=MAP_TASK_NAME)
+
+
+async def aiter_source(
+    source: Union[AsyncIterable[Any], Iterable[Any]],
+) -> AsyncIterator[Any]:
+    if isinstance(source, AsyncIterable):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+
+class TaskMap:
+    """
+    Apply a task to every item of a possibly huge iterable.
+
+    The source is consumed lazily and packed into messages of `chunk_size`
+    items, the worker calls the task once per item. When `max_in_flight`
+    chunks are outstanding, sending waits for the oldest one to finish, so
+    memory and queue depth stay bounded whatever the source size. Waiting
+    for chunks needs a result backend.
+
+    `await task.map(...).kiq()` sends every chunk and returns their count,
+    `async for value in task.map(...)` also yields the result of each item,
+    in source order. A failed chunk raises its error.
+
+    :param task: task to apply, it takes the item as first argument.
+    :param source: iterable or async iterable of items.
+    :param chunk_size: number of items per message.
+    :param max_in_flight: maximum number of unfinished chunks, None for no
+        limit.
+    :param poll_interval: seconds between two checks of a chunk, without
+        result notifications.
+    :param kwargs: keyword arguments passed with every item.
+    """
+
+    def __init__(
+        self,
+        task: Any,
+        source: Union[AsyncIterable[Any], Iterable[Any]],
+        chunk_size: int = 100,
+        max_in_flight: Optional[int] = None,
+        poll_interval: float = 0.2,
+        **kwargs: Any,
+    ) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be greater than 0")
+        if max_in_flight is not None and max_in_flight <= 0:
+            raise ValueError("max_in_flight must be greater than 0")
+        self.task_name: str = task.task_name
+        self.broker: AsyncBroker = task.broker
+        self.labels: Dict[str, Any] = {
+            **{
+                name: task.labels[name]
+                for name in DELIVERY_LABELS
+                if name in task.labels
+            },
+            MAP_TASK_LABEL: task.task_name,
+        }
+        self.source = source
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.kwargs = kwargs
+        self.sent = 0
+
+    async def chunks(self) -> AsyncIterator[List[Any]]:
+        chunk: List[Any] = []
+        async for item in aiter_source(self.source):
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def send(self, chunk: List[Any]) -> UnfazedTaskiqTask:
+        kicker: AsyncKicker[Any, Any] = AsyncKicker(
+            task_name=MAP_TASK_NAME, broker=self.broker, labels=self.labels
+        )
+        task = await kicker.kiq(self.task_name, chunk, self.kwargs)
+        self.sent += 1
+        return UnfazedTaskiqTask(task.task_id, task.result_backend)
+
+    async def wait(self, task: UnfazedTaskiqTask) -> List[Any]:
+        result = await task.wait_result(check_interval=self.poll_interval)
+        result.raise_for_error()
+        return result.return_value
+
+    def check_result_backend(self) -> None:
+        if isinstance(self.broker.result_backend, DummyResultBackend):
+            raise ValueError(
+                "Waiting for map chunks needs a result backend, "
+                "set RESULT or leave max_in_flight unset"
+            )
+
+    async def run(self, collect: bool) -> AsyncIterator[List[Any]]:
+        """Send every chunk, yielding the results of finished ones if collect."""
+        register_map_task(self.broker)
+        if collect or self.max_in_flight is not None:
+            self.check_result_backend()
+        in_flight: Deque[UnfazedTaskiqTask] = deque()
+        async for chunk in self.chunks():
+            if self.max_in_flight is not None and len(in_flight) >= self.max_in_flight:
+                values = await self.wait(in_flight.popleft())
+                if collect:
+                    yield values
+            task = await self.send(chunk)
+            if collect or self.max_in_flight is not None:
+                in_flight.append(task)
+        if collect:
+            while in_flight:
+                yield await self.wait(in_flight.popleft())
+
+    async def kiq(self) -> int:
+        """Send every chunk, return the number of chunks sent."""
+        async for _ in self.run(collect=False):
+            pass
+        return self.sent
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        async for values in self.run(collect=True):
+            for value in values:
+                yield value
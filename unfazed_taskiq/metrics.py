@@ -0,0 +1,258 @@
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+)
+DEFAULT_DURATION_BUCKETS = DEFAULT_LATENCY_BUCKETS
+
+
+class Histogram:
+    """
+    Pre-aggregated histogram, `observe` is a bisect and two additions.
+
+    Counts are kept per bucket and only made cumulative when rendered.
+    """
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+
+class TaskMetrics:
+    __slots__ = ("latency", "duration", "succeeded", "failed", "in_flight")
+
+    def __init__(
+        self, latency_buckets: Sequence[float], duration_buckets: Sequence[float]
+    ) -> None:
+        self.latency = Histogram(latency_buckets)
+        self.duration = Histogram(duration_buckets)
+        self.succeeded = 0
+        self.failed = 0
+        self.in_flight = 0
+
+
+class PoolMetrics:
+    """
+    Metrics of a named thread pool.
+
+    Updated from the pool threads, under the lock of the pool.
+    """
+
+    __slots__ = (
+        "max_workers",
+        "queue_wait",
+        "submitted",
+        "completed",
+        "active",
+        "queued",
+        "busy_seconds",
+    )
+
+    def __init__(self, max_workers: int, buckets: Sequence[float]) -> None:
+        self.max_workers = max_workers
+        self.queue_wait = Histogram(buckets)
+        self.submitted = 0
+        self.completed = 0
+        self.active = 0
+        self.queued = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def utilization(self) -> float:
+        """Share of the threads currently running a call."""
+        return self.active / self.max_workers
+
+
+class MetricsRegistry:
+    """
+    Task metrics keyed by alias and task name, and thread pool metrics.
+
+    Metrics are only updated from the event loop of the worker, so plain
+    integers are enough and no lock is taken on the hot path.
+    """
+
+    def __init__(
+        self,
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        duration_buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+    ) -> None:
+        self.latency_buckets = latency_buckets
+        self.duration_buckets = duration_buckets
+        self.tasks: Dict[Tuple[str, str], TaskMetrics] = {}
+        self.pools: Dict[str, PoolMetrics] = {}
+
+    def get(self, alias_name: str, task_name: str) -> TaskMetrics:
+        key = (alias_name, task_name)
+        metrics = self.tasks.get(key)
+        if metrics is None:
+            metrics = self.tasks[key] = TaskMetrics(
+                self.latency_buckets, self.duration_buckets
+            )
+        return metrics
+
+    def pool(self, name: str, max_workers: int) -> PoolMetrics:
+        metrics = self.pools.get(name)
+        if metrics is None or metrics.max_workers != max_workers:
+            metrics = self.pools[name] = PoolMetrics(max_workers, self.latency_buckets)
+        return metrics
+
+    def clear(self) -> None:
+        self.tasks.clear()
+        self.pools.clear()
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        items = sorted(self.tasks.items())
+
+        for name, attr, doc in (
+            (
+                "unfazed_taskiq_task_queue_latency_seconds",
+                "latency",
+                "Time between enqueue and start of execution.",
+            ),
+            (
+                "unfazed_taskiq_task_duration_seconds",
+                "duration",
+                "Task execution time.",
+            ),
+        ):
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} histogram"]
+            for key, metrics in items:
+                histogram: Histogram = getattr(metrics, attr)
+                labels = _labels(key)
+                for bound, total in histogram.cumulative():
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        for name, attr, kind, doc in (
+            (
+                "unfazed_taskiq_task_succeeded_total",
+                "succeeded",
+                "counter",
+                "Tasks finished without error.",
+            ),
+            (
+                "unfazed_taskiq_task_failed_total",
+                "failed",
+                "counter",
+                "Tasks finished with an error.",
+            ),
+            (
+                "unfazed_taskiq_task_in_flight",
+                "in_flight",
+                "gauge",
+                "Tasks currently executing.",
+            ),
+        ):
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+            for key, metrics in items:
+                lines.append(f"{name}{{{_labels(key)}}} {getattr(metrics, attr)}")
+
+        if self.pools:
+            lines += self.render_pools()
+
+        return "\n".join(lines) + "\n"
+
+    def render_pools(self) -> List[str]:
+        lines: List[str] = []
+        pools = sorted(self.pools.items())
+
+        name = "unfazed_taskiq_thread_pool_queue_wait_seconds"
+        lines += [
+            f"# HELP {name} Time a call waited for a free thread.",
+            f"# TYPE {name} histogram",
+        ]
+        for pool_name, metrics in pools:
+            labels = f'pool="{_escape(pool_name)}"'
+            for bound, total in metrics.queue_wait.cumulative():
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {total}')
+            lines.append(f"{name}_sum{{{labels}}} {metrics.queue_wait.sum!r}")
+            lines.append(f"{name}_count{{{labels}}} {metrics.queue_wait.count}")
+
+        for name, attr, kind, doc in (
+            (
+                "unfazed_taskiq_thread_pool_max_workers",
+                "max_workers",
+                "gauge",
+                "Threads of the pool.",
+            ),
+            (
+                "unfazed_taskiq_thread_pool_active",
+                "active",
+                "gauge",
+                "Calls currently running.",
+            ),
+            (
+                "unfazed_taskiq_thread_pool_queued",
+                "queued",
+                "gauge",
+                "Calls waiting for a free thread.",
+            ),
+            (
+                "unfazed_taskiq_thread_pool_completed_total",
+                "completed",
+                "counter",
+                "Calls finished.",
+            ),
+            (
+                "unfazed_taskiq_thread_pool_busy_seconds_total",
+                "busy_seconds",
+                "counter",
+                "Time spent running calls, divide its rate by max_workers "
+                "for the utilization.",
+            ),
+        ):
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+            for pool_name, metrics in pools:
+                value = getattr(metrics, attr)
+                lines.append(f'{name}{{pool="{_escape(pool_name)}"}} {value!r}')
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: Tuple[str, str]) -> str:
+    alias_name, task_name = key
+    return f'alias="{_escape(alias_name)}",task="{_escape(task_name)}"'
+
+
+registry = MetricsRegistry()
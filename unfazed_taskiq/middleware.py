@@ -1,19 +1,132 @@
+import asyncio
+import inspect
+import random
+import signal
+import time
 import traceback
-from typing import Any
+import uuid
+from contextvars import ContextVar, Token
+from types import CodeType
+from typing import Any, Coroutine, Dict, List, NoReturn, Optional, Tuple, Union
 
+import orjson as json
 from taskiq import TaskiqMessage, TaskiqResult
 from taskiq.abc.middleware import TaskiqMiddleware
+from unfazed.utils import import_string
 from unfazed_sentry import capture_exception
 
+from unfazed_taskiq.blobstore import Blob, BlobStore
+from unfazed_taskiq.drain import Defer, deferrable
 from unfazed_taskiq.logger import log
+from unfazed_taskiq.mapping import MAP_FAILED_ITEM_LABEL
+from unfazed_taskiq.metrics import MetricsRegistry
+from unfazed_taskiq.metrics import registry as metrics_registry
+from unfazed_taskiq.profiling import SamplingProfiler
+from unfazed_taskiq.ratelimit import TokenBucket, parse_rate
+from unfazed_taskiq.reporting import ErrorGroup, ErrorReporter
+from unfazed_taskiq.store import AsyncSharedStore, InMemorySharedStore
+from unfazed_taskiq.tracing import (
+    Span,
+    SpanContext,
+    SpanExporter,
+    Tracer,
+    current_span,
+    new_span_id,
+)
+from unfazed_taskiq.tracing import tracer as default_tracer
+from unfazed_taskiq.workflow import (
+    CHAIN_LABEL,
+    CHORD_LABEL,
+    WORKFLOW_KEY_PREFIX,
+    Signature,
+)
+
+RATE_LIMIT_KEY_PREFIX = "unfazed_taskiq:ratelimit"
+CONCURRENCY_KEY_PREFIX = "unfazed_taskiq:concurrency"
+RATE_LIMIT_READY_LABEL = "rate_limit_ready_at"
+CONCURRENCY_DEFERRED_LABEL = "concurrency_deferred_at"
+CONCURRENCY_ATTEMPTS_LABEL = "concurrency_attempts"
+CLAIM_CHECK_KEY_PREFIX = "unfazed_taskiq/claimcheck"
+
+# task id, task span and start of the result span of the message being saved
+saving: ContextVar[Optional[Tuple[str, SpanContext, int]]] = ContextVar(
+    "unfazed_taskiq_saving", default=None
+)
+
+
+class UnfazedTaskiqMiddleware(TaskiqMiddleware):
+    """
+    Middleware bound to an agent.
+
+    The agent calls `with_store` with its shared store and alias name on setup.
+    `UnfazedReceiver` sets `worker_processes` to the number of processes the
+    worker may run at once, it stays None when unknown.
+    """
+
+    alias_name: str = ""
+    store: Optional[AsyncSharedStore] = None
+    worker_processes: Optional[int] = None
+
+    def with_store(self, store: AsyncSharedStore, alias_name: str = "") -> None:
+        self.store = store
+        self.alias_name = alias_name
+
+    def release(
+        self, message: "TaskiqMessage"
+    ) -> Union[None, Coroutine[Any, Any, None]]:
+        """
+        Undo `pre_execute` for a message that won't run, e.g. deferred.
+
+        `UnfazedReceiver` calls it on every middleware in reverse order,
+        including those whose `pre_execute` didn't run for the message,
+        which must ignore it.
+        """
 
 
 class UnfazedTaskiqExceptionMiddleware(TaskiqMiddleware):
+    """
+    Report task errors to sentry and the log.
+
+    Errors are handed to a background `ErrorReporter` so a burst of
+    failures doesn't slow the worker down: identical errors are grouped by
+    fingerprint, sampled past `sample_threshold` per `flush_interval` and
+    summarized with their count. Events are shed when the queue is full.
+    A map chunk failing with the error of an item is not reported again.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = 1000,
+        flush_interval: float = 5,
+        sample_threshold: int = 10,
+        sample_every: int = 100,
+    ) -> None:
+        super().__init__()
+        self.reporter = ErrorReporter(
+            self.report,
+            self.summarize,
+            max_queue_size=max_queue_size,
+            flush_interval=flush_interval,
+            sample_threshold=sample_threshold,
+            sample_every=sample_every,
+        )
+
     async def on_error(
         self,
         message: "TaskiqMessage",
         result: "TaskiqResult[Any]",
         exception: BaseException,
+    ) -> None:
+        if MAP_FAILED_ITEM_LABEL in message.labels:
+            return
+        self.reporter.submit(message.task_name, exception, message, result)
+
+    def report(
+        self,
+        group: ErrorGroup,
+        exception: BaseException,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
     ) -> None:
         capture_exception(exception, result=result, message=message)
         exception_type = type(exception).__name__
@@ -26,6 +139,953 @@ class UnfazedTaskiqExceptionMiddleware(TaskiqMiddleware):
                 "task_kwargs": message.kwargs,
                 "exception_type": exception_type,
                 "exception": str(exception),
-                "traceback": traceback.format_exc(),
+                "fingerprint": group.fingerprint,
+                "traceback": "".join(traceback.format_exception(exception)),
             },
         )
+
+    def summarize(self, group: ErrorGroup, unreported: int) -> None:
+        log.error(
+            f"Task '{group.task_name}' failed {group.count} times with "
+            f"{group.exception_type}: {group.exception}",
+            extra={
+                "task_name": group.task_name,
+                "exception_type": group.exception_type,
+                "exception": group.exception,
+                "fingerprint": group.fingerprint,
+                "count": group.count,
+                "unreported": unreported,
+            },
+        )
+
+    async def flush(self) -> None:
+        await self.reporter.flush()
+
+    async def shutdown(self) -> None:
+        await self.reporter.close()
+
+
+class UnfazedTaskiqRateLimitMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Throttle task execution with token buckets.
+
+    Limits are looked up by the `rate_limit_group` label, falling back to the
+    task name, in `limits`. A task can also set its own limit with the
+    `rate_limit` label, e.g. `@task(rate_limit="10/s")`.
+
+    Over-limit messages are deferred until their reserved token is available
+    instead of being retried. Up to `max_delay` seconds they wait in place,
+    longer delays free the execution slot: the message goes back to the
+    broker with its reservation in the `rate_limit_ready_at` label. That
+    needs `UnfazedReceiver`, with other receivers messages always wait in
+    place. With `shared` enabled, buckets live in the agent's shared store
+    and apply to every worker of the alias.
+
+    :param limits: rates keyed by task name or rate limit group.
+    :param shared: use the shared store instead of process-local buckets.
+    :param max_delay: longest delay waited while holding an execution slot.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Union[str, float]]] = None,
+        shared: bool = False,
+        max_delay: float = 1.0,
+    ) -> None:
+        super().__init__()
+        self.limits = {name: parse_rate(rate) for name, rate in (limits or {}).items()}
+        self.shared = shared
+        self.max_delay = max_delay
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.deferred = 0
+
+    def get_limit(self, message: "TaskiqMessage") -> Optional[Tuple[str, float, float]]:
+        name = message.labels.get("rate_limit_group") or message.task_name
+        rate = message.labels.get("rate_limit")
+        if rate is not None:
+            return name, *parse_rate(rate)
+        if name in self.limits:
+            return name, *self.limits[name]
+        return None
+
+    async def reserve(self, name: str, rate: float, capacity: float) -> float:
+        if self.shared and self.store is not None:
+            return await self.store.reserve_token(
+                f"{RATE_LIMIT_KEY_PREFIX}:{name}", rate, capacity
+            )
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            bucket = self.buckets[name] = TokenBucket(rate, capacity)
+        return bucket.reserve()
+
+    async def pre_execute(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        limit = self.get_limit(message)
+        if limit is None:
+            return message
+
+        ready_at = message.labels.pop(RATE_LIMIT_READY_LABEL, None)
+        if ready_at is not None:
+            # deferred before, its token is already reserved
+            delay = float(ready_at) - time.time()
+        else:
+            delay = await self.reserve(*limit)
+        if delay <= 0:
+            return message
+
+        self.deferred += 1
+        log.info(
+            f"Task '{message.task_name}' is rate limited, deferring {delay:.3f}s",
+            extra={"task_name": message.task_name, "task_id": message.task_id},
+        )
+        if delay > self.max_delay and deferrable.get():
+            raise Defer(delay, {RATE_LIMIT_READY_LABEL: time.time() + delay})
+        await asyncio.sleep(delay)
+        return message
+
+
+class UnfazedTaskiqConcurrencyMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Cap concurrent executions of a task per worker and across the alias.
+
+    Limits are looked up by the `concurrency_group` label, falling back to the
+    task name, in `limits` (per worker) and `cluster_limits` (every worker of
+    the alias). Tasks can set their own caps with the `max_concurrency` and
+    `max_cluster_concurrency` labels.
+
+    Cluster slots are leases in the shared store, one key per slot held by
+    the task id, each expiring `lease_ttl` seconds after it was taken.
+    They need a store shared by the workers: cluster caps are refused on
+    startup and on send when the store is process-local.
+
+    Excess messages don't hold an execution slot while they wait: they go
+    back to the broker and are tried again after `poll_interval` seconds,
+    doubled on every further deferral up to `max_poll_interval`, with
+    jitter, so unrelated tasks keep running. That needs `UnfazedReceiver`,
+    with other receivers excess messages wait in place. The time spent
+    waiting is stored in the `concurrency_wait` label and aggregated by
+    `stats()`.
+
+    :param limits: per worker caps keyed by task name or concurrency group.
+    :param cluster_limits: cluster-wide caps keyed by task name or group.
+    :param lease_ttl: seconds after which cluster slots of a crashed worker
+        are reclaimed, must exceed the longest execution.
+    :param poll_interval: seconds before a message that found no free slot
+        is tried again.
+    :param max_poll_interval: upper bound of the backoff of a message
+        deferred again and again.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, int]] = None,
+        cluster_limits: Optional[Dict[str, int]] = None,
+        lease_ttl: float = 300,
+        poll_interval: float = 0.5,
+        max_poll_interval: float = 30,
+    ) -> None:
+        super().__init__()
+        self.limits = limits or {}
+        self.cluster_limits = cluster_limits or {}
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(max_poll_interval, poll_interval)
+        self.local_store = InMemorySharedStore()
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.acquired: Dict[
+            str, Tuple[str, Optional[asyncio.Semaphore], Optional[str]]
+        ] = {}
+        self.waiting: Dict[str, int] = {}
+        self.deferred: Dict[str, int] = {}
+        self.waits: Dict[str, Dict[str, float]] = {}
+
+    @property
+    def cluster_store(self) -> AsyncSharedStore:
+        return self.store or self.local_store
+
+    def check_cluster_store(self) -> None:
+        if self.cluster_store.process_local:
+            raise ValueError(
+                f"Cluster concurrency caps need a store shared by the workers, "
+                f"{type(self.cluster_store).__name__} is local to this process: "
+                "configure a shared STORE"
+            )
+
+    def startup(self) -> None:
+        if self.cluster_limits or any(
+            "max_cluster_concurrency" in task.labels
+            for task in self.broker.get_all_tasks().values()
+        ):
+            self.check_cluster_store()
+
+    def pre_send(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        if "max_cluster_concurrency" in message.labels:
+            self.check_cluster_store()
+        return message
+
+    def get_limits(
+        self, message: "TaskiqMessage"
+    ) -> Tuple[str, Optional[int], Optional[int]]:
+        name = message.labels.get("concurrency_group") or message.task_name
+        local = message.labels.get("max_concurrency", self.limits.get(name))
+        cluster = message.labels.get(
+            "max_cluster_concurrency", self.cluster_limits.get(name)
+        )
+        return (
+            name,
+            None if local is None else int(local),
+            None if cluster is None else int(cluster),
+        )
+
+    async def acquire_cluster_slot(
+        self, name: str, limit: int, holder: str
+    ) -> Optional[str]:
+        """:return: key of the lease taken by holder, None if all are taken."""
+        # start at a random slot, workers would all race for the first one
+        offset = random.randrange(limit)
+        for index in range(limit):
+            key = f"{CONCURRENCY_KEY_PREFIX}:{name}:{(offset + index) % limit}"
+            existing = await self.cluster_store.get_or_set(key, holder, self.lease_ttl)
+            # a redelivered message finds the lease of its previous attempt
+            if existing is None or existing == holder:
+                return key
+        return None
+
+    async def wait_cluster_slot(self, name: str, limit: int, holder: str) -> str:
+        delay = min(0.01, self.poll_interval)
+        while True:
+            key = await self.acquire_cluster_slot(name, limit, holder)
+            if key is not None:
+                return key
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_interval)
+
+    def defer(self, message: "TaskiqMessage", name: str) -> NoReturn:
+        self.deferred[name] = self.deferred.get(name, 0) + 1
+        deferred_at = message.labels.get(CONCURRENCY_DEFERRED_LABEL) or time.time()
+        attempts = int(message.labels.get(CONCURRENCY_ATTEMPTS_LABEL, 0))
+        delay = min(self.poll_interval * 2 ** min(attempts, 32), self.max_poll_interval)
+        # jitter spreads the retries of messages deferred together
+        raise Defer(
+            random.uniform(delay / 2, delay),
+            {
+                CONCURRENCY_DEFERRED_LABEL: deferred_at,
+                CONCURRENCY_ATTEMPTS_LABEL: attempts + 1,
+            },
+        )
+
+    def record_wait(self, name: str, wait: float) -> None:
+        stats = self.waits.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["total"] += wait
+        stats["max"] = max(stats["max"], wait)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Queue wait of capped tasks, keyed by task name or group."""
+        return {
+            name: {
+                "waiting": self.waiting.get(name, 0),
+                "deferred": self.deferred.get(name, 0),
+                "wait_count": stats["count"],
+                "wait_avg": stats["total"] / stats["count"],
+                "wait_max": stats["max"],
+            }
+            for name, stats in self.waits.items()
+        }
+
+    async def pre_execute(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        name, local, cluster = self.get_limits(message)
+        if local is None and cluster is None:
+            return message
+
+        started_at = time.monotonic()
+        can_defer = deferrable.get()
+        semaphore = None
+        lease = None
+        self.waiting[name] = self.waiting.get(name, 0) + 1
+        try:
+            if local is not None:
+                semaphore = self.semaphores.get(name)
+                if semaphore is None:
+                    semaphore = self.semaphores[name] = asyncio.Semaphore(local)
+                if can_defer and semaphore.locked():
+                    self.defer(message, name)
+                await semaphore.acquire()
+            if cluster is not None:
+                try:
+                    if can_defer:
+                        lease = await self.acquire_cluster_slot(
+                            name, cluster, message.task_id
+                        )
+                        if lease is None:
+                            self.defer(message, name)
+                    else:
+                        lease = await self.wait_cluster_slot(
+                            name, cluster, message.task_id
+                        )
+                except BaseException:
+                    if semaphore is not None:
+                        semaphore.release()
+                    raise
+        finally:
+            self.waiting[name] -= 1
+
+        deferred_at = message.labels.pop(CONCURRENCY_DEFERRED_LABEL, None)
+        message.labels.pop(CONCURRENCY_ATTEMPTS_LABEL, None)
+        if deferred_at is not None:
+            wait = max(time.time() - float(deferred_at), 0.0)
+        else:
+            wait = time.monotonic() - started_at
+        self.record_wait(name, wait)
+        message.labels["concurrency_wait"] = round(wait, 6)
+        self.acquired[message.task_id] = (name, semaphore, lease)
+        return message
+
+    async def post_execute(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        await self.release(message)
+
+    async def release(self, message: "TaskiqMessage") -> None:
+        acquired = self.acquired.pop(message.task_id, None)
+        if acquired is None:
+            return
+        _, semaphore, lease = acquired
+        if semaphore is not None:
+            semaphore.release()
+        if lease is not None:
+            await self.cluster_store.delete(lease)
+
+
+class UnfazedTaskiqMetricsMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Record per task and alias metrics.
+
+    Collects enqueue to start latency, execution duration histograms,
+    success and error counts and in-flight gauges into a `MetricsRegistry`.
+    Latency needs this middleware on the sending side too, it stamps
+    the `enqueued_at` label.
+
+    Hooks are synchronous and only touch pre-aggregated counters, serve
+    them with `unfazed_taskiq.contrib.metrics`.
+
+    :param registry: registry to record into, defaults to the global one.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None) -> None:
+        super().__init__()
+        self.registry = metrics_registry if registry is None else registry
+        self.started: Dict[str, float] = {}
+
+    def pre_send(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        message.labels["enqueued_at"] = time.time()
+        return message
+
+    def pre_execute(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        metrics = self.registry.get(self.alias_name, message.task_name)
+        enqueued_at = message.labels.get("enqueued_at")
+        if enqueued_at is not None:
+            metrics.latency.observe(max(time.time() - float(enqueued_at), 0.0))
+        metrics.in_flight += 1
+        self.started[message.task_id] = time.perf_counter()
+        return message
+
+    def post_execute(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        started_at = self.started.pop(message.task_id, None)
+        metrics = self.registry.get(self.alias_name, message.task_name)
+        if started_at is not None:
+            metrics.in_flight -= 1
+            metrics.duration.observe(time.perf_counter() - started_at)
+        if result.is_err:
+            metrics.failed += 1
+        else:
+            metrics.succeeded += 1
+
+    def release(self, message: "TaskiqMessage") -> None:
+        if self.started.pop(message.task_id, None) is not None:
+            self.registry.get(self.alias_name, message.task_name).in_flight -= 1
+
+
+class UnfazedTaskiqTracingMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Propagate trace context from `kiq` to the worker and record spans.
+
+    The sender stores the trace id, the task span id and the sampling
+    decision in the message labels. The worker records the task span with
+    its queue, execute and result children, and makes the execute span
+    current so tasks sent by the task join the trace.
+
+    Sampling is decided once, when a trace starts, unsampled messages only
+    carry their ids.
+
+    Each middleware records to its own tracer. The agents `install` one of
+    them, preferably the default alias's, as the global `tracer` on setup.
+
+    :param exporter: span exporter or its import path, nothing is recorded
+        without one.
+    :param exporter_options: keyword arguments for the exporter class.
+    :param sample_rate: fraction of traces to record.
+    :param batch_size: number of spans buffered before exporting.
+    :param tracer: tracer to configure, defaults to a new one.
+    """
+
+    def __init__(
+        self,
+        exporter: Union[str, SpanExporter, None] = None,
+        exporter_options: Optional[Dict[str, Any]] = None,
+        sample_rate: float = 1.0,
+        batch_size: int = 64,
+        tracer: Optional[Tracer] = None,
+    ) -> None:
+        super().__init__()
+        resolved: Optional[SpanExporter]
+        if isinstance(exporter, str):
+            resolved = import_string(exporter)(**(exporter_options or {}))
+        else:
+            resolved = exporter
+        self.tracer = Tracer() if tracer is None else tracer
+        self.tracer.configure(resolved, sample_rate, batch_size)
+        self.executions: Dict[
+            str, Tuple[SpanContext, SpanContext, int, Token[Optional[SpanContext]]]
+        ] = {}
+
+    def install(self) -> None:
+        """Configure the global `tracer` like this one and record to it."""
+        default_tracer.configure(
+            self.tracer.exporter, self.tracer.sample_rate, self.tracer.batch_size
+        )
+        self.tracer = default_tracer
+
+    def pre_send(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        parent = current_span.get()
+        context = self.tracer.child_context(parent)
+        message.labels["trace_id"] = context.trace_id
+        message.labels["span_id"] = context.span_id
+        message.labels["trace_sampled"] = int(context.sampled)
+        if context.sampled:
+            message.labels["sent_at_ns"] = time.time_ns()
+            if parent is not None:
+                message.labels["parent_span_id"] = parent.span_id
+        return message
+
+    def pre_execute(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        trace_id = message.labels.get("trace_id")
+        if trace_id is None:
+            return message
+        task = SpanContext(
+            trace_id,
+            message.labels["span_id"],
+            bool(int(message.labels.get("trace_sampled", 0))),
+        )
+        execution = SpanContext(
+            trace_id, new_span_id() if task.sampled else task.span_id, task.sampled
+        )
+        token = current_span.set(execution)
+        self.executions[message.task_id] = (task, execution, time.time_ns(), token)
+        return message
+
+    def post_execute(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        execution_info = self.executions.pop(message.task_id, None)
+        if execution_info is None:
+            return
+        task, execution, started_ns, token = execution_info
+        self.reset(token)
+        if not task.sampled:
+            return
+
+        finished_ns = time.time_ns()
+        sent_ns = int(message.labels.get("sent_at_ns", started_ns))
+        attributes = {"task_name": message.task_name, "task_id": message.task_id}
+        self.tracer.record(
+            Span(
+                f"task {message.task_name}",
+                task.trace_id,
+                task.span_id,
+                message.labels.get("parent_span_id"),
+                sent_ns,
+                finished_ns,
+                {**attributes, "alias_name": self.alias_name, "error": result.is_err},
+            )
+        )
+        self.tracer.record(
+            Span(
+                f"queue {message.task_name}",
+                task.trace_id,
+                new_span_id(),
+                task.span_id,
+                sent_ns,
+                started_ns,
+                attributes,
+            )
+        )
+        self.tracer.record(
+            Span(
+                f"execute {message.task_name}",
+                task.trace_id,
+                execution.span_id,
+                task.span_id,
+                started_ns,
+                finished_ns,
+                attributes,
+            )
+        )
+        # saved by the same callback, the context ends with the message even
+        # when post_save doesn't run
+        saving.set((message.task_id, task, time.time_ns()))
+
+    def release(self, message: "TaskiqMessage") -> None:
+        execution_info = self.executions.pop(message.task_id, None)
+        if execution_info is not None:
+            self.reset(execution_info[3])
+
+    def reset(self, token: Token[Optional[SpanContext]]) -> None:
+        try:
+            current_span.reset(token)
+        except ValueError:  # set in another context
+            pass
+
+    def post_save(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        pending = saving.get()
+        if pending is None or pending[0] != message.task_id:
+            return
+        saving.set(None)
+        _, task, started_ns = pending
+        self.tracer.record(
+            Span(
+                f"result {message.task_name}",
+                task.trace_id,
+                new_span_id(),
+                task.span_id,
+                started_ns,
+                time.time_ns(),
+                {"task_name": message.task_name, "task_id": message.task_id},
+            )
+        )
+
+    def shutdown(self) -> None:
+        self.tracer.shutdown()
+
+
+class UnfazedTaskiqProfilingMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Profile selected task executions with a sampling profiler.
+
+    An execution is profiled when its task name is in `tasks`, when its
+    `label` label is truthy, e.g. `kicker().with_labels(profile=True)`, or
+    for a `sample_rate` fraction of the messages. Stacks are aggregated per
+    task into `<output_dir>/<task_name>.folded` files.
+
+    Profiling can be switched at runtime with `enable`, `disable` and
+    `toggle`, or by sending `toggle_signal`, e.g. `SIGUSR2`, to the worker.
+
+    :param tasks: names of the tasks to profile.
+    :param label: label that requests profiling of a message.
+    :param sample_rate: fraction of all messages to profile.
+    :param enabled: whether profiling starts enabled.
+    :param interval: seconds between two samples.
+    :param output_dir: directory of the profile files.
+    :param flush_interval: seconds between two writes of the files.
+    :param toggle_signal: name of the signal toggling profiling.
+    """
+
+    def __init__(
+        self,
+        tasks: Optional[List[str]] = None,
+        label: str = "profile",
+        sample_rate: float = 0.0,
+        enabled: bool = True,
+        interval: float = 0.01,
+        output_dir: str = "profiles",
+        flush_interval: float = 10,
+        toggle_signal: Optional[str] = None,
+    ) -> None:
+        super().__init__()
+        self.tasks = set(tasks or [])
+        self.label = label
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self.toggle_signal = toggle_signal
+        self.profiler = SamplingProfiler(interval, output_dir, flush_interval)
+        self.codes: Dict[str, Optional[CodeType]] = {}
+        self.profiled: Dict[
+            str, Tuple[CodeType, Optional["asyncio.Task[Any]"], bool]
+        ] = {}
+
+    def enable(
+        self, tasks: Optional[List[str]] = None, sample_rate: Optional[float] = None
+    ) -> None:
+        if tasks is not None:
+            self.tasks = set(tasks)
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        self.enabled = True
+        log.info(f"Task profiling enabled, writing to {self.profiler.output_dir}")
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.profiler.write()
+        log.info("Task profiling disabled")
+
+    def toggle(self) -> None:
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def should_profile(self, message: "TaskiqMessage") -> bool:
+        if not self.enabled:
+            return False
+        if message.task_name in self.tasks or message.labels.get(self.label):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def startup(self) -> None:
+        if self.toggle_signal is None or not self.broker.is_worker_process:
+            return
+        try:
+            signal.signal(getattr(signal, self.toggle_signal), lambda *_: self.toggle())
+        except (AttributeError, ValueError) as exc:
+            log.warning(f"Cannot toggle profiling with {self.toggle_signal}: {exc}")
+
+    def task_code(self, task_name: str) -> Optional[CodeType]:
+        if task_name not in self.codes:
+            task = self.broker.find_task(task_name)
+            self.codes[task_name] = (
+                getattr(inspect.unwrap(task.original_func), "__code__", None)
+                if task
+                else None
+            )
+        return self.codes[task_name]
+
+    def pre_execute(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        if not self.enabled:
+            return message
+        code = self.task_code(message.task_name)
+        if code is None:
+            return message
+        if self.should_profile(message):
+            task = asyncio.current_task()
+            self.profiler.add_target(code, message.task_name, task)
+            self.profiled[message.task_id] = (code, task, True)
+        else:
+            # other executions of the task must not be sampled with this one
+            self.profiler.add_unselected(code)
+            self.profiled[message.task_id] = (code, None, False)
+        return message
+
+    def post_execute(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        self.release(message)
+
+    def release(self, message: "TaskiqMessage") -> None:
+        profiled = self.profiled.pop(message.task_id, None)
+        if profiled is None:
+            return
+        code, task, selected = profiled
+        if selected:
+            self.profiler.remove_target(code, task)
+        else:
+            self.profiler.remove_unselected(code)
+
+    def shutdown(self) -> None:
+        self.profiler.stop()
+
+
+class UnfazedTaskiqClaimCheckMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Offload large task arguments to a blob store.
+
+    On send, every argument of at least `threshold` bytes is written to the
+    blob store and replaced by None, the `claim_check` label records which
+    arguments were offloaded and how they were encoded. Bytes and strings
+    are stored as is, lists, tuples and dicts are serialized with the broker
+    serializer, once, to measure them. Other values always stay inline.
+
+    The worker loads the arguments right before the task runs, not when the
+    message is received, so prefetched messages stay small. Blobs are
+    deleted once the task ran, whether it failed or not: each send, such as
+    a retry, writes the blobs it needs under its own `claim_check_id`.
+    Blobs of messages that never ran to the end, e.g. lost with a crashed
+    worker, are deleted by the workers `blob_ttl` seconds after they were
+    stored, when set.
+    Every sender and worker of the alias needs this middleware.
+
+    Bytes arguments arrive as bytes. Tasks sent with the `claim_check_view`
+    label get the blob as returned by the store instead, e.g. a memoryview
+    of a memory map, which stays valid as long as the task holds it.
+
+    :param blob_store: blob store or its import path.
+    :param blob_store_options: keyword arguments for the blob store class.
+    :param threshold: minimum argument size to offload, in bytes.
+    :param blob_ttl: seconds after which leftover blobs are deleted, must
+        exceed the longest time a message may wait in the broker, retries
+        included. None keeps them.
+    """
+
+    def __init__(
+        self,
+        blob_store: Union[
+            str, BlobStore
+        ] = "unfazed_taskiq.blobstore.FileSystemBlobStore",
+        blob_store_options: Optional[Dict[str, Any]] = None,
+        threshold: int = 256 * 1024,
+        blob_ttl: Optional[float] = None,
+    ) -> None:
+        super().__init__()
+        resolved: BlobStore
+        if isinstance(blob_store, str):
+            resolved = import_string(blob_store)(**(blob_store_options or {}))
+        else:
+            resolved = blob_store
+        self.blob_store = resolved
+        self.threshold = threshold
+        self.blob_ttl = blob_ttl
+        self.offloaded = 0
+        self.sweeper: Optional["asyncio.Task[None]"] = None
+
+    def blob_key(self, message: "TaskiqMessage", slot: str) -> str:
+        return "/".join(
+            part
+            for part in (
+                CLAIM_CHECK_KEY_PREFIX,
+                self.alias_name,
+                message.task_id,
+                message.labels.get("claim_check_id"),
+                slot,
+            )
+            if part
+        )
+
+    def encode(self, value: Any) -> Optional[Tuple[str, bytes]]:
+        """Encoding and content of value, None if it stays inline."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if len(value) < self.threshold:
+                return None
+            return "b", bytes(value)
+        if isinstance(value, str):
+            # a character takes 1 to 4 bytes
+            if len(value) * 4 < self.threshold:
+                return None
+            data = value.encode()
+            kind = "s"
+        elif isinstance(value, (list, tuple, dict)):
+            data = self.broker.serializer.dumpb(value)
+            kind = "j"
+        else:
+            return None
+        if len(data) < self.threshold:
+            return None
+        return kind, data
+
+    def decode(self, kind: str, blob: Blob, view: bool = False) -> Any:
+        if kind == "b":
+            return blob if view else bytes(blob)
+        if kind == "s":
+            return bytes(blob).decode()
+        return self.broker.serializer.loadb(bytes(blob))
+
+    def slots(self, message: "TaskiqMessage") -> Dict[str, str]:
+        claim_check = message.labels.get("claim_check")
+        if not claim_check:
+            return {}
+        return json.loads(claim_check)
+
+    async def startup(self) -> None:
+        await self.blob_store.startup()
+        if self.blob_ttl is not None and self.broker.is_worker_process:
+            self.sweeper = asyncio.create_task(self.sweep(self.blob_ttl))
+
+    async def shutdown(self) -> None:
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            await asyncio.gather(self.sweeper, return_exceptions=True)
+            self.sweeper = None
+        await self.blob_store.shutdown()
+
+    async def sweep(self, blob_ttl: float) -> None:
+        """Delete leftover blobs every half blob_ttl."""
+        while True:
+            try:
+                deleted = await self.blob_store.cleanup(blob_ttl)
+            except NotImplementedError:
+                log.warning(
+                    f"{type(self.blob_store).__name__} can't delete old blobs, "
+                    "blob_ttl is ignored"
+                )
+                return
+            except Exception as exc:
+                log.warning(f"Failed to delete old blobs: {exc}")
+            else:
+                if deleted:
+                    log.info(f"Deleted {deleted} blobs older than {blob_ttl}s")
+            await asyncio.sleep(blob_ttl / 2)
+
+    async def pre_send(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        slots: Dict[str, str] = {}
+        # blobs of a previous send of the task id are deleted once it ran
+        message.labels["claim_check_id"] = uuid.uuid4().hex
+        for index, value in enumerate(message.args):
+            encoded = self.encode(value)
+            if encoded is not None:
+                kind, data = encoded
+                slot = f"a{index}"
+                await self.blob_store.put(self.blob_key(message, slot), data)
+                message.args[index] = None
+                slots[slot] = kind
+        for name, value in message.kwargs.items():
+            encoded = self.encode(value)
+            if encoded is not None:
+                kind, data = encoded
+                slot = f"k{name}"
+                await self.blob_store.put(self.blob_key(message, slot), data)
+                message.kwargs[name] = None
+                slots[slot] = kind
+
+        if slots:
+            message.labels["claim_check"] = json.dumps(slots).decode()
+            self.offloaded += len(slots)
+        else:
+            # a retried message carries the labels of its previous attempt
+            message.labels.pop("claim_check", None)
+            message.labels.pop("claim_check_id", None)
+        return message
+
+    async def pre_execute(self, message: "TaskiqMessage") -> "TaskiqMessage":
+        view = bool(message.labels.get("claim_check_view"))
+        for slot, kind in self.slots(message).items():
+            key = self.blob_key(message, slot)
+            try:
+                blob = await self.blob_store.get(key)
+            except KeyError:
+                raise ValueError(
+                    f"Argument {slot[1:]} of task {message.task_id} is missing "
+                    f"from the blob store at {key}"
+                ) from None
+            value = self.decode(kind, blob, view)
+            if slot[0] == "a":
+                message.args[int(slot[1:])] = value
+            else:
+                message.kwargs[slot[1:]] = value
+        return message
+
+    async def post_execute(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        for slot in self.slots(message):
+            try:
+                await self.blob_store.delete(self.blob_key(message, slot))
+            except Exception as exc:
+                log.warning(f"Failed to delete blob of task {message.task_id}: {exc}")
+
+
+class UnfazedTaskiqWorkflowMiddleware(UnfazedTaskiqMiddleware):
+    """
+    Send the continuations of chains and chords from the worker.
+
+    Once the result of a task is stored, the next step of its `chain` label
+    is sent with the result prepended to its arguments. Finished `chord`
+    header tasks are counted in the shared store, each at most once, and
+    the last one sends the callback with the list of the header results.
+    Needed on every worker of an alias running workflows.
+
+    Chords are only joined across worker processes when the store is shared
+    by them: a process-local store, such as the default `InMemorySharedStore`,
+    is refused on startup unless the worker runs a single process.
+
+    :param chord_ttl: seconds a chord may take before its counter expires.
+    """
+
+    def __init__(self, chord_ttl: float = 24 * 3600) -> None:
+        super().__init__()
+        self.chord_ttl = chord_ttl
+        self.local_store = InMemorySharedStore()
+
+    @property
+    def chord_store(self) -> AsyncSharedStore:
+        return self.store or self.local_store
+
+    def startup(self) -> None:
+        if not self.broker.is_worker_process or not self.chord_store.process_local:
+            return
+        if self.worker_processes == 1:
+            return
+        processes = self.worker_processes or "several"
+        raise ValueError(
+            f"Chords are joined in {type(self.chord_store).__name__}, which is "
+            f"local to this process, and {processes} worker processes run "
+            "their header tasks: configure a STORE shared by the workers"
+        )
+
+    async def send_chain(self, steps: List[Dict[str, Any]], value: Any) -> None:
+        first, *rest = steps
+        signature = Signature.from_dict(first, self.broker)
+        signature.args = [value, *signature.args]
+        if rest:
+            signature.labels[CHAIN_LABEL] = json.dumps(rest).decode()
+        await signature.kiq()
+
+    async def join_chord(self, spec: Dict[str, Any]) -> None:
+        key = f"{WORKFLOW_KEY_PREFIX}:{spec['id']}"
+        # a redelivered header task must not be counted twice
+        if (
+            await self.chord_store.get_or_set(
+                f"{key}:{spec['index']}", "1", self.chord_ttl
+            )
+            is not None
+        ):
+            return
+        task_ids = spec["tasks"]
+        if await self.chord_store.incr(key, 1, self.chord_ttl) < len(task_ids):
+            return
+
+        await self.chord_store.delete(key)
+        results = []
+        for task_id in task_ids:
+            result = await self.broker.result_backend.get_result(task_id)
+            results.append(result.return_value)
+        signature = Signature.from_dict(spec["callback"], self.broker)
+        signature.args = [results, *signature.args]
+        await signature.kiq()
+
+    async def post_save(
+        self,
+        message: "TaskiqMessage",
+        result: "TaskiqResult[Any]",
+    ) -> None:
+        chain = message.labels.get(CHAIN_LABEL)
+        chord = message.labels.get(CHORD_LABEL)
+        if not chain and not chord:
+            return
+        if result.is_err:
+            log.warning(
+                f"Task {message.task_name} {message.task_id} failed, "
+                "its workflow continuation is not sent"
+            )
+            return
+        try:
+            if chain:
+                await self.send_chain(json.loads(chain), result.return_value)
+            if chord:
+                await self.join_chord(json.loads(chord))
+        except Exception as exc:
+            log.error(
+                f"Failed to continue the workflow of task {message.task_id}: {exc}"
+            )
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from unfazed_taskiq.logger import log
+
+
+def format_frame(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of registered functions from a background thread.
+
+    Every `interval` seconds the stacks of all threads are inspected, a
+    stack containing the code of a registered function is counted for that
+    function's name, starting at its frame. Only on-CPU time is seen: a
+    coroutine waiting on I/O is not on any stack.
+
+    Executions of the same code that were not selected are told apart from
+    selected ones. A target registered with its asyncio task is only
+    sampled while that task runs on its loop. Any other thread is only
+    sampled while no unselected execution of the code is running, because
+    a thread can't be tied to an execution.
+
+    Stacks are aggregated in memory and written as folded stacks, one
+    `frame;frame;frame count` line each, which flamegraph tools accept.
+
+    :param interval: seconds between two samples.
+    :param output_dir: directory of the `<name>.folded` files.
+    :param flush_interval: seconds between two writes of the files.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.01,
+        output_dir: str = "profiles",
+        flush_interval: float = 10,
+    ) -> None:
+        self.interval = interval
+        self.output_dir = output_dir
+        self.flush_interval = flush_interval
+        self.targets: Dict[CodeType, Tuple[str, int]] = {}
+        self.tasks: Counter["asyncio.Task[Any]"] = Counter()
+        # event loops of the selected tasks, by thread
+        self.loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        self.unselected: Counter[CodeType] = Counter()
+        self.stacks: Dict[str, Counter[str]] = {}
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    def add_target(
+        self,
+        code: CodeType,
+        name: str,
+        task: Optional["asyncio.Task[Any]"] = None,
+    ) -> None:
+        """
+        Sample an execution of code under name.
+
+        :param task: asyncio task running the execution, None for any thread.
+        """
+        _, count = self.targets.get(code, (name, 0))
+        self.targets[code] = (name, count + 1)
+        if task is not None:
+            self.tasks[task] += 1
+            self.loops[threading.get_ident()] = task.get_loop()
+        if self.thread is None:
+            self.start()
+
+    def remove_target(
+        self, code: CodeType, task: Optional["asyncio.Task[Any]"] = None
+    ) -> None:
+        name, count = self.targets.get(code, ("", 0))
+        if count <= 1:
+            self.targets.pop(code, None)
+        else:
+            self.targets[code] = (name, count - 1)
+        if task is not None:
+            self.tasks[task] -= 1
+            if self.tasks[task] <= 0:
+                del self.tasks[task]
+
+    def add_unselected(self, code: CodeType) -> None:
+        """Record a running execution of code that must not be sampled."""
+        self.unselected[code] += 1
+
+    def remove_unselected(self, code: CodeType) -> None:
+        self.unselected[code] -= 1
+        if self.unselected[code] <= 0:
+            del self.unselected[code]
+
+    def selected(self, thread_id: int, code: CodeType) -> bool:
+        """Whether the execution of code running on thread_id was selected."""
+        loop = self.loops.get(thread_id)
+        if loop is not None:
+            return asyncio.current_task(loop) in self.tasks
+        return not self.unselected.get(code)
+
+    def sample(self) -> None:
+        targets = dict(self.targets)
+        if not targets:
+            return
+        current = threading.get_ident()
+        samples: List[Tuple[str, str]] = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == current:
+                continue
+            stack: List[str] = []
+            walker: Optional[FrameType] = frame
+            while walker is not None:
+                stack.append(format_frame(walker))
+                target = targets.get(walker.f_code)
+                if target is not None:
+                    if self.selected(thread_id, walker.f_code):
+                        samples.append((target[0], ";".join(reversed(stack))))
+                    break
+                walker = walker.f_back
+
+        if samples:
+            with self.lock:
+                for name, stack_line in samples:
+                    self.stacks.setdefault(name, Counter())[stack_line] += 1
+
+    def write(self) -> None:
+        with self.lock:
+            stacks = {name: Counter(counter) for name, counter in self.stacks.items()}
+        if not stacks:
+            return
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            for name, counter in stacks.items():
+                filename = name.replace(os.sep, "_")
+                path = os.path.join(self.output_dir, f"{filename}.folded")
+                with open(path, "w") as f:
+                    f.writelines(
+                        f"{stack} {count}\n" for stack, count in counter.most_common()
+                    )
+        except OSError as exc:
+            log.warning(f"Failed to write profiles to {self.output_dir}: {exc}")
+
+    def run(self) -> None:
+        flush_at = time.monotonic() + self.flush_interval
+        while not self.stopped.wait(self.interval):
+            self.sample()
+            if time.monotonic() >= flush_at:
+                self.write()
+                flush_at = time.monotonic() + self.flush_interval
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="unfazed-taskiq-profiler", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+        self.write()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stacks.clear()
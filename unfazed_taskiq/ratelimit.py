@@ -0,0 +1,61 @@
+import time
+from typing import Optional, Tuple, Union
+
+RATE_PERIODS = {
+    **dict.fromkeys(("s", "sec", "secs", "second", "seconds"), 1.0),
+    **dict.fromkeys(("m", "min", "mins", "minute", "minutes"), 60.0),
+    **dict.fromkeys(("h", "hr", "hrs", "hour", "hours"), 3600.0),
+    **dict.fromkeys(("d", "day", "days"), 86400.0),
+}
+
+
+def parse_rate(value: Union[str, float, int]) -> Tuple[float, float]:
+    """
+    Parse a rate such as `10/s`, `100/minute`, `1000/h` or a plain number per
+    second. Units are seconds, minutes, hours and days, spelled out or short.
+
+    :return: refill rate in tokens per second and bucket capacity.
+    """
+    if isinstance(value, (int, float)):
+        count, period = float(value), 1.0
+    else:
+        raw_count, _, unit = value.strip().partition("/")
+        count = float(raw_count)
+        unit = unit.strip().lower() or "s"
+        if unit not in RATE_PERIODS:
+            raise ValueError(f"Invalid rate limit: {value}")
+        period = RATE_PERIODS[unit]
+
+    if count <= 0:
+        raise ValueError(f"Invalid rate limit: {value}")
+    return count / period, max(count, 1.0)
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations.
+
+    Tokens may go negative, in which case `reserve` returns how long the
+    caller has to wait for its token instead of making it poll.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """
+        Take one token.
+
+        :return: seconds to wait before the token may be used, 0 if ready.
+        """
+        now = time.monotonic() if now is None else now
+        elapsed = max(now - self.updated_at, 0.0)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
@@ -0,0 +1,489 @@
+import asyncio
+import functools
+import math
+import os
+import time
+from typing import Any, Callable, List, Optional, Union
+
+from taskiq import AckableMessage, AsyncBroker, TaskiqMessage, TaskiqResult
+from taskiq.acks import AcknowledgeType
+from taskiq.receiver import Receiver
+from taskiq.utils import maybe_awaitable
+
+from unfazed_taskiq.drain import (
+    DEFERRED_LABEL,
+    DELAY_LABEL,
+    Defer,
+    DrainReport,
+    InFlight,
+    InFlightTracker,
+    deferrable,
+    drain,
+)
+from unfazed_taskiq.drain import in_flight as process_in_flight
+from unfazed_taskiq.executors import run_sync, task_executor
+from unfazed_taskiq.health import Health, LoopMonitor, broker_connected, process_index
+from unfazed_taskiq.logger import log
+from unfazed_taskiq.metrics import registry as metrics_registry
+from unfazed_taskiq.middleware import UnfazedTaskiqMiddleware
+from unfazed_taskiq.recycling import stop_fetching
+
+
+class AdaptiveLimit:
+    """
+    Capacity of an asyncio semaphore changed at runtime.
+
+    Growing releases permits. Shrinking takes permits back with background
+    acquires, so running holders are never interrupted.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore, value: int) -> None:
+        self.semaphore = semaphore
+        self.value = value
+        self.taken: List["asyncio.Task[Any]"] = []
+
+    def resize(self, value: int) -> None:
+        while self.value < value:
+            self.value += 1
+            if not self.taken:
+                self.semaphore.release()
+                continue
+            task = self.taken.pop()
+            if task.done() and not task.cancelled():
+                self.semaphore.release()
+            else:
+                task.cancel()
+        while self.value > value:
+            self.value -= 1
+            self.taken.append(asyncio.ensure_future(self.semaphore.acquire()))
+
+
+def resident_memory() -> Optional[int]:
+    """Resident set size of this process in bytes, None if unknown."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class AdaptiveController:
+    """
+    Tune the in-flight and prefetch limits of a worker process.
+
+    Every `interval` seconds the window of finished tasks is examined. The
+    in-flight limit starts at `min_in_flight` and doubles while the worker
+    is saturated, until the first sign of overload, then grows additively.
+    It is halved when the event loop lags more than `max_loop_lag`, the resident
+    memory is above `max_memory`, or the mean execution time got worse
+    than `latency_tolerance` times the best one seen. The prefetch limit
+    follows the throughput: enough messages for `prefetch_window` seconds,
+    none while overloaded, so short tasks never wait on the broker and long
+    ones are not hoarded by one process.
+
+    :param min_in_flight: lowest in-flight limit.
+    :param max_in_flight: highest in-flight limit.
+    :param min_prefetch: lowest prefetch limit.
+    :param max_prefetch: highest prefetch limit.
+    :param max_loop_lag: seconds of event loop lag considered overloaded.
+    :param max_memory: bytes of resident memory considered overloaded.
+    :param latency_tolerance: allowed growth of the mean execution time.
+    :param prefetch_window: seconds of work to keep prefetched.
+    :param interval: seconds between two adjustments.
+    """
+
+    def __init__(
+        self,
+        min_in_flight: int = 1,
+        max_in_flight: int = 100,
+        min_prefetch: int = 0,
+        max_prefetch: int = 100,
+        max_loop_lag: float = 0.1,
+        max_memory: Optional[int] = None,
+        latency_tolerance: float = 2.0,
+        prefetch_window: float = 0.1,
+        interval: float = 1.0,
+    ) -> None:
+        if not 1 <= min_in_flight <= max_in_flight:
+            raise ValueError("Needs 1 <= min_in_flight <= max_in_flight")
+        if not 0 <= min_prefetch <= max_prefetch:
+            raise ValueError("Needs 0 <= min_prefetch <= max_prefetch")
+        self.min_in_flight = min_in_flight
+        self.max_in_flight = max_in_flight
+        self.min_prefetch = min_prefetch
+        self.max_prefetch = max_prefetch
+        self.max_loop_lag = max_loop_lag
+        self.max_memory = max_memory
+        self.latency_tolerance = latency_tolerance
+        self.prefetch_window = prefetch_window
+        self.interval = interval
+        self.in_flight = min_in_flight
+        self.prefetch = min_prefetch
+        self.slow_start = True
+        self.best_latency: Optional[float] = None
+        self.active = 0
+        self.reset()
+
+    def clamp(self, in_flight: int) -> int:
+        return max(self.min_in_flight, min(in_flight, self.max_in_flight))
+
+    def reset(self) -> None:
+        self.window_started_at = time.perf_counter()
+        self.completed = 0
+        self.busy = 0.0
+        self.peak_active = self.active
+
+    def started(self) -> None:
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+
+    def finished(self, duration: float) -> None:
+        self.active -= 1
+        self.completed += 1
+        self.busy += duration
+
+    def adjust(self, loop_lag: float, memory: Optional[int] = None) -> None:
+        """Update the limits from the current window, then start a new one."""
+        elapsed = max(time.perf_counter() - self.window_started_at, 1e-9)
+        latency = self.busy / self.completed if self.completed else None
+        if latency is not None:
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+
+        reason = None
+        if loop_lag > self.max_loop_lag:
+            reason = f"event loop lag {loop_lag:.3f}s"
+        elif self.max_memory is not None and memory and memory > self.max_memory:
+            reason = f"resident memory {memory} bytes"
+        elif (
+            latency is not None
+            and self.best_latency is not None
+            and latency > self.best_latency * self.latency_tolerance
+            and self.in_flight > self.min_in_flight
+        ):
+            reason = f"execution time {latency:.3f}s"
+            # forget the best latency, the workload may have changed
+            self.best_latency = latency
+
+        if reason is not None:
+            in_flight = self.clamp(self.in_flight // 2)
+            if in_flight != self.in_flight:
+                log.info(f"Lowering in-flight tasks to {in_flight}: {reason}")
+            self.in_flight = in_flight
+            self.prefetch = self.min_prefetch
+            self.slow_start = False
+        else:
+            if self.peak_active >= self.in_flight:
+                step = self.in_flight if self.slow_start else self.in_flight // 10
+                self.in_flight = self.clamp(self.in_flight + max(1, step))
+            throughput = self.completed / elapsed
+            self.prefetch = max(
+                self.min_prefetch,
+                min(math.ceil(throughput * self.prefetch_window), self.max_prefetch),
+            )
+        self.reset()
+
+    async def run(
+        self,
+        in_flight_limit: AdaptiveLimit,
+        prefetch_limit: AdaptiveLimit,
+        memory: Callable[[], Optional[int]] = resident_memory,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.adjust(max(loop.time() - expected, 0.0), memory())
+            in_flight_limit.resize(self.in_flight)
+            prefetch_limit.resize(self.prefetch)
+
+
+def to_number(value: Any) -> Any:
+    """Receiver arguments given on the command line are strings."""
+    if isinstance(value, str):
+        return float(value) if "." in value or "e" in value else int(value)
+    return value
+
+
+def to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.lower() not in ("0", "false", "no", "off", "")
+    return bool(value)
+
+
+def drainable(target: Callable[..., Any], entry: InFlight) -> Callable[..., Any]:
+    """
+    Wrap target so that a drain cancelling it returns instead of raising.
+
+    `Receiver.run_task` passes any exception of the target to the `on_error`
+    hooks, a `CancelledError` would be reported and retried although the
+    drain requeues the message. Sync targets run in the task executor.
+    """
+    is_coroutine = asyncio.iscoroutinefunction(target)
+
+    @functools.wraps(target)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            if is_coroutine:
+                return await target(*args, **kwargs)
+            return await run_sync(target, *args, **kwargs)
+        except asyncio.CancelledError:
+            if not entry.cancelled:
+                raise
+        return None
+
+    return wrapper
+
+
+class UnfazedReceiver(Receiver):
+    """
+    Receiver tracking the messages it executes, drained on shutdown.
+
+    When the worker stops, fetching stops and the running tasks have
+    `--wait-tasks-timeout` seconds to finish, forever when unset. Progress
+    is logged meanwhile, then the remaining tasks are cancelled and their
+    messages sent back to the broker, unless `requeue` is off. Cancelled
+    tasks skip the `on_error` and `post_execute` hooks, the middlewares
+    release what their `pre_execute` hooks took instead.
+
+    Messages whose `pre_execute` hooks raise `Defer` free their execution
+    slot, the middlewares release what their hooks took, and the message
+    goes back to the broker after the requested delay: as a delayed copy
+    sent right away, the message being acked, when the broker delays
+    messages natively, such as aio-pika, held by the process until then
+    otherwise.
+
+    With `health_port` or `health_file`, the loop lag of the process and the
+    connection of its broker are served by `Health`, the port also serves the
+    task metrics of the process on `/metrics`. Worker processes add
+    their index to the port and replace `{worker}` in the file name.
+
+    With `max_rss`, the process stops fetching once its resident memory
+    exceeds that many bytes, like it does after `--max-tasks-per-child`
+    messages, and drains. Under `RecyclingProcessManager` its replacement
+    starts as soon as fetching stops.
+
+    :param requeue: requeue the messages of tasks cancelled at the deadline.
+    :param drain_interval: seconds between two progress logs.
+    :param tracker: tracker of the messages, defaults to the process one.
+    :param health_port: first port of the health endpoints.
+    :param health_file: health status file.
+    :param lag_threshold: seconds of loop lag logged with the blocking stack.
+    :param max_rss: resident memory in bytes after which the process recycles.
+    :param memory_interval: seconds between two reads of the resident memory.
+    :param workers: number of processes the worker may run at once.
+    """
+
+    def __init__(
+        self,
+        broker: AsyncBroker,
+        *args: Any,
+        requeue: Any = True,
+        drain_interval: Any = 1.0,
+        tracker: Optional[InFlightTracker] = None,
+        health_port: Any = None,
+        health_file: Optional[str] = None,
+        lag_threshold: Any = 0.5,
+        max_rss: Any = None,
+        memory_interval: Any = 1.0,
+        workers: Any = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(broker, *args, **kwargs)
+        if workers is not None:
+            for middleware in broker.middlewares:
+                if isinstance(middleware, UnfazedTaskiqMiddleware):
+                    middleware.worker_processes = int(workers)
+        self.max_rss = None if max_rss is None else int(max_rss)
+        self.memory_interval = float(memory_interval)
+        self.health_port = None if health_port is None else int(health_port)
+        self.health_file = health_file
+        self.lag_threshold = float(lag_threshold)
+        self.requeue = to_bool(requeue)
+        self.drain_interval = float(drain_interval)
+        self.tracker = process_in_flight if tracker is None else tracker
+        self.drain_timeout = self.wait_tasks_timeout
+        # the runner must not wait for the tasks, the drain does
+        self.wait_tasks_timeout = 0
+        self.drain_report: Optional[DrainReport] = None
+
+    async def callback(
+        self, message: Union[bytes, AckableMessage], raise_err: bool = False
+    ) -> None:
+        task = asyncio.current_task()
+        if task is None:  # pragma: no cover
+            return await super().callback(message, raise_err)
+        entry = InFlight(message, self.broker, self.requeue)
+        self.tracker.track(task, entry)
+        deferrable.set(True)
+        try:
+            await super().callback(message, raise_err)
+        except Defer as defer:
+            await self.release(entry)
+            entry.labels.update(defer.labels)
+            await self.tracker.defer(entry, defer.delay)
+        finally:
+            self.tracker.discard(task)
+
+    async def release(self, entry: InFlight) -> None:
+        """Call the release hooks of the middlewares, for a message not run."""
+        try:
+            message = self.broker.formatter.loads(entry.data)
+        except Exception:
+            return
+        for middleware in reversed(self.broker.middlewares):
+            if not isinstance(middleware, UnfazedTaskiqMiddleware):
+                continue
+            try:
+                await maybe_awaitable(middleware.release(message))
+            except Exception:
+                log.exception(
+                    f"Failed to release task {message.task_name} {message.task_id} "
+                    f"in {type(middleware).__name__}"
+                )
+
+    async def run_task(
+        self, target: Callable[..., Any], message: TaskiqMessage
+    ) -> TaskiqResult[Any]:
+        entry = self.tracker.get(asyncio.current_task())
+        if entry is not None:
+            entry.task_id = message.task_id
+            entry.task_name = message.task_name
+            entry.acked = self.ack_time == AcknowledgeType.WHEN_RECEIVED
+        if message.labels.pop(DEFERRED_LABEL, None) is not None:
+            # the delay of a deferred copy must not reach retries
+            message.labels.pop(DELAY_LABEL, None)
+        task_executor.set(self.executor)
+        if entry is not None:
+            # signature and dependencies are read from the task function
+            if message.task_name not in self.known_tasks:
+                self._prepare_task(message.task_name, target)
+            target = drainable(target, entry)
+        result = await super().run_task(target, message)
+        if entry is not None:
+            if entry.cancelled:
+                # the drain requeues the message, skip the result and the ack,
+                # post_execute doesn't run either
+                await self.release(entry)
+                raise asyncio.CancelledError
+            entry.executed = True
+        return result
+
+    def setup_health(self, finish_event: asyncio.Event) -> Optional[Health]:
+        if self.health_port is None and self.health_file is None:
+            return None
+
+        async def fetching() -> bool:
+            return not finish_event.is_set()
+
+        index = process_index()
+        return Health(
+            LoopMonitor(threshold=self.lag_threshold),
+            checks={
+                "broker": functools.partial(broker_connected, self.broker),
+                "fetching": fetching,
+            },
+            port=None if self.health_port is None else self.health_port + index,
+            path=(
+                None
+                if self.health_file is None
+                else self.health_file.format(worker=index, pid=os.getpid())
+            ),
+            metrics=metrics_registry.render,
+        )
+
+    async def watch_memory(self, finish_event: asyncio.Event) -> None:
+        assert self.max_rss is not None
+        while not finish_event.is_set():
+            rss = resident_memory()
+            if rss is not None and rss > self.max_rss:
+                log.info(
+                    f"Resident memory of {rss >> 20} MiB exceeds "
+                    f"{self.max_rss >> 20} MiB, recycling the process"
+                )
+                finish_event.set()
+                return
+            await asyncio.sleep(self.memory_interval)
+
+    async def listen(self, finish_event: asyncio.Event) -> None:
+        health = self.setup_health(finish_event)
+        if health is not None:
+            await health.start()
+        watcher = None
+        if self.max_rss is not None:
+            watcher = asyncio.create_task(self.watch_memory(finish_event))
+        try:
+            await super().listen(finish_event)
+            stop_fetching()
+            self.drain_report = await drain(
+                self.tracker, self.drain_timeout, interval=self.drain_interval
+            )
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if health is not None:
+                await health.stop()
+
+
+class AdaptiveReceiver(UnfazedReceiver):
+    """
+    Receiver whose in-flight and prefetch limits follow the load.
+
+    Use it with `--receiver unfazed_taskiq.receiver:AdaptiveReceiver`, the
+    options of `AdaptiveController` are given with `--receiver_arg`, or
+    read from the ADAPTIVE settings of the alias by `unfazed-worker`. They
+    replace `--max-async-tasks` and `--max-prefetch`.
+    """
+
+    def __init__(
+        self,
+        broker: AsyncBroker,
+        *args: Any,
+        min_in_flight: Any = 1,
+        max_in_flight: Any = 100,
+        min_prefetch: Any = 0,
+        max_prefetch: Any = 100,
+        max_loop_lag: Any = 0.1,
+        max_memory: Any = None,
+        latency_tolerance: Any = 2.0,
+        prefetch_window: Any = 0.1,
+        interval: Any = 1.0,
+        **kwargs: Any,
+    ) -> None:
+        # the limits below replace max_async_tasks, only avoid its warning
+        kwargs.setdefault("max_async_tasks", to_number(max_in_flight))
+        super().__init__(broker, *args, **kwargs)
+        self.controller = AdaptiveController(
+            min_in_flight=to_number(min_in_flight),
+            max_in_flight=to_number(max_in_flight),
+            min_prefetch=to_number(min_prefetch),
+            max_prefetch=to_number(max_prefetch),
+            max_loop_lag=float(max_loop_lag),
+            max_memory=None if max_memory in (None, "") else to_number(max_memory),
+            latency_tolerance=float(latency_tolerance),
+            prefetch_window=float(prefetch_window),
+            interval=float(interval),
+        )
+        self.sem = asyncio.Semaphore(self.controller.in_flight)
+        self.sem_prefetch = asyncio.Semaphore(self.controller.prefetch)
+        self.in_flight_limit = AdaptiveLimit(self.sem, self.controller.in_flight)
+        self.prefetch_limit = AdaptiveLimit(self.sem_prefetch, self.controller.prefetch)
+
+    async def run_task(
+        self, target: Callable[..., Any], message: TaskiqMessage
+    ) -> TaskiqResult[Any]:
+        self.controller.started()
+        started_at = time.perf_counter()
+        try:
+            return await super().run_task(target, message)
+        finally:
+            self.controller.finished(time.perf_counter() - started_at)
+
+    async def listen(self, finish_event: asyncio.Event) -> None:
+        controller = asyncio.create_task(
+            self.controller.run(self.in_flight_limit, self.prefetch_limit)
+        )
+        try:
+            await super().listen(finish_event)
+        finally:
+            controller.cancel()
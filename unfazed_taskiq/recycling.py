@@ -0,0 +1,197 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing import Process
+from multiprocessing.synchronize import Event as EventType
+from typing import Callable, Dict, List, Optional, Tuple
+
+from taskiq.cli.worker.args import WorkerArgs
+from taskiq.cli.worker.process_manager import (
+    ProcessManager,
+    ReloadAllAction,
+    ShutdownAction,
+)
+from taskiq.cli.worker.run import start_listen
+
+from unfazed_taskiq.logger import log
+
+# set in the processes of a `RecyclingProcessManager`
+fetching_stopped: Optional[EventType] = None
+
+
+def stop_fetching() -> None:
+    """Tell the process manager that this process fetches no more messages."""
+    if fetching_stopped is not None:
+        fetching_stopped.set()
+
+
+def pool_worker(
+    worker_function: Callable[[WorkerArgs], None],
+    args: WorkerArgs,
+    stopped: EventType,
+) -> None:
+    """Run worker_function in a process managed by `RecyclingProcessManager`."""
+    global fetching_stopped
+    fetching_stopped = stopped
+    worker_function(args)
+
+
+class RecyclingProcessManager(ProcessManager):
+    """
+    Process manager replacing worker processes as soon as they stop fetching.
+
+    A worker process stops fetching when it reaches `--max-tasks-per-child`
+    messages or `--max-rss-per-child` of resident memory, and tells the
+    manager, which starts its replacement right away while the old process
+    drains its running tasks, so the pool never runs short of a process.
+    Processes that die are replaced too, `--max-fails` of them stop the
+    manager. On reload every process is drained and replaced.
+
+    Draining processes still alive after `drain_timeout` seconds are killed.
+
+    :param args: worker CLI arguments.
+    :param worker_function: function run by each process.
+    :param drain_timeout: seconds a draining process has to exit, None to
+        wait for it.
+    """
+
+    def __init__(
+        self,
+        args: WorkerArgs,
+        worker_function: Callable[[WorkerArgs], None],
+        drain_timeout: Optional[float] = 60,
+    ) -> None:
+        super().__init__(args=args, worker_function=worker_function)
+        self.drain_timeout = drain_timeout
+        self.retiring: List[Tuple[Process, Optional[float]]] = []
+        self.fetching: Dict[Process, EventType] = {}
+        self.failures = 0
+
+    def start_process(self, index: int) -> Process:
+        fetching_stopped = multiprocessing.Event()
+        process = Process(
+            target=pool_worker,
+            args=(self.worker_function, self.args, fetching_stopped),
+            name=f"worker-{index}",
+            daemon=False,
+        )
+        process.start()
+        log.info(f"Started process {process.name} with pid {process.pid}")
+        self.fetching[process] = fetching_stopped
+        return process
+
+    def spawn(self) -> None:
+        self.workers.append(self.start_process(len(self.workers)))
+
+    def drain(self, process: Process) -> None:
+        """Let process finish its running tasks, it exits afterwards."""
+        fetching_stopped = self.fetching.pop(process, None)
+        stopped = fetching_stopped is not None and fetching_stopped.is_set()
+        if not stopped and process.pid and process.is_alive():
+            os.kill(process.pid, signal.SIGINT)
+        log.info(f"Draining process {process.name} with pid {process.pid}")
+        deadline = None
+        if self.drain_timeout is not None:
+            deadline = time.monotonic() + self.drain_timeout
+        self.retiring.append((process, deadline))
+
+    def retire(self) -> None:
+        self.drain(self.workers.pop())
+
+    def replace(self, index: int) -> None:
+        self.drain(self.workers[index])
+        self.workers[index] = self.start_process(index)
+
+    def reap(self) -> None:
+        """Join drained processes, kill those past the drain timeout."""
+        now = time.monotonic()
+        retiring = []
+        for process, deadline in self.retiring:
+            if process.is_alive() and (deadline is None or now < deadline):
+                retiring.append((process, deadline))
+                continue
+            if process.is_alive():
+                log.warning(f"Process {process.name} did not drain in time, killing")
+                process.kill()
+            process.join()
+        self.retiring = retiring
+
+    def recycle(self) -> bool:
+        """
+        Replace the processes that stopped fetching or died.
+
+        :return: False once `--max-fails` processes died.
+        """
+        for index, process in enumerate(self.workers):
+            fetching_stopped = self.fetching.get(process)
+            if fetching_stopped is not None and fetching_stopped.is_set():
+                log.info(f"{process.name} stopped fetching, replacing it")
+            elif not process.is_alive():
+                log.info(f"{process.name} is dead, replacing it")
+                self.failures += 1
+                if 1 <= self.args.max_fails <= self.failures:
+                    log.warning("Max restarts reached. Exiting.")
+                    return False
+            else:
+                continue
+            self.replace(index)
+        return True
+
+    def tick(self) -> None:
+        """Called every second by the manager loop."""
+
+    def prepare_workers(self) -> None:
+        while len(self.workers) < self.args.workers:
+            self.spawn()
+
+    def shutdown(self) -> None:
+        for worker in [*self.workers, *(process for process, _ in self.retiring)]:
+            if worker.pid and worker.is_alive():
+                os.kill(worker.pid, signal.SIGINT)
+
+    def start(self) -> Optional[int]:
+        return self.run()
+
+    def run(self) -> Optional[int]:
+        """Same loop as `ProcessManager.start`, without waiting on exits."""
+        self.prepare_workers()
+        while True:
+            time.sleep(1)
+            while not self.action_queue.empty():
+                action = self.action_queue.get()
+                if isinstance(action, ReloadAllAction):
+                    for index in range(len(self.workers)):
+                        self.replace(index)
+                elif isinstance(action, ShutdownAction):
+                    log.debug("Process manager closed, stopping workers.")
+                    self.shutdown()
+                    return None
+
+            self.reap()
+            self.tick()
+            if not self.recycle():
+                self.shutdown()
+                return -1
+
+
+def configure_logging(args: WorkerArgs) -> None:
+    """Logging setup of `taskiq.cli.worker.run.run_worker`."""
+    if args.configure_logging:
+        logging.basicConfig(
+            level=logging.getLevelName(args.log_level),
+            format="[%(asctime)s][%(name)s][%(levelname)-7s]"
+            "[%(processName)s] %(message)s",
+        )
+    logging.getLogger("taskiq").setLevel(level=logging.getLevelName(args.log_level))
+
+
+def run_recycling_worker(
+    args: WorkerArgs, drain_timeout: Optional[float] = None
+) -> Optional[int]:
+    """`taskiq.cli.worker.run.run_worker` replacing processes without a gap."""
+    configure_logging(args)
+    log.info(f"Starting {args.workers} worker processes.")
+    manager = RecyclingProcessManager(args, start_listen, drain_timeout=drain_timeout)
+    return manager.start()
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from unfazed_taskiq.logger import log
+
+
+def fingerprint(task_name: str, exception: BaseException) -> str:
+    """Group errors by exception type, task and the frame that raised."""
+    frame = ""
+    tb = exception.__traceback__
+    while tb is not None:
+        code = tb.tb_frame.f_code
+        frame = f"{code.co_filename}:{code.co_name}:{tb.tb_lineno}"
+        tb = tb.tb_next
+    exception_type = f"{type(exception).__module__}.{type(exception).__qualname__}"
+    return f"{exception_type}|{task_name}|{frame}"
+
+
+class ErrorGroup:
+    """Errors sharing a fingerprint within one flush window."""
+
+    __slots__ = ("fingerprint", "task_name", "exception_type", "exception", "count")
+
+    def __init__(
+        self, fingerprint: str, task_name: str, exception: BaseException
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.task_name = task_name
+        self.exception_type = type(exception).__name__
+        self.exception = str(exception)
+        self.count = 0
+
+
+class ErrorReporter:
+    """
+    Report errors from a background task.
+
+    `submit` only fingerprints the error and puts it on a bounded queue, it
+    never blocks: when the queue is full the event is shed and only counted.
+    Within a flush window the first `sample_threshold` errors of a
+    fingerprint are reported one by one, then one in `sample_every`. At the
+    end of the window every group with unreported errors is summarized with
+    its count.
+
+    :param report: called with the group, exception and payload of an event.
+    :param summarize: called with the group and its number of unreported errors.
+    """
+
+    def __init__(
+        self,
+        report: Callable[..., None],
+        summarize: Callable[[ErrorGroup, int], None],
+        max_queue_size: int = 1000,
+        flush_interval: float = 5,
+        sample_threshold: int = 10,
+        sample_every: int = 100,
+    ) -> None:
+        self.report = report
+        self.summarize = summarize
+        self.max_queue_size = max_queue_size
+        self.flush_interval = flush_interval
+        self.sample_threshold = sample_threshold
+        self.sample_every = sample_every
+        self.queue: Optional[asyncio.Queue[Tuple[ErrorGroup, BaseException, Any]]] = (
+            None
+        )
+        self.worker: Optional[asyncio.Task[None]] = None
+        self.groups: Dict[str, ErrorGroup] = {}
+        self.reported: Dict[str, int] = {}
+        self.shed = 0
+
+    def submit(self, task_name: str, exception: BaseException, *payload: Any) -> None:
+        key = fingerprint(task_name, exception)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = ErrorGroup(key, task_name, exception)
+        group.count += 1
+        if group.count > self.sample_threshold and group.count % self.sample_every != 0:
+            return
+
+        if self.queue is None:
+            self.queue = asyncio.Queue(self.max_queue_size)
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self.run())
+        try:
+            self.queue.put_nowait((group, exception, payload))
+        except asyncio.QueueFull:
+            self.shed += 1
+
+    def deliver(
+        self, group: ErrorGroup, exception: BaseException, payload: Any
+    ) -> None:
+        self.reported[group.fingerprint] = self.reported.get(group.fingerprint, 0) + 1
+        try:
+            self.report(group, exception, *payload)
+        except Exception as exc:
+            log.warning(f"Failed to report task error: {exc}")
+
+    def end_window(self) -> None:
+        groups, reported = self.groups, self.reported
+        self.groups, self.reported = {}, {}
+        for key, group in groups.items():
+            unreported = group.count - reported.get(key, 0)
+            if unreported > 0:
+                try:
+                    self.summarize(group, unreported)
+                except Exception as exc:
+                    log.warning(f"Failed to summarize task errors: {exc}")
+
+    async def run(self) -> None:
+        assert self.queue is not None
+        window_ends_at = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(window_ends_at - time.monotonic(), 0)
+            try:
+                event = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                event = None
+            if event is not None:
+                self.deliver(*event)
+            if time.monotonic() >= window_ends_at:
+                self.end_window()
+                window_ends_at = time.monotonic() + self.flush_interval
+
+    async def flush(self) -> None:
+        """Report every queued event and summarize the current window."""
+        if self.queue is not None:
+            while not self.queue.empty():
+                self.deliver(*self.queue.get_nowait())
+        self.end_window()
+
+    async def close(self) -> None:
+        if self.worker is not None:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+        await self.flush()
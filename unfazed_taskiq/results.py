@@ -0,0 +1,363 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from taskiq import AsyncResultBackend, TaskiqResult
+from taskiq.depends.progress_tracker import TaskProgress
+
+from unfazed_taskiq.cache import LRUCache
+from unfazed_taskiq.logger import log
+
+T = TypeVar("T")
+
+RESULT_CHANNEL = "unfazed_taskiq:results"
+
+
+class CachedResultBackend(AsyncResultBackend[Any]):
+    """
+    Cache completed results in front of another result backend.
+
+    A task result never changes once stored, so results read or written by
+    this process are answered from a bounded in-process LRU for `ttl`
+    seconds. Concurrent reads of the same task id that miss the cache share
+    a single call to the backend. Readiness checks of unfinished tasks are
+    never cached.
+
+    :param backend: result backend holding the results.
+    :param maxsize: maximum number of cached results.
+    :param ttl: seconds a result stays cached, None to keep it until evicted.
+    """
+
+    def __init__(
+        self,
+        backend: AsyncResultBackend[Any],
+        maxsize: int = 1024,
+        ttl: Optional[float] = 300,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        # (fetched with logs, result)
+        self.results: LRUCache[Tuple[bool, TaskiqResult[Any]]] = LRUCache(maxsize)
+        self.pending: Dict[Tuple[str, str], asyncio.Future[Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def startup(self) -> None:
+        await self.backend.startup()
+
+    async def shutdown(self) -> None:
+        await self.backend.shutdown()
+
+    def cached(
+        self, task_id: str, with_logs: bool = False
+    ) -> Optional[TaskiqResult[Any]]:
+        entry = self.results.get(task_id)
+        if entry is None or (with_logs and not entry[0]):
+            return None
+        return entry[1]
+
+    async def coalesce(
+        self, key: Tuple[str, str], call: Callable[[], Awaitable[T]]
+    ) -> T:
+        """Await call, or the identical call already in flight."""
+        future = self.pending.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = self.pending[key] = asyncio.ensure_future(call())
+            future.add_done_callback(lambda _: self.pending.pop(key, None))
+        # a cancelled waiter must not cancel the call of the others
+        return await asyncio.shield(future)
+
+    async def set_result(self, task_id: str, result: TaskiqResult[Any]) -> None:
+        await self.backend.set_result(task_id, result)
+        self.results.set(task_id, (True, result), self.ttl)
+
+    async def is_result_ready(self, task_id: str) -> bool:
+        if self.cached(task_id) is not None:
+            return True
+        return await self.coalesce(
+            ("ready", task_id), lambda: self.backend.is_result_ready(task_id)
+        )
+
+    async def get_result(
+        self, task_id: str, with_logs: bool = False
+    ) -> TaskiqResult[Any]:
+        result = self.cached(task_id, with_logs)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = await self.coalesce(
+            ("result" if with_logs else "result_without_logs", task_id),
+            lambda: self.backend.get_result(task_id, with_logs=with_logs),
+        )
+        if self.cached(task_id, with_logs) is None:
+            self.results.set(task_id, (with_logs, result), self.ttl)
+        return result
+
+    async def set_progress(self, task_id: str, progress: TaskProgress[Any]) -> None:
+        await self.backend.set_progress(task_id, progress)
+
+    async def get_progress(self, task_id: str) -> Optional[TaskProgress[Any]]:
+        return await self.backend.get_progress(task_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self.results),
+        }
+
+
+class ResultNotifier(ABC):
+    """
+    Channel announcing that the result of a task was stored.
+
+    Workers `publish` the task id once its result is stored. Each process
+    runs a single listener consuming `subscribe` and waking the waiters of
+    the announced ids, started on the first `register`. A pub/sub channel,
+    e.g. redis `PUBLISH`/`SUBSCRIBE`, is a natural implementation: lost
+    notifications only cost latency, waiters keep polling as a fallback.
+
+    `register` returns once the listener is subscribed, so a result stored
+    after it is announced to the waiter.
+
+    :param subscribe_timeout: seconds `register` waits for the subscription.
+    """
+
+    def __init__(self, subscribe_timeout: float = 5) -> None:
+        self.subscribe_timeout = subscribe_timeout
+        self.waiters: Dict[str, List[asyncio.Event]] = {}
+        self.listener: Optional[asyncio.Task[None]] = None
+        self.subscribed = asyncio.Event()
+
+    async def startup(self) -> None:  # noqa: B027
+        """Do something when starting the broker."""
+
+    async def shutdown(self) -> None:
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+
+    @abstractmethod
+    async def publish(self, task_id: str) -> None:
+        """
+        Announce that the result of a task is stored.
+
+        :param task_id: id of the finished task.
+        """
+
+    @abstractmethod
+    async def subscribe(self) -> AsyncIterator[str]:
+        """
+        Subscribe to the channel.
+
+        :return: the ids of the tasks whose result is stored from now on,
+            forever.
+        """
+
+    async def register(self, task_id: str) -> asyncio.Event:
+        """Event set when the result of task_id is announced."""
+        event = asyncio.Event()
+        self.waiters.setdefault(task_id, []).append(event)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.run())
+        if not self.subscribed.is_set():
+            subscribed = asyncio.ensure_future(self.subscribed.wait())
+            try:
+                # a failed listener leaves the waiter polling
+                await asyncio.wait(
+                    {subscribed, self.listener},
+                    timeout=self.subscribe_timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            finally:
+                subscribed.cancel()
+        return event
+
+    def unregister(self, task_id: str, event: asyncio.Event) -> None:
+        events = self.waiters.get(task_id)
+        if events is None:
+            return
+        if event in events:
+            events.remove(event)
+        if not events:
+            del self.waiters[task_id]
+
+    def notify(self, task_id: str) -> None:
+        for event in self.waiters.pop(task_id, []):
+            event.set()
+
+    async def run(self) -> None:
+        task_ids: Optional[AsyncIterator[str]] = None
+        try:
+            task_ids = await self.subscribe()
+            self.subscribed.set()
+            async for task_id in task_ids:
+                self.notify(task_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # restarted by the next register, waiters poll meanwhile
+            log.warning(f"Result notification listener failed: {exc}")
+        finally:
+            self.subscribed.clear()
+            close = getattr(task_ids, "aclose", None)
+            if close is not None:
+                await close()
+
+
+class InMemoryResultNotifier(ResultNotifier):
+    """
+    Process-local notifier.
+
+    Intended for tests and `InMemoryBroker` only.
+    """
+
+    def __init__(self, subscribe_timeout: float = 5) -> None:
+        super().__init__(subscribe_timeout)
+        self.queues: List[asyncio.Queue[str]] = []
+
+    async def publish(self, task_id: str) -> None:
+        for queue in self.queues:
+            queue.put_nowait(task_id)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        self.queues.append(queue)
+        return self.drain(queue)
+
+    async def drain(self, queue: "asyncio.Queue[str]") -> AsyncIterator[str]:
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.queues.remove(queue)
+
+
+class RedisResultNotifier(ResultNotifier):
+    """
+    Notifier on a redis pub/sub channel, shared by every process of an alias.
+
+    Needs the `redis` package, installed by the `unfazed-taskiq[redis]` extra.
+
+    :param url: url of the redis server.
+    :param channel: channel of the notifications.
+    :param subscribe_timeout: seconds `register` waits for the subscription.
+    :param connection_options: keyword arguments for `redis.asyncio.from_url`.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        channel: str = RESULT_CHANNEL,
+        subscribe_timeout: float = 5,
+        **connection_options: Any,
+    ) -> None:
+        super().__init__(subscribe_timeout)
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise ImportError(
+                "RedisResultNotifier needs the redis package, "
+                "install unfazed-taskiq[redis]"
+            ) from None
+        self.channel = channel
+        self.redis = aioredis.from_url(url, **connection_options)
+
+    async def shutdown(self) -> None:
+        await super().shutdown()
+        await self.redis.aclose()
+
+    async def publish(self, task_id: str) -> None:
+        await self.redis.publish(self.channel, task_id)
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        pubsub: Any = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self.channel)
+        except BaseException:
+            await pubsub.aclose()
+            raise
+        return self.messages(pubsub)
+
+    async def messages(self, pubsub: Any) -> AsyncIterator[str]:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = message["data"]
+                yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            await pubsub.aclose()
+
+
+class NotifyingResultBackend(AsyncResultBackend[Any]):
+    """
+    Publish a notification once a result is stored in another backend.
+
+    `UnfazedTaskiqTask.wait_result` waits for the notification instead of
+    sleeping between polls, polling every `poll_interval` seconds in case a
+    notification is lost.
+
+    :param backend: result backend holding the results.
+    :param notifier: channel of the notifications.
+    :param poll_interval: seconds between two checks while waiting.
+    """
+
+    def __init__(
+        self,
+        backend: AsyncResultBackend[Any],
+        notifier: ResultNotifier,
+        poll_interval: float = 5,
+    ) -> None:
+        self.backend = backend
+        self.notifier = notifier
+        self.poll_interval = poll_interval
+
+    async def startup(self) -> None:
+        await self.backend.startup()
+        await self.notifier.startup()
+
+    async def shutdown(self) -> None:
+        await self.notifier.shutdown()
+        await self.backend.shutdown()
+
+    async def set_result(self, task_id: str, result: TaskiqResult[Any]) -> None:
+        await self.backend.set_result(task_id, result)
+        try:
+            await self.notifier.publish(task_id)
+        except Exception as exc:
+            log.warning(f"Failed to publish result of task {task_id}: {exc}")
+
+    async def is_result_ready(self, task_id: str) -> bool:
+        return await self.backend.is_result_ready(task_id)
+
+    async def get_result(
+        self, task_id: str, with_logs: bool = False
+    ) -> TaskiqResult[Any]:
+        return await self.backend.get_result(task_id, with_logs=with_logs)
+
+    async def set_progress(self, task_id: str, progress: TaskProgress[Any]) -> None:
+        await self.backend.set_progress(task_id, progress)
+
+    async def get_progress(self, task_id: str) -> Optional[TaskProgress[Any]]:
+        return await self.backend.get_progress(task_id)
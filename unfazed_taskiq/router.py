@@ -0,0 +1,133 @@
+import hashlib
+import inspect
+import itertools
+from bisect import bisect
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from taskiq import AsyncBroker
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class HashRing:
+    """
+    Consistent hash ring, each node owns `replicas` points.
+
+    Adding or removing a node only moves the keys of its own points.
+    """
+
+    def __init__(self, nodes: Sequence[str], replicas: int = 100) -> None:
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted(
+            (hash_key(f"{node}#{replica}"), node)
+            for node in nodes
+            for replica in range(replicas)
+        )
+        self.hashes = [point for point, _ in points]
+        self.nodes = [node for _, node in points]
+
+    def get(self, key: str) -> str:
+        index = bisect(self.hashes, hash_key(key)) % len(self.hashes)
+        return self.nodes[index]
+
+
+class Router:
+    """
+    Pick the alias of each message of a route.
+
+    Rules are tried first, in order: a rule matches when every label it
+    lists has the given value. Otherwise messages with a routing key, looked
+    up in the labels then in the task arguments, are spread over `aliases`
+    by consistent hashing, so one key always lands on the same alias.
+    Messages without a key are spread round-robin.
+
+    The ring is built once and kept in memory.
+
+    :param name: route name.
+    :param aliases: aliases sharing the messages.
+    :param brokers: broker of every alias of the route, rules included.
+    :param key: label or argument holding the routing key.
+    :param rules: `(labels, alias)` pairs.
+    :param replicas: points of each alias on the hash ring.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        aliases: Sequence[str],
+        brokers: Dict[str, AsyncBroker],
+        key: Optional[str] = None,
+        rules: Sequence[Tuple[Dict[str, Any], str]] = (),
+        replicas: int = 100,
+    ) -> None:
+        self.name = name
+        self.key = key
+        self.rules: List[Tuple[Dict[str, Any], str]] = list(rules)
+        self.aliases = list(aliases)
+        self.ring = HashRing(self.aliases, replicas)
+        self.brokers = brokers
+        self.counter = itertools.count()
+        self.signatures: Dict[Callable[..., Any], inspect.Signature] = {}
+
+    def routing_key(
+        self,
+        labels: Dict[str, Any],
+        args: Sequence[Any],
+        kwargs: Dict[str, Any],
+        func: Optional[Callable[..., Any]] = None,
+    ) -> Optional[Any]:
+        if self.key is None:
+            return None
+        if self.key in labels:
+            return labels[self.key]
+        if self.key in kwargs:
+            return kwargs[self.key]
+        if func is None or not args:
+            return None
+        signature = self.signatures.get(func)
+        if signature is None:
+            signature = self.signatures[func] = inspect.signature(func)
+        try:
+            return signature.bind_partial(*args).arguments.get(self.key)
+        except TypeError:
+            return None
+
+    def select(
+        self,
+        labels: Dict[str, Any],
+        args: Sequence[Any] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        func: Optional[Callable[..., Any]] = None,
+    ) -> str:
+        """Alias of a message with these labels and task arguments."""
+        for rule_labels, alias in self.rules:
+            if all(
+                str(labels.get(label)) == str(value)
+                for label, value in rule_labels.items()
+            ):
+                return alias
+        key = self.routing_key(labels, args, kwargs or {}, func)
+        if key is not None:
+            return self.ring.get(str(key))
+        return self.aliases[next(self.counter) % len(self.aliases)]
+
+    def broker(
+        self,
+        labels: Dict[str, Any],
+        args: Sequence[Any] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        func: Optional[Callable[..., Any]] = None,
+    ) -> AsyncBroker:
+        return self.brokers[self.select(labels, args, kwargs, func)]
+
+    @property
+    def all_aliases(self) -> List[str]:
+        """Every alias a message may be sent to."""
+        aliases = list(self.aliases)
+        for _, alias in self.rules:
+            if alias not in aliases:
+                aliases.append(alias)
+        return aliases
@@ -0,0 +1,79 @@
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel
+from taskiq.serializers import MSGPackSerializer as TaskiqMSGPackSerializer
+from taskiq.serializers import ORJSONSerializer as TaskiqORJSONSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None  # type: ignore
+
+
+def encode_default(value: Any) -> Any:
+    """
+    Fallback for values the encoder does not support natively.
+
+    Pydantic models are dumped, sets become lists and decimals strings,
+    anything else raises TypeError like the default JSON serializer.
+    """
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+class ORJSONSerializer(TaskiqORJSONSerializer):
+    """
+    Serialize messages with orjson.
+
+    Wire compatible with the default JSON serializer, so workers and
+    senders can be switched one at a time. Non-string dict keys are allowed.
+    """
+
+    def __init__(
+        self,
+        default: Optional[Callable[[Any], Any]] = encode_default,
+        option: Optional[int] = None,
+    ) -> None:
+        if option is None and orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+        super().__init__(default=default, option=option)
+
+
+class MSGPackSerializer(TaskiqMSGPackSerializer):
+    """
+    Serialize messages with msgpack, smaller bodies than json.
+
+    Not wire compatible with json, every sender and worker of an alias must
+    use it. Needs the `msgpack` package, installed by the
+    `unfazed-taskiq[msgpack]` extra.
+    """
+
+    def __init__(
+        self,
+        default: Optional[Callable[[Any], Any]] = encode_default,
+        use_single_float: bool = False,
+        use_bin_type: bool = True,
+        datetime: bool = True,
+    ) -> None:
+        if msgpack is None:
+            raise ImportError(
+                "MSGPackSerializer needs the msgpack package, "
+                "install unfazed-taskiq[msgpack]"
+            )
+        super().__init__(
+            default=default,
+            use_single_float=use_single_float,
+            use_bin_type=use_bin_type,
+            datetime=datetime,
+        )
@@ -6,20 +6,61 @@ from taskiq.events import TaskiqEvents
 from unfazed.conf import register_settings
 
 
+class Middleware(BaseModel):
+    backend: str = Field(alias="BACKEND")
+    options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+
+
+class Serializer(BaseModel):
+    backend: str = Field(alias="BACKEND")
+    options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+
+
+class Formatter(BaseModel):
+    backend: str = Field(alias="BACKEND")
+    options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+
+
+class Compression(BaseModel):
+    threshold: int = Field(default=16 * 1024, alias="THRESHOLD")
+    codec: str = Field(default="zlib", alias="CODEC")
+    level: t.Optional[int] = Field(default=None, alias="LEVEL")
+
+
 class Broker(BaseModel):
     backend: str = Field(alias="BACKEND")
     options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
-    middlewares: t.List[str] = Field(
+    middlewares: t.List[t.Union[str, Middleware]] = Field(
         default=[], alias="MIDDLEWARES"
     )  # unfazed_taskiq.middleware.UnfazedTaskiqExceptionMiddleware
     handlers: t.List[t.Dict[str, t.Union[str, TaskiqEvents]]] = Field(
         default=[], alias="HANDLERS"
     )
+    serializer: t.Optional[Serializer] = Field(
+        default=None, alias="SERIALIZER"
+    )  # unfazed_taskiq.serializers.ORJSONSerializer
+    formatter: t.Optional[Formatter] = Field(default=None, alias="FORMATTER")
+    compression: t.Optional[Compression] = Field(default=None, alias="COMPRESSION")
+
+
+class ResultCache(BaseModel):
+    maxsize: int = Field(default=1024, alias="MAXSIZE")
+    ttl: t.Optional[float] = Field(default=300, alias="TTL")
+
+
+class Notifier(BaseModel):
+    backend: str = Field(alias="BACKEND")
+    options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+    poll_interval: float = Field(default=5, alias="POLL_INTERVAL")
 
 
 class Result(BaseModel):
     backend: str = Field(alias="BACKEND")
     options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+    cache: t.Optional[ResultCache] = Field(default=None, alias="CACHE")
+    notifier: t.Optional[Notifier] = Field(
+        default=None, alias="NOTIFIER"
+    )  # unfazed_taskiq.results.RedisResultNotifier
 
 
 class Scheduler(BaseModel):
@@ -31,10 +72,81 @@ class Scheduler(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
 
+class Store(BaseModel):
+    backend: str = Field(
+        default="unfazed_taskiq.store.InMemorySharedStore", alias="BACKEND"
+    )
+    options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+
+
+class RouteRule(BaseModel):
+    labels: t.Dict[str, t.Any] = Field(alias="LABELS")
+    alias: str = Field(alias="ALIAS")
+
+
+class Route(BaseModel):
+    aliases: t.List[str] = Field(alias="ALIASES", min_length=1)
+    key: t.Optional[str] = Field(default=None, alias="KEY")
+    rules: t.List[RouteRule] = Field(default=[], alias="RULES")
+    replicas: int = Field(default=100, alias="REPLICAS")
+
+
+class Sampler(BaseModel):
+    backend: str = Field(alias="BACKEND")
+    options: t.Optional[t.Dict[str, t.Any]] = Field(default=None, alias="OPTIONS")
+
+
+class Autoscale(BaseModel):
+    sampler: Sampler = Field(
+        alias="SAMPLER"
+    )  # unfazed_taskiq.autoscale.AioPikaDepthSampler
+    min_workers: int = Field(default=1, alias="MIN_WORKERS")
+    max_workers: int = Field(default=4, alias="MAX_WORKERS")
+    target_depth: int = Field(default=100, alias="TARGET_DEPTH")
+    scale_down_ratio: float = Field(default=0.5, alias="SCALE_DOWN_RATIO")
+    down_samples: int = Field(default=3, alias="DOWN_SAMPLES")
+    max_lag: t.Optional[float] = Field(default=None, alias="MAX_LAG")
+    cooldown: float = Field(default=30, alias="COOLDOWN")
+    interval: float = Field(default=5, alias="INTERVAL")
+    drain_timeout: float = Field(default=60, alias="DRAIN_TIMEOUT")
+
+
+class Adaptive(BaseModel):
+    min_in_flight: int = Field(default=1, alias="MIN_IN_FLIGHT")
+    max_in_flight: int = Field(default=100, alias="MAX_IN_FLIGHT")
+    min_prefetch: int = Field(default=0, alias="MIN_PREFETCH")
+    max_prefetch: int = Field(default=100, alias="MAX_PREFETCH")
+    max_loop_lag: float = Field(default=0.1, alias="MAX_LOOP_LAG")
+    max_memory: t.Optional[int] = Field(default=None, alias="MAX_MEMORY")
+    latency_tolerance: float = Field(default=2.0, alias="LATENCY_TOLERANCE")
+    prefetch_window: float = Field(default=0.1, alias="PREFETCH_WINDOW")
+    interval: float = Field(default=1, alias="INTERVAL")
+
+
+class ProcessPool(BaseModel):
+    max_workers: t.Optional[int] = Field(default=None, alias="MAX_WORKERS")
+    shared_memory_threshold: t.Optional[int] = Field(
+        default=1024 * 1024, alias="SHARED_MEMORY_THRESHOLD"
+    )
+    initializer: t.Optional[str] = Field(
+        default="unfazed_taskiq.executors.setup_unfazed", alias="INITIALIZER"
+    )
+    start_method: str = Field(default="spawn", alias="START_METHOD")
+    prewarm: bool = Field(default=True, alias="PREWARM")
+
+
+class ThreadPool(BaseModel):
+    max_workers: int = Field(alias="MAX_WORKERS")
+
+
 class TaskiqConfig(BaseModel):
     broker: Broker = Field(alias="BROKER")
     result: t.Optional[Result] = Field(default=None, alias="RESULT")
     scheduler: t.Optional[Scheduler] = Field(default=None, alias="SCHEDULER")
+    store: Store = Field(default_factory=Store, alias="STORE")
+    autoscale: t.Optional[Autoscale] = Field(default=None, alias="AUTOSCALE")
+    adaptive: t.Optional[Adaptive] = Field(default=None, alias="ADAPTIVE")
+    process_pool: t.Optional[ProcessPool] = Field(default=None, alias="PROCESS_POOL")
 
 
 @register_settings("UNFAZED_TASKIQ_SETTINGS")
@@ -43,3 +155,6 @@ class UnfazedTaskiqSettings(BaseModel):
     default_alias_name: t.Optional[str] = Field(
         alias="DEFAULT_ALIAS_NAME", default="default"
     )
+    routes: t.Dict[str, Route] = Field(default={}, alias="ROUTES")
+    thread_pools: t.Dict[str, ThreadPool] = Field(default={}, alias="THREAD_POOLS")
+    drain_timeout: t.Optional[float] = Field(default=30, alias="DRAIN_TIMEOUT")
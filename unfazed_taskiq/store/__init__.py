@@ -0,0 +1,4 @@
+from unfazed_taskiq.store.base import AsyncSharedStore
+from unfazed_taskiq.store.memory import InMemorySharedStore
+
+__all__ = ["AsyncSharedStore", "InMemorySharedStore"]
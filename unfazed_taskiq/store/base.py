@@ -0,0 +1,63 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class AsyncSharedStore(ABC):
+    """
+    Key-value store shared by every process of an alias.
+
+    Implementations must make each operation atomic, e.g. with redis
+    `SET NX` or a lua script.
+    """
+
+    # True when the data is only seen by the process holding the store
+    process_local: bool = False
+
+    async def startup(self) -> None:  # noqa: B027
+        """Do something when starting the agent."""
+
+    async def shutdown(self) -> None:  # noqa: B027
+        """Do something on shutdown."""
+
+    @abstractmethod
+    async def get_or_set(
+        self, key: str, value: str, ttl: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Set key to value unless it already exists.
+
+        :param key: key to set.
+        :param value: value to store.
+        :param ttl: seconds after which the key expires, None to keep it.
+        :return: the existing value, or None if value was stored.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """
+        Delete key if it exists.
+
+        :param key: key to delete.
+        """
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """
+        Add amount to the counter stored at key, missing keys start at 0.
+
+        :param key: counter key.
+        :param amount: value to add, may be negative.
+        :param ttl: seconds after which the key expires, refreshed on every call.
+        :return: the new value.
+        """
+
+    @abstractmethod
+    async def reserve_token(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Take one token from the token bucket stored at key.
+
+        :param key: bucket key.
+        :param rate: refill rate in tokens per second.
+        :param capacity: maximum number of tokens in the bucket.
+        :return: seconds to wait before the token may be used, 0 if ready.
+        """
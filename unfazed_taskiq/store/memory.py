@@ -0,0 +1,54 @@
+import time
+from typing import Dict, Optional, Tuple
+
+from unfazed_taskiq.ratelimit import TokenBucket
+from unfazed_taskiq.store.base import AsyncSharedStore
+
+
+class InMemorySharedStore(AsyncSharedStore):
+    """
+    Process-local store.
+
+    Intended for tests and single-process deployments only.
+    """
+
+    process_local = True
+
+    def __init__(self) -> None:
+        self.data: Dict[str, Tuple[Optional[float], str]] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def _get(self, key: str) -> Optional[str]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    async def get_or_set(
+        self, key: str, value: str, ttl: Optional[float] = None
+    ) -> Optional[str]:
+        existing = self._get(key)
+        if existing is not None:
+            return existing
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self.data[key] = (expires_at, value)
+        return None
+
+    async def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+    async def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        value = int(self._get(key) or 0) + amount
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self.data[key] = (expires_at, str(value))
+        return value
+
+    async def reserve_token(self, key: str, rate: float, capacity: float) -> float:
+        bucket = self.buckets.get(key)
+        if bucket is None or (bucket.rate, bucket.capacity) != (rate, capacity):
+            bucket = self.buckets[key] = TokenBucket(rate, capacity)
+        return bucket.reserve()
@@ -0,0 +1,55 @@
+import asyncio
+from time import time
+from typing import Any
+
+from taskiq import TaskiqResult
+from taskiq.exceptions import TaskiqResultTimeoutError
+from taskiq.task import AsyncTaskiqTask
+
+from unfazed_taskiq.results import NotifyingResultBackend
+
+
+class UnfazedTaskiqTask(AsyncTaskiqTask[Any]):
+    """Task handle returned by `kiq`, woken by result notifications."""
+
+    async def wait_result(
+        self,
+        check_interval: float = 0.2,
+        timeout: float = -1.0,
+        with_logs: bool = False,
+    ) -> "TaskiqResult[Any]":
+        """
+        Wait until the result is ready.
+
+        With a `NotifyingResultBackend` the wait ends as soon as the result
+        is announced, and the backend is only polled every `poll_interval`
+        seconds in case a notification is lost. Other backends are polled
+        every `check_interval` seconds.
+
+        :raises TaskiqResultTimeoutError: if the task didn't become ready in
+            `timeout` seconds.
+        """
+        backend = self.result_backend
+        if not isinstance(backend, NotifyingResultBackend):
+            return await super().wait_result(check_interval, timeout, with_logs)
+
+        start_time = time()
+        while True:
+            # register first, a notification sent during the check is kept
+            event = await backend.notifier.register(self.task_id)
+            try:
+                if await self.is_ready():
+                    break
+                interval = backend.poll_interval
+                if timeout > 0:
+                    remaining = timeout - (time() - start_time)
+                    if remaining <= 0:
+                        raise TaskiqResultTimeoutError(timeout=timeout)
+                    interval = min(interval, remaining)
+                try:
+                    await asyncio.wait_for(event.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                backend.notifier.unregister(self.task_id, event)
+        return await self.get_result(with_logs=with_logs)
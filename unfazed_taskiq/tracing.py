@@ -0,0 +1,234 @@
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence
+
+import orjson as json
+
+from unfazed_taskiq.logger import log
+
+
+class SpanContext:
+    """Identifies the active span, propagated to child tasks through labels."""
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool) -> None:
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        span_id: str,
+        parent_id: Optional[str],
+        start_ns: int,
+        end_ns: int = 0,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.attributes = attributes or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: Sequence[Span]) -> None:
+        """Export a batch of finished spans."""
+
+    def shutdown(self) -> None:  # noqa: B027
+        """Release resources, called once on shutdown."""
+
+
+class InMemorySpanExporter(SpanExporter):
+    """Keep the last `maxlen` spans, for tests and debugging."""
+
+    def __init__(self, maxlen: int = 10000) -> None:
+        self.spans: Deque[Span] = deque(maxlen=maxlen)
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.spans.extend(spans)
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Append spans to a file, one json object per line.
+
+    Writes happen in a background thread, started on the first export, so
+    the event loop never waits for the disk.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.queue: "queue.SimpleQueue[Optional[bytes]]" = queue.SimpleQueue()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        self.queue.put(b"".join(json.dumps(span.to_dict()) + b"\n" for span in spans))
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(
+                        target=self.write, name="unfazed-taskiq-spans", daemon=True
+                    )
+                    self.thread.start()
+
+    def write(self) -> None:
+        stopping = False
+        while not stopping:
+            chunks = [self.queue.get()]
+            # write everything queued meanwhile at once
+            while not self.queue.empty():
+                chunks.append(self.queue.get())
+            stopping = None in chunks
+            data = b"".join(chunk for chunk in chunks if chunk is not None)
+            if not data:
+                continue
+            try:
+                with open(self.path, "ab") as f:
+                    f.write(data)
+            except Exception as exc:
+                log.warning(f"Failed to write spans to {self.path}: {exc}")
+
+    def shutdown(self) -> None:
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+
+
+current_span: ContextVar[Optional[SpanContext]] = ContextVar(
+    "unfazed_taskiq_span", default=None
+)
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Tracer:
+    """
+    Start spans and batch finished ones to an exporter.
+
+    The sampling decision is made once when a trace starts, every span of
+    the trace follows it. Unsampled traces only propagate their ids.
+
+    :param exporter: where finished spans go, nothing is recorded if None.
+    :param sample_rate: fraction of traces to record.
+    :param batch_size: number of spans buffered before exporting.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[SpanExporter] = None,
+        sample_rate: float = 1.0,
+        batch_size: int = 64,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.buffer: List[Span] = []
+
+    def configure(
+        self,
+        exporter: Optional[SpanExporter] = None,
+        sample_rate: Optional[float] = None,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        if exporter is not None:
+            self.exporter = exporter
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if batch_size is not None:
+            self.batch_size = batch_size
+
+    def should_sample(self) -> bool:
+        return self.exporter is not None and random.random() < self.sample_rate
+
+    def child_context(self, parent: Optional[SpanContext] = None) -> SpanContext:
+        """Context of a new span, starting a trace if there is no parent."""
+        if parent is None:
+            return SpanContext(new_trace_id(), new_span_id(), self.should_sample())
+        return SpanContext(parent.trace_id, new_span_id(), parent.sampled)
+
+    def record(self, span: Span) -> None:
+        self.buffer.append(span)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        spans, self.buffer = self.buffer, []
+        if not spans or self.exporter is None:
+            return
+        try:
+            self.exporter.export(spans)
+        except Exception as exc:
+            log.warning(f"Failed to export {len(spans)} spans: {exc}")
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[SpanContext]:
+        """
+        Record a span around a block of code, e.g. an endpoint sending tasks.
+
+        Tasks sent inside the block become its children.
+        """
+        parent = current_span.get()
+        context = self.child_context(parent)
+        token = current_span.set(context)
+        start_ns = time.time_ns()
+        try:
+            yield context
+        finally:
+            current_span.reset(token)
+            if context.sampled:
+                self.record(
+                    Span(
+                        name,
+                        context.trace_id,
+                        context.span_id,
+                        parent.span_id if parent else None,
+                        start_ns,
+                        time.time_ns(),
+                        attributes,
+                    )
+                )
+
+    def shutdown(self) -> None:
+        self.flush()
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+tracer = Tracer()
@@ -0,0 +1,219 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import orjson as json
+from taskiq import AsyncBroker
+from taskiq.kicker import AsyncKicker
+from taskiq.result_backends.dummy import DummyResultBackend
+
+from unfazed_taskiq.task import UnfazedTaskiqTask
+
+CHAIN_LABEL = "chain"
+CHORD_LABEL = "chord"
+WORKFLOW_KEY_PREFIX = "unfazed_taskiq:chord"
+
+
+class Signature:
+    """
+    A task call that can be sent later, build it with `task.s(*args, **kwargs)`.
+
+    Signatures are sent with the labels of their task. When a signature is
+    the continuation of another task, the result of that task is prepended
+    to its arguments.
+    """
+
+    def __init__(
+        self,
+        task_name: str,
+        args: Sequence[Any] = (),
+        kwargs: Optional[Dict[str, Any]] = None,
+        labels: Optional[Dict[str, Any]] = None,
+        task_id: Optional[str] = None,
+        broker: Optional[AsyncBroker] = None,
+    ) -> None:
+        self.task_name = task_name
+        self.args = list(args)
+        self.kwargs = kwargs or {}
+        self.labels = labels or {}
+        self.task_id = task_id
+        self.broker = broker
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "task_name": self.task_name,
+            "args": self.args,
+            "kwargs": self.kwargs,
+            "labels": self.labels,
+            "task_id": self.task_id,
+        }
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], broker: Optional[AsyncBroker] = None
+    ) -> "Signature":
+        return cls(
+            data["task_name"],
+            data["args"],
+            data["kwargs"],
+            data["labels"],
+            data["task_id"],
+            broker,
+        )
+
+    def get_broker(self, broker: Optional[AsyncBroker] = None) -> AsyncBroker:
+        broker = broker or self.broker
+        if broker is None:
+            raise ValueError(f"Signature of {self.task_name} has no broker")
+        return broker
+
+    async def kiq(self, broker: Optional[AsyncBroker] = None) -> UnfazedTaskiqTask:
+        broker = self.get_broker(broker)
+        kicker: AsyncKicker[Any, Any] = AsyncKicker(
+            task_name=self.task_name, broker=broker, labels=self.labels
+        )
+        if self.task_id is not None:
+            kicker = kicker.with_task_id(self.task_id)
+        task = await kicker.kiq(*self.args, **self.kwargs)
+        return UnfazedTaskiqTask(task.task_id, task.result_backend)
+
+    def __repr__(self) -> str:
+        return f"Signature({self.task_name})"
+
+
+def encode(value: Any) -> str:
+    return json.dumps(value).decode()
+
+
+class Chain:
+    """
+    Run signatures one after the other, each receiving the previous result.
+
+    The remaining steps travel in the `chain` label of the running task and
+    the worker sends the next one once the result is stored, the chain stops
+    at the first error. `kiq` returns the task of the last step.
+    """
+
+    def __init__(self, *signatures: Signature) -> None:
+        if not signatures:
+            raise ValueError("A chain needs at least one signature")
+        self.signatures = list(signatures)
+
+    @property
+    def broker(self) -> Optional[AsyncBroker]:
+        return self.signatures[0].broker
+
+    def prepare(self, broker: AsyncBroker) -> Signature:
+        """Assign task ids and return the first step, carrying the rest."""
+        for signature in self.signatures:
+            signature.task_id = signature.task_id or broker.id_generator()
+        first, *rest = self.signatures
+        if not rest:
+            return first
+        labels = {**first.labels, CHAIN_LABEL: encode([s.to_dict() for s in rest])}
+        return Signature(
+            first.task_name,
+            first.args,
+            first.kwargs,
+            labels,
+            first.task_id,
+            broker,
+        )
+
+    @property
+    def last(self) -> Signature:
+        return self.signatures[-1]
+
+    async def kiq(self, broker: Optional[AsyncBroker] = None) -> UnfazedTaskiqTask:
+        broker = self.signatures[0].get_broker(broker)
+        await self.prepare(broker).kiq(broker)
+        return UnfazedTaskiqTask(self.last.task_id or "", broker.result_backend)
+
+
+class Group:
+    """Send signatures in parallel, `kiq` returns their tasks in order."""
+
+    def __init__(self, *signatures: Signature) -> None:
+        self.signatures = list(signatures)
+
+    async def kiq(
+        self, broker: Optional[AsyncBroker] = None
+    ) -> List[UnfazedTaskiqTask]:
+        return list(
+            await asyncio.gather(
+                *(signature.kiq(broker) for signature in self.signatures)
+            )
+        )
+
+
+class Chord:
+    """
+    Send a group, then the callback with the list of its results.
+
+    Every header message carries the chord id, its index, the task ids of
+    the group and the callback in the `chord` label. Workers count finished
+    header tasks with an atomic counter in the shared store, the one
+    finishing last reads the results from the result backend and sends the
+    callback. No process
+    waits for the group. If a header task fails the callback is never sent.
+
+    `kiq` returns the task of the callback, or of the last step when the
+    callback is a chain.
+    """
+
+    def __init__(
+        self,
+        header: Union[Group, Sequence[Signature]],
+        callback: Union[Signature, Chain],
+    ) -> None:
+        signatures = header.signatures if isinstance(header, Group) else header
+        if not signatures:
+            raise ValueError("A chord needs at least one header signature")
+        self.header = list(signatures)
+        self.callback = callback
+
+    async def kiq(self, broker: Optional[AsyncBroker] = None) -> UnfazedTaskiqTask:
+        broker = self.header[0].get_broker(broker)
+        if isinstance(broker.result_backend, DummyResultBackend):
+            raise ValueError("Chords need a result backend to collect results")
+
+        callback = self.callback
+        chain = callback if isinstance(callback, Chain) else Chain(callback)
+        first = chain.prepare(broker)
+
+        for signature in self.header:
+            signature.task_id = signature.task_id or broker.id_generator()
+        spec = {
+            "id": broker.id_generator(),
+            "tasks": [signature.task_id for signature in self.header],
+            "callback": first.to_dict(),
+        }
+        await asyncio.gather(
+            *(
+                Signature(
+                    signature.task_name,
+                    signature.args,
+                    signature.kwargs,
+                    {
+                        **signature.labels,
+                        CHORD_LABEL: encode({**spec, "index": index}),
+                    },
+                    signature.task_id,
+                ).kiq(broker)
+                for index, signature in enumerate(self.header)
+            )
+        )
+        return UnfazedTaskiqTask(chain.last.task_id or "", broker.result_backend)
+
+
+def chain(*signatures: Signature) -> Chain:
+    return Chain(*signatures)
+
+
+def group(*signatures: Signature) -> Group:
+    return Group(*signatures)
+
+
+def chord(
+    header: Union[Group, Sequence[Signature]], callback: Union[Signature, Chain]
+) -> Chord:
+    return Chord(header, callback)